@@ -361,6 +361,10 @@ def get_inputs(inp_file):
             inputs['te_sample'] = te_sample
         except NameError:
             inputs['te_sample'] = defvals.def_te_sample
+        # te_save_mps (optional):
+        #   With 'overwrite', <prefix>.mps_t is a link to the last complete checkpoint,
+        #   one of the two directories <prefix>.mps_t.0 and <prefix>.mps_t.1 that are
+        #   written in turn in the background while the propagation continues.
         try:
             inputs['te_save_mps'] = te_save_mps
         except NameError:
@@ -369,10 +373,58 @@ def get_inputs(inp_file):
             inputs['te_save_1pdm'] = te_save_1pdm
         except NameError:
             inputs['te_save_1pdm'] = defvals.def_te_save_1pdm
+        # te_mps_archive (optional):
+        #   If True, the MPSs saved in the tevo-XXXX directories (te_save_mps = 'sampled'
+        #   or through the probe file) are written as one archive file, mps.mpsar, 
+        #   instead of a directory of many small files, which spares the inodes and 
+        #   the metadata load on parallel file systems. te_inmps_dir and te_branch 
+        #   accept such archives as well. The default is False.
+        try:
+            inputs['te_mps_archive'] = te_mps_archive
+        except NameError:
+            inputs['te_mps_archive'] = defvals.def_te_mps_archive
+        # te_mps_compression (optional):
+        #   If not None, the MPSs saved in the tevo-XXXX directories are compressed. 
+        #   It is the method name, 'zstd' (requires the python package zstandard), 
+        #   'lz4' (requires the python package lz4), or 'zlib', or a dictionary such 
+        #   as {'method':'zstd', 'level':5}. The MPSs are decompressed transparently
+        #   when they are loaded, e.g. through te_inmps_dir or te_branch. Use 
+        #   `python -m IMAM_TDDMRG.utils.util_compress <MPS directory>` to compare
+        #   the compression ratios and throughputs of the methods on a saved MPS. 
+        #   It cannot be used together with te_mps_archive. The default is None.
+        try:
+            inputs['te_mps_compression'] = te_mps_compression
+        except NameError:
+            inputs['te_mps_compression'] = defvals.def_te_mps_compression
+        # te_save_2pdm (optional):
+        #   If True, the 2PDM is calculated at the sampling times and saved into 
+        #   2pdm.npz in the tevo-XXXX directories, packed by its permutation symmetries
+        #   (about n^4/4 elements). Load it with utils/util_qm.load_2pdm. The default
+        #   is False.
         try:
             inputs['te_save_2pdm'] = te_save_2pdm
         except NameError:
             inputs['te_save_2pdm'] = defvals.def_te_save_2pdm
+        # te_2pdm_single (optional):
+        #   If True, the 2PDM saved with te_save_2pdm is stored in single precision.
+        #   The default is False.
+        try:
+            inputs['te_2pdm_single'] = te_2pdm_single
+        except NameError:
+            inputs['te_2pdm_single'] = defvals.def_te_2pdm_single
+        # te_orb_entropy (optional):
+        #   A dictionary that turns on the single-orbital entropies and the two-orbital
+        #   mutual information at the sampling times, calculated from the one- and 
+        #   two-orbital reduced density matrices. 'every' (default 1) calculates them
+        #   only at every 'every'-th sampling time, and 'pairs' is a list of 1-based
+        #   orbital pairs whose mutual information is printed, e.g. [(1,2), (1,5)]
+        #   (default None, all pairs). With 'pairs' = [], only the single-orbital 
+        #   entropies are calculated. The results go to <prefix>.oent and 
+        #   <prefix>.oent.npz. It requires comp = 'full'. The default is None.
+        try:
+            inputs['te_orb_entropy'] = te_orb_entropy
+        except NameError:
+            inputs['te_orb_entropy'] = defvals.def_te_orb_entropy
         try:
             inputs['save_txt'] = save_txt
         except NameError:
@@ -389,6 +441,254 @@ def get_inputs(inp_file):
             inputs['bo_pairs'] = bo_pairs
         except NameError:
             inputs['bo_pairs'] = defvals.def_bo_pairs
+        # te_resume (optional):
+        #   If True, the time evolution continues from the checkpoint in <prefix>.mps_t
+        #   written by an earlier run with te_save_mps = 'overwrite' instead of starting
+        #   from tinit. The initial MPS (te_inmps_dir and te_inmps_fname) is still needed
+        #   for the autocorrelation, and the remaining time evolution parameters must be
+        #   the same as in the earlier run. The default is False.
+        try:
+            inputs['te_resume'] = te_resume
+        except NameError:
+            inputs['te_resume'] = defvals.def_te_resume
+        # te_adaptive_dt (optional):
+        #   A dictionary that turns on error-controlled adaptive time steps. The step
+        #   size starts at te_dt (or its first element) and is adjusted so that the
+        #   local error per step, estimated by comparing one full step with two half
+        #   steps, stays below the tolerance. This makes every step about three times
+        #   as expensive. The time points still land exactly on the sampling times 
+        #   (te_sample) and on te_tmax. The recognized keys are 'tol' (required, the 
+        #   norm of the local error of the normalized state), 'dt_min', 'dt_max', 
+        #   'safety', 'grow_max', 'shrink_min', and 'reject' (see utils/util_te.py).
+        #   The default is None, i.e. the time points are fixed by te_dt.
+        try:
+            inputs['te_adaptive_dt'] = te_adaptive_dt
+        except NameError:
+            inputs['te_adaptive_dt'] = defvals.def_te_adaptive_dt
+        # te_obs_pipeline (optional):
+        #   'async' or 'sync'. With 'async', the partial charges, bond orders, and
+        #   multipoles at the sampling times, as well as the related output files, are
+        #   computed by a background worker process so that the time propagation does
+        #   not wait for them. The worker is forked after the block2 (OpenMP) threads
+        #   exist, so 'async' is only used without MPI, an MPI run falls back to 
+        #   'sync' with a warning. The default is 'sync'.
+        try:
+            inputs['te_obs_pipeline'] = te_obs_pipeline
+        except NameError:
+            inputs['te_obs_pipeline'] = defvals.def_te_obs_pipeline
+        # te_ac_stride (optional):
+        #   The autocorrelation (and the 2t-autocorrelation) is computed every
+        #   te_ac_stride time steps instead of at every step. It is also computed at
+        #   the sampling times, the last time point, and when requested by a probe
+        #   file, but only the rows on the stride grid are written into <prefix>.ac, 
+        #   which must stay equidistant for the Fourier tools (the other values are in
+        #   the TIME_INFO of the tevo-XXXX directories). Each evaluation contracts the
+        #   whole <psi(0)|psi(t)> network again, so a larger stride cuts this cost for
+        #   long trajectories at the price of a coarser autocorrelation. The default 
+        #   is 1.
+        try:
+            inputs['te_ac_stride'] = te_ac_stride
+        except NameError:
+            inputs['te_ac_stride'] = defvals.def_te_ac_stride
+        # te_bond_dim_policy (optional):
+        #   A dictionary that lets the bond dimension of the time-evolved MPS follow the
+        #   truncation error. After every time step, the bond dimension is multiplied
+        #   by 'grow' (default 1.25) if the largest discarded weight exceeds 'trunc_tol'
+        #   (required), or divided by it if the discarded weight is below
+        #   'shrink_ratio'*'trunc_tol' (default 0.01). It is bounded by 'D_min' and
+        #   'D_max' (default te_max_D), and by the largest value predicted to fit in
+        #   'mem_max' bytes (default 90% of the memory minus the integer memory). The
+        #   starting value is 'D_init' (default the bond dimension of the initial MPS).
+        #   The default is None, i.e. te_max_D is used throughout.
+        try:
+            inputs['te_bond_dim_policy'] = te_bond_dim_policy
+        except NameError:
+            inputs['te_bond_dim_policy'] = defvals.def_te_bond_dim_policy
+        # te_subspace_expansion (optional):
+        #   A dictionary that turns on the single-site TDVP with a global subspace
+        #   expansion, so that most time steps have the one-site cost while the bond
+        #   dimension can still grow. Before every 'every'-th time step (default 1), the
+        #   bond bases of the time-evolved MPS are enlarged by a perturbative compression
+        #   in which H|psi> is mixed into the reduced density matrices with the weight
+        #   'noise' (default 1.0E-5) over 'nsteps' sweeps (default 1). It requires 
+        #   te_method = TangentSpace and comp = 'full'. The default is None, i.e. the
+        #   two-site algorithm is used for two-site input MPSs.
+        try:
+            inputs['te_subspace_expansion'] = te_subspace_expansion
+        except NameError:
+            inputs['te_subspace_expansion'] = defvals.def_te_subspace_expansion
+        # te_control (optional):
+        #   If True, a named pipe called control is created in <prefix>.sample through
+        #   which the running time evolution can be controlled, e.g.
+        #      echo "sample" > <prefix>.sample/control
+        #   The commands are sample, save_mps, save_1pdm, bond_dim <D>, krylov_size
+        #   <n>, krylov_tol <x>, sample_every <n>, and stop (see utils/util_te.py).
+        #   The default is False.
+        try:
+            inputs['te_control'] = te_control
+        except NameError:
+            inputs['te_control'] = defvals.def_te_control
+        # walltime (optional):
+        #   The walltime limit of the job in seconds, counted from the start of the
+        #   program. Before it is reached, the ground state DMRG stops after the last
+        #   sweep that still fits and the time evolution saves its last time point
+        #   (including the checkpoint for te_resume) and stops. The default is None.
+        try:
+            inputs['walltime'] = walltime
+        except NameError:
+            inputs['walltime'] = defvals.def_walltime
+        # stop_signals (optional):
+        #   The names of the signals upon which the ground state DMRG and the time
+        #   evolution stop gracefully at the next sweep or time step instead of being
+        #   killed, e.g. ('SIGTERM', 'SIGUSR1'), which most batch systems send some time
+        #   before killing a job. With None, the default signal handling is kept. 
+        #   Setting it (or walltime) makes the ground state DMRG run one sweep at a 
+        #   time instead of in a single solve call. The default is None.
+        try:
+            inputs['stop_signals'] = stop_signals
+        except NameError:
+            inputs['stop_signals'] = defvals.def_stop_signals
+        # te_save_perf (optional):
+        #   If True, a per-time-step performance record (wall time breakdown, bond
+        #   dimensions, discarded weight, peak memory, and scratch usage, the latter 
+        #   only at the time points where quantities are saved) is written as a JSON 
+        #   line into <prefix>.perf.jsonl. The default is False.
+        try:
+            inputs['te_save_perf'] = te_save_perf
+        except NameError:
+            inputs['te_save_perf'] = defvals.def_te_save_perf
+        # ensemble (optional):
+        #   A list of dictionaries, each of which defines an initial state of an ensemble
+        #   of trajectories that share the same ground state MPS and Hamiltonian. Each
+        #   dictionary must contain the key 'name' and may contain the keys 'aorb' and
+        #   'alpha', which override ann_orb and ann_sp for that member, e.g.
+        #      ensemble = [{'name':'homo', 'aorb':'nat4'},
+        #                  {'name':'homo-1', 'aorb':'nat3'},
+        #                  {'name':'homo-1_b', 'aorb':'nat3', 'alpha':False}]
+        #   When it is given, do_annihilate and do_timeevo must be True, and each member
+        #   is annihilated and propagated with the prefix <prefix>.<name>, so that its
+        #   outputs go to e.g. <prefix>.<name>.sample. The default is None.
+        try:
+            inputs['ensemble'] = ensemble
+        except NameError:
+            inputs['ensemble'] = defvals.def_ensemble
+        # ensemble_nproc (optional):
+        #   The maximum number of ensemble members that run concurrently, each in a 
+        #   worker process started anew (not forked) from the main one. Keep in mind 
+        #   that each of them uses up to 'memory' bytes, while the OpenMP threads are
+        #   divided among them (see MYTDDMRG.run_workers). Under MPI, the members run
+        #   one after another, each one parallelized over all ranks. The default is
+        #   None, i.e. all members at once.
+        try:
+            inputs['ensemble_nproc'] = ensemble_nproc
+        except NameError:
+            inputs['ensemble_nproc'] = defvals.def_ensemble_nproc
+        # parareal (optional):
+        #   A dictionary of the keyword arguments of MYTDDMRG.parareal_propagate, which
+        #   turns on the parareal (parallel-in-time) propagation. The required keys are
+        #   'n_slices' (the number of time slices), 'D_coarse' (the bond dimension of
+        #   the coarse RK4 propagator), and 'dt_coarse' (its time step). The optional
+        #   keys are 'max_iter', 'fid_tol' (default 1.0E-6), 'n_proc' (the number of
+        #   fine propagations that run concurrently, default None, i.e. all slices at
+        #   once, see ensemble_nproc for their cost, 1 is not allowed since the 
+        #   parareal propagation only pays off in parallel), 'fit_nsteps', and 
+        #   'fit_conv_tol'. The fine propagator is the one defined by the other
+        #   time evolution inputs, with a constant dt. It requires the full complex
+        #   MPS type and cannot be used with MPI. The default is None.
+        try:
+            inputs['parareal'] = parareal
+        except NameError:
+            inputs['parareal'] = defvals.def_parareal
+        # te_D_ladder (optional):
+        #   A list of bond dimensions, e.g. [200, 300, 400], with each of which the same
+        #   initial MPS is propagated (replacing te_max_D), after which the 
+        #   autocorrelation, Lowdin partial charges, and multipole components are 
+        #   extrapolated to zero truncation error. The propagation with bond dimension
+        #   D uses the prefix <prefix>.D<D>, and the extrapolated quantities with their
+        #   error bars are written into <prefix>.xD.ac, <prefix>.xD.low, and 
+        #   <prefix>.xD.mp. The default is None.
+        try:
+            inputs['te_D_ladder'] = te_D_ladder
+        except NameError:
+            inputs['te_D_ladder'] = defvals.def_te_D_ladder
+        # te_branch (optional):
+        #   The path of a directory containing an MPS saved by an earlier propagation,
+        #   e.g. <prefix>.sample/tevo-XXXX of a run with te_save_mps = 'sampled', from
+        #   which a new propagation is started. The initial time is read from its
+        #   TIME_INFO file, hence tinit is ignored, while te_inmps_dir, te_inmps_fname,
+        #   te_inmps_cpx, and te_inmps_multi must still point to the initial MPS of the
+        #   earlier propagation, which is used for the autocorrelation. te_max_D, dt, 
+        #   te_method, and the other time evolution inputs may differ from those of 
+        #   the earlier propagation. Use a different prefix to keep the outputs of the 
+        #   earlier propagation. The default is None.
+        try:
+            inputs['te_branch'] = te_branch
+        except NameError:
+            inputs['te_branch'] = defvals.def_te_branch
+        # te_preview (optional):
+        #   A dictionary of the keyword arguments of MYTDDMRG.preview_propagate, which
+        #   replaces the production propagation by a cheap preview with a small bond
+        #   dimension ('max_bond_dim', default min(100, te_max_D)) and a coarse time
+        #   step ('dt', default 4*dt), e.g. te_preview = {}. From the autocorrelation
+        #   spectrum, the partial charges, and the bond dimension growth of the 
+        #   preview, the production dt, te_max_D, and te_sample are recommended and 
+        #   written as an input snippet into <prefix>.preview.inp. The optional keys
+        #   are 'tmax', 'n_sample', 'thr', 'safety', and 'D_cap' (default 2000). The 
+        #   default is None.
+        try:
+            inputs['te_preview'] = te_preview
+        except NameError:
+            inputs['te_preview'] = defvals.def_te_preview
+        # te_ladder_nproc (optional):
+        #   The maximum number of propagations of te_D_ladder that run concurrently as
+        #   worker processes (see ensemble_nproc for their memory and thread usage).
+        #   Under MPI, they run one after another, each one parallelized over all 
+        #   ranks. The default is None, i.e. all propagations at once.
+        try:
+            inputs['te_ladder_nproc'] = te_ladder_nproc
+        except NameError:
+            inputs['te_ladder_nproc'] = defvals.def_te_ladder_nproc
+        # te_mpo_algo (optional):
+        #   The algorithm used to construct the Hamiltonian MPO for the time evolution,
+        #   which is the name of a member of block2's MPOAlgorithmTypes, e.g. 
+        #   'FastBipartite', 'Bipartite', 'SVD', 'FastSVD', or 'Conventional'. The 
+        #   default is None, which uses the default of DMRGDriver.get_qc_mpo.
+        try:
+            inputs['te_mpo_algo'] = te_mpo_algo
+        except NameError:
+            inputs['te_mpo_algo'] = defvals.def_te_mpo_algo
+        # te_mpo_cutoff (optional):
+        #   The cutoff of the singular values (or bipartite weights) discarded while
+        #   constructing the Hamiltonian MPO for the time evolution. A larger value
+        #   reduces the MPO bond dimension, and hence the cost of each time step, at the
+        #   cost of a small error of the Hamiltonian. The default is 1E-20.
+        try:
+            inputs['te_mpo_cutoff'] = te_mpo_cutoff
+        except NameError:
+            inputs['te_mpo_cutoff'] = defvals.def_te_mpo_cutoff
+        # te_mpo_compare (optional):
+        #   A list of (algorithm, cutoff) tuples, e.g. 
+        #      [('FastBipartite', 1E-12), ('SVD', 1E-8), ('SVD', 1E-6)]
+        #   If given, the MPO bond dimension, the energy error relative to the MPO built
+        #   with the default algorithm and a cutoff of 1E-20, and the wall time of one 
+        #   TDVP time step with te_max_D and dt are reported for each option, using the 
+        #   initial MPS of the time evolution, before the time evolution starts. The 
+        #   default is None.
+        try:
+            inputs['te_mpo_compare'] = te_mpo_compare
+        except NameError:
+            inputs['te_mpo_compare'] = defvals.def_te_mpo_compare
+        # mpo_cache (optional):
+        #   A directory where the Hamiltonian MPO is saved after it is built. Its file
+        #   name contains a hash of the integrals, orbital ordering, symmetries, and the
+        #   te_mpo_algo and te_mpo_cutoff inputs, so that a later run with the same 
+        #   values of these quantities loads the MPO from this directory instead of 
+        #   building it again. The directory can be shared by many runs. The default is
+        #   None, which disables the cache.
+        try:
+            inputs['mpo_cache'] = mpo_cache
+        except NameError:
+            inputs['mpo_cache'] = defvals.def_mpo_cache
 
     return inputs
 #######################################################
@@ -53,8 +53,33 @@ def_n_sub_sweeps_init = 4
 def_te_sample = None
 def_te_save_mps = 'overwrite'
 def_te_save_1pdm = False
+def_te_mps_archive = False
+def_te_mps_compression = None
 def_te_save_2pdm = False
+def_te_2pdm_single = False
+def_te_orb_entropy = None
 def_save_txt = True
 def_save_npy = True
 def_te_in_singlet_embed = (False, None)
 def_bo_pairs = None
+def_te_resume = False
+def_te_adaptive_dt = None
+def_te_obs_pipeline = 'sync'
+def_te_ac_stride = 1
+def_te_bond_dim_policy = None
+def_te_subspace_expansion = None
+def_te_control = False
+def_walltime = None
+def_stop_signals = None
+def_te_save_perf = False
+def_ensemble = None
+def_ensemble_nproc = None
+def_parareal = None
+def_te_D_ladder = None
+def_te_ladder_nproc = None
+def_te_preview = None
+def_te_branch = None
+def_te_mpo_algo = None
+def_te_mpo_cutoff = 1E-20
+def_te_mpo_compare = None
+def_mpo_cache = None
@@ -31,7 +31,7 @@ Derived from:
 
 from ipsh import ipsh
 
-import os, time, glob
+import os, time
 import numpy as np
 import scipy.linalg
 from scipy.linalg import eigvalsh, eigh
@@ -98,11 +98,19 @@ from IMAM_TDDMRG.utils.util_print import getVerbosePrinter
 from IMAM_TDDMRG.utils.util_print import print_section, print_warning, print_describe_content, print_matrix
 from IMAM_TDDMRG.utils.util_print import print_orb_occupations, print_pcharge, print_mpole, print_bond_order
 from IMAM_TDDMRG.utils.util_print import print_autocorrelation, print_td_pcharge, print_td_bo, \
-    print_td_mpole
-from IMAM_TDDMRG.utils.util_qm import make_full_dm
+    print_td_mpole, print_te_perf, print_td_entropy
+from IMAM_TDDMRG.utils.util_qm import make_full_dm, pack_2pdm
 from IMAM_TDDMRG.utils.util_mps import print_MPO_bond_dims, MPS_fitting, calc_energy_MPS
+from IMAM_TDDMRG.utils.util_mps import get_mpo_hash, mps_to_one_dot, get_mps_files
+from IMAM_TDDMRG.utils.util_mps import mps_checkpoint
 from IMAM_TDDMRG.utils.util_mps import saveMPStoDir, loadMPSfromDir_OLD, loadMPSfromDir
-from IMAM_TDDMRG.utils.util_mps import trans_to_singlet_embed
+from IMAM_TDDMRG.utils.util_mps import saveMPStoArchive
+from IMAM_TDDMRG.utils.util_compress import get_codec
+from IMAM_TDDMRG.utils.util_mps import trans_to_singlet_embed, MPS_addition, calc_overlap_MPS
+from IMAM_TDDMRG.utils.util_te import te_step_controller, te_obs_pipeline, te_bond_dim_policy
+from IMAM_TDDMRG.utils.util_te import te_control_channel, te_stop_guard, get_dir_size
+from IMAM_TDDMRG.utils.util_te import write_time_info, write_time_info_ow, write_te_state
+from IMAM_TDDMRG.utils.util_te import read_time_info
 from IMAM_TDDMRG.observables import pcharge, mpole, bond_order
 from IMAM_TDDMRG.phys_const import au2fs
 
@@ -155,6 +163,7 @@ class MYTDDMRG:
         assert isize < memory
         #OLD isize = min(int(memory * 0.1), 200000000)
         b2.init_memory(isize=isize, dsize=int(memory - isize), save_dir=scratch)
+        self.dsize = int(memory - isize)
         b2.Global.threading = b2.Threading(
             b2.ThreadingTypes.OperatorBatchedGEMM | b2.ThreadingTypes.Global, omp_threads,
             omp_threads, 1)
@@ -172,6 +181,10 @@ class MYTDDMRG:
         self.print_statistics = print_statistics
         self.mpi = mpi
         ## self.mpi = MPI
+        self.init_args = {'nel_site':nel_site, 'memory':memory, 'isize':isize,
+                          'omp_threads':omp_threads, 'print_statistics':print_statistics,
+                          'delayed_contraction':delayed_contraction}
+        self.ham_args = None
         
         self.delayed_contraction = delayed_contraction
         self.idx = None # reorder
@@ -227,6 +240,24 @@ class MYTDDMRG:
     #################################################
 
 
+    #################################################
+    def set_scratch(self, scratch):
+        '''
+        Changes the scratch directory, where block2 stores the MPS and the
+        environments from now on.
+        '''
+        self.scratch = scratch
+        b2.Global.frame.save_dir = scratch
+        b2.Global.frame.mps_dir = scratch
+        if self.mpi is not None:
+            if self.mpi.rank == 0:
+                mkDir(scratch)
+            self.mpi.barrier()
+        else:
+            mkDir(scratch)
+    #################################################
+
+
     #################################################
     def assign_orbs(self, n_core, n_sites, orbs):
 
@@ -266,6 +297,8 @@ class MYTDDMRG:
     def init_hamiltonian_fcidump(self, pg, filename, orbs, idx=None):
         """Read integrals from FCIDUMP file."""
         assert self.fcidump is None
+        self.ham_args = ('init_hamiltonian_fcidump',
+                         {'pg':pg, 'filename':filename, 'orbs':orbs, 'idx':idx})
         self.fcidump = bx.FCIDUMP()
         self.fcidump.read(filename)
         self.groupname = pg
@@ -309,7 +342,8 @@ class MYTDDMRG:
 
     #################################################
     def init_hamiltonian(self, pg, n_sites, n_elec, twos, isym, orb_sym, e_core, 
-                         h1e, g2e, orbs, tol=1E-13, idx=None, save_fcidump=None):
+                         h1e, g2e, orbs, tol=1E-13, idx=None, save_fcidump=None,
+                         mpo_algo=None, mpo_cutoff=1E-20, mpo_cache=None):
         """
         Initialize integrals using h1e, g2e, etc.
         n_elec : The number of electrons within the sites. This means, if there are core
@@ -317,10 +351,21 @@ class MYTDDMRG:
         isym: wfn symmetry in molpro convention? See the getFCIDUMP function in CAS_example.py.
         g2e: Does it need to be in 8-fold symmetry? See the getFCIDUMP function in CAS_example.py.
         orb_sym: orbitals symmetry in molpro convention.
+        mpo_algo, mpo_cutoff: The construction algorithm and cutoff of the Hamiltonian MPO,
+                              see build_te_mpo.
+        mpo_cache: A directory where the Hamiltonian MPO is saved, so that a later run 
+                   with the same integrals, orbital ordering, symmetries, and MPO 
+                   settings loads it instead of building it. None disables the cache.
         """
 
         #==== Initialize self.fcidump ====#
         assert self.fcidump is None
+        self.ham_args = ('init_hamiltonian',
+                         {'pg':pg, 'n_sites':n_sites, 'n_elec':n_elec, 'twos':twos,
+                          'isym':isym, 'orb_sym':orb_sym, 'e_core':e_core, 'h1e':h1e,
+                          'g2e':g2e, 'orbs':orbs, 'tol':tol, 'idx':idx,
+                          'mpo_algo':mpo_algo, 'mpo_cutoff':mpo_cutoff,
+                          'mpo_cache':mpo_cache})
         self.fcidump = bx.FCIDUMP()
         self.groupname = pg
         assert n_elec == self.nel_site, \
@@ -435,12 +480,17 @@ class MYTDDMRG:
         self.b2driver.initialize_system(n_sites=self.n_sites, n_elec=n_elec, spin=twos, 
                                      singlet_embedding=False, pg_irrep=self.wfn_sym,
                                      orb_sym=b2.VectorUInt8(map(swap_pg, orb_sym)))
-        self.te_mpo = self.b2driver.get_qc_mpo(h1e=h1e, g2e=g2e, ecore=e_core, reorder=idx,
-                                            iprint=1)
+        self.te_mpo_ints = {'h1e':h1e, 'g2e':g2e, 'ecore':e_core, 'reorder':idx}
+        self.te_mpo_syms = (n_sites, n_elec, twos, isym, list(orb_sym))
+        self.mpo_cache = mpo_cache
         #self.te_mpo = self.b2driver.get_conventional_qc_mpo(self.fcidump,
         #                                                 MPOAlgorithmTypes.Conventional)
-        _print('TE_MPO algo type = ', MPOAlgorithmTypes.Conventional)
-        
+        _print('TE_MPO algo type = ', 'default' if mpo_algo is None else mpo_algo)
+        _print('TE_MPO cutoff = ', mpo_cutoff)
+
+        #==== The Hamiltonian MPO used everywhere (dmrg, annihilate, time evolution) ====#
+        self.mpo_orig = self.build_te_mpo(mpo_algo, mpo_cutoff)
+        self.te_mpo = self.mpo_orig
         if self.mpi is not None:
             self.te_mpo = bs.ParallelMPO(self.te_mpo, self.prule)
 
@@ -453,6 +503,201 @@ class MYTDDMRG:
     #################################################
 
 
+    #################################################
+    def get_mpo_orig(self):
+        """
+        Returns the Hamiltonian MPO (without MPI parallelization) built by 
+        init_hamiltonian. When the Hamiltonian is initialized by 
+        init_hamiltonian_fcidump, it is built here from self.hamil the first time.
+        """
+        if self.mpo_orig is None:
+            mpo = bs.MPOQC(self.hamil, b2.QCTypes.Conventional)
+            mpo = bs.SimplifiedMPO(mpo, bs.RuleQC(), True, True,
+                                   b2.OpNamesSet((b2.OpNames.R, b2.OpNames.RD)))
+            self.mpo_orig = mpo
+        return self.mpo_orig
+    #################################################
+
+
+    #################################################
+    def build_te_mpo(self, algo=None, cutoff=1E-20):
+        """
+        Builds the Hamiltonian MPO (without MPI parallelization) with 
+        DMRGDriver.get_qc_mpo from the integrals given to init_hamiltonian, or loads it
+        from self.mpo_cache if it has been saved there by an earlier run.
+        algo: The name of an MPOAlgorithmTypes member, e.g. 'FastBipartite', 'Bipartite',
+              'SVD', 'FastSVD', or 'Conventional'. None means the default of get_qc_mpo.
+        cutoff: The singular values (or bipartite weights) below which are discarded 
+                during the construction. A larger cutoff gives a smaller MPO bond 
+                dimension at the cost of a small error of the Hamiltonian.
+        """
+        from pyblock2.driver.core import MPOAlgorithmTypes
+
+        #==== Look up the cache ====#
+        fname = self.te_mpo_cache_file(algo, cutoff)
+        if fname is not None:
+            if os.path.isfile(fname):
+                _print('Loading the Hamiltonian MPO from ' + fname)
+                mpo = bs.MPO(0)
+                mpo.load_data(fname, minimal=False)
+                return mpo
+
+        algo_type = None if algo is None else getattr(MPOAlgorithmTypes, algo)
+        mpo = self.b2driver.get_qc_mpo(cutoff=cutoff, algo_type=algo_type, iprint=1,
+                                       **self.te_mpo_ints)
+
+        #==== Save into the cache ====#
+        if fname is not None:
+            if self.mpi is None or self.mpi.rank == 0:
+                mkDir(self.mpo_cache)
+                mpo.save_data(fname + '.tmp')
+                os.replace(fname + '.tmp', fname)      # 1)
+                _print('The Hamiltonian MPO is saved into ' + fname)
+            if self.mpi is not None:
+                self.mpi.barrier()
+        # NOTES:
+        # 1) Renaming makes sure that a run that starts while another one is still
+        #    writing the MPO never loads an incomplete file.
+        return mpo
+    #################################################
+
+
+    #################################################
+    def te_mpo_cache_file(self, algo=None, cutoff=1E-20, mpo_cache=None):
+        '''
+        Returns the file in mpo_cache (default is self.mpo_cache) under which 
+        build_te_mpo stores the MPO built with algo and cutoff, or None if there is no
+        MPO cache.
+        '''
+        mpo_cache = self.mpo_cache if mpo_cache is None else mpo_cache
+        if mpo_cache is None:
+            return None
+        key = get_mpo_hash(self.te_mpo_ints['h1e'], self.te_mpo_ints['g2e'],
+                           self.te_mpo_ints['ecore'], self.te_mpo_ints['reorder'],
+                           self.te_mpo_syms, spin_symmetry, comp, algo, cutoff,
+                           getattr(b2, '__version__', None))
+        return mpo_cache + '/MPO-' + key + '.bin'
+    #################################################
+
+
+    #################################################
+    def compare_te_mpo(self, logbook, options, inmps_dir0=None, inmps_name='ANN_KET',
+                       inmps_cpx=False, inmps_multi=False, max_bond_dim=None, dt=0.05,
+                       krylov_size=20, krylov_tol=5.0E-6, exp_tol=1e-6):
+        """
+        Compares Hamiltonian MPOs for the time evolution built with different options.
+        options: A list of (algo, cutoff) tuples, see build_te_mpo.
+        For each option, the MPO bond dimensions, the energy of the MPS in 
+        inmps_dir0/inmps_name, the error of this energy relative to that of the 
+        reference MPO (the default algorithm with cutoff = 1E-20), and the wall time of
+        one TDVP time step of length dt with bond dimension max_bond_dim (default is
+        that of the MPS) are reported. The MPS is not changed. The wall time of an MPO
+        that is loaded from self.mpo_cache is reported as a load time ('t_load') 
+        instead of a build time ('t_build'). The objects of each option are 
+        deallocated before the next option is treated.
+        """
+        if inmps_dir0 is None:
+            inmps_dir = self.scratch
+        else:
+            inmps_dir = inmps_dir0
+        
+        #==== Load the MPS and make it complex ====#
+        idMPO = bs.SimplifiedMPO(bs.IdentityMPO(self.hamil), bs.RuleQC(), True, True)
+        if self.mpi is not None:
+            idMPO = bs.ParallelMPO(idMPO, self.identrule)
+        mps_type = {'type':'multi', 'nroots':2} if inmps_multi else {'type':'normal'}
+        mps, _, _ = loadMPSfromDir(inmps_dir, inmps_name, inmps_cpx, mps_type, idMPO,
+                                   cached_contraction=True, MPI=self.mpi,
+                                   prule=self.prule if self.mpi is not None else None)
+        if inmps_cpx:
+            cmps0 = mps.deep_copy('cmp_mps0')
+        else:
+            cmps0 = bs.MultiMPS.make_complex(mps, 'cmp_mps0')
+        if cmps0.dot != 2:
+            cmps0.load_data()
+            if comp == 'hybrid':
+                cmps0.canonical_form = 'M' + cmps0.canonical_form[1:]
+            cmps0.dot = 2
+            cmps0.save_data()
+        D = mps.info.bond_dim if max_bond_dim is None else max_bond_dim
+        
+        def make_me(mpo, cmps, tag):
+            me = bs.MovingEnvironment(mpo, cmps, cmps, tag)
+            me.delayed_contraction = b2.OpNamesSet.normal_ops()
+            me.cached_contraction = True
+            me.init_environments(False)
+            return me
+
+        #==== Loop over the options ====#
+        results = []
+        for algo, cutoff in [(None, 1E-20)] + list(options):
+            name = ('default' if algo is None else algo) + f' / {cutoff:.1e}'
+            _print('\n>>> TE MPO option : ' + name + ' <<<')
+            fname = self.te_mpo_cache_file(algo, cutoff)
+            cached = fname is not None and os.path.isfile(fname)
+            t = time.perf_counter()
+            mpo = self.build_te_mpo(algo, cutoff)
+            t_mpo = time.perf_counter() - t
+            if self.mpi is not None:
+                mpo = bs.ParallelMPO(mpo, self.prule)
+            mpo_bdims = print_MPO_bond_dims(mpo, 'TE')
+
+            #==== Energy ====#
+            cmps_e = cmps0.deep_copy('cmp_mps_e')
+            me_e = make_me(mpo, cmps_e, 'CMP_E')
+            if comp == 'hybrid':
+                expect = brs.ComplexExpect(me_e, D, D)
+            elif comp == 'full':
+                expect = bs.Expect(me_e, D, D)
+            energy = np.real(expect.solve(False, cmps_e.center == 0))
+
+            #==== One time step ====#
+            if self.mpi is not None: self.mpi.barrier()
+            cmps = cmps0.deep_copy('cmp_mps')
+            me = make_me(mpo, cmps, 'CMP_TE')
+            te = bs.TimeEvolution(me, b2.VectorUBond([D]), b2.TETypes.TangentSpace)
+            te.krylov_subspace_size = krylov_size
+            te.krylov_conv_thrd = krylov_tol
+            te.hermitian = True
+            te.iprint = 0
+            t = time.perf_counter()
+            te.solve(2, +1j * dt / 2, cmps.center == 0, tol=exp_tol)
+            t_step = time.perf_counter() - t
+
+            #==== Free the objects of this option in reverse order ====#
+            me.remove_partition_files()
+            cmps.deallocate()
+            cmps.info.deallocate()
+            me_e.remove_partition_files()
+            cmps_e.deallocate()
+            cmps_e.info.deallocate()
+            mpo.deallocate()
+            
+            results.append({'algo':algo, 'cutoff':cutoff, 'mpo_bond_dims':mpo_bdims,
+                            'energy':energy, 't_build':None if cached else t_mpo,
+                            't_load':t_mpo if cached else None, 't_step':t_step})
+
+        #==== Summary ====#
+        e_ref = results[0]['energy']
+        print_section('Comparison of the time evolution MPOs')
+        _print('%-28s %12s %16s %16s %12s' % ('Algorithm / cutoff', 'Max. MPO D',
+                                               'Energy error', 'Build (s)', 'Step (s)'))
+        for r in results:
+            r['energy_error'] = r['energy'] - e_ref
+            name = ('default' if r['algo'] is None else r['algo']) + \
+                   f' / {r["cutoff"]:.1e}'
+            if r['t_build'] is None:
+                t_mpo = '%.2f (cache)' % r['t_load']
+            else:
+                t_mpo = '%.2f' % r['t_build']
+            _print('%-28s %12d %16.6e %16s %12.2f' %
+                   (name, max(r['mpo_bond_dims']), r['energy_error'], t_mpo,
+                    r['t_step']))
+        logbook.update({'te_mpo_comparison':results})
+        return logbook
+    #################################################
+
+
     #################################################
     def unordered_site_orbs(self):
         
@@ -564,11 +809,103 @@ class MYTDDMRG:
     #################################################
 
 
+    #################################################
+    def get_two_pdm(self, cpx_mps, mps, dmargin=0):
+        '''
+        Calculates the 2PDM of mps with block2's 2PDM MPO. For spin_symmetry = 'su2',
+        the spin-summed spatial 2PDM dm[i,j,k,l] = 
+        sum_{s,t} <a^+_{i,s} a^+_{j,t} a_{k,t} a_{l,s}> is returned. For 'sz', the spin
+        orbital 2PDM with the spin orbital index 2*i+s is returned. The orbital indices
+        are in the original (unreordered) order. Like get_one_pdm, the sweep changes
+        the gauge of mps, so pass a copy of the time-evolved MPS.
+        '''
+        if self.verbose >= 2:
+            _print('>>> START two-pdm <<<')
+        t = time.perf_counter()
+        if self.mpi is not None:
+            self.mpi.barrier()
+
+        max_bdim = max([x.n_states_total for x in mps.info.left_dims] +
+                       [x.n_states_total for x in mps.info.right_dims])
+        if mps.info.bond_dim < max_bdim:
+            mps.info.bond_dim = max_bdim
+
+        #==== 2PDM MPO ====#
+        pmpo = bs.PDM2MPOQC(self.hamil)
+        pmpo = bs.SimplifiedMPO(pmpo, bs.RuleQC())
+        if self.mpi is not None:
+            pmpo = bs.ParallelMPO(pmpo, self.pdmrule)
+
+        #==== 2PDM ====#
+        pme = bs.MovingEnvironment(pmpo, mps, mps, "2PDM")
+        pme.init_environments(False)
+        D = mps.info.bond_dim + dmargin
+        if cpx_mps and comp == 'hybrid':
+            expect = brs.ComplexExpect(pme, D, D)
+        else:
+            expect = bs.Expect(pme, D, D)
+        expect.iprint = max(self.verbose - 1, 0)
+        expect.solve(True, mps.center == 0)
+        if spin_symmetry == 'su2':
+            dm = np.array(expect.get_2pdm_spatial(self.n_sites)).copy()
+            if self.ridx is not None:
+                dm = dm[self.ridx,:,:,:][:,self.ridx,:,:][:,:,self.ridx,:][:,:,:,self.ridx]
+        elif spin_symmetry == 'sz':
+            dm = np.array(expect.get_2pdm(self.n_sites)).copy()
+            if self.ridx is not None:
+                sidx = np.stack((2*self.ridx, 2*self.ridx+1), axis=1).reshape(-1)
+                dm = dm[sidx,:,:,:][:,sidx,:,:][:,:,sidx,:][:,:,:,sidx]
+
+        mps.save_data()
+        pmpo.deallocate()
+        if self.verbose >= 2:
+            _print('>>> COMPLETE two-pdm | Time = %.2f <<<' %
+                   (time.perf_counter() - t))
+        return dm
+    #################################################
+
+
+    #################################################
+    def get_orbital_entropy(self, mps, pairs=None):
+        '''
+        Calculates the single-orbital entropies s1[i] and the mutual information 
+        I(i,j) = (s1[i] + s1[j] - s2[i,j]) / 2 from the one- and two-orbital reduced 
+        density matrices of mps (see DMRGDriver.get_orbital_entropies). The orbital 
+        indices are in the original (unreordered) order. Returns s1 and the mutual
+        information of the 1-based orbital pairs in pairs (all pairs i < j if pairs is
+        None). If pairs is an empty list, the two-orbital density matrices are not
+        calculated. The sweeps change the gauge of mps, so pass a copy of the 
+        time-evolved MPS.
+        '''
+        n = self.n_sites
+        if pairs is None:
+            pairs = [(i+1, j+1) for i in range(0, n) for j in range(i+1, n)]
+        oidx = np.arange(0, n) if self.ridx is None else self.ridx
+
+        s1 = np.array(self.b2driver.get_orbital_entropies(mps, orb_type=1, iprint=0))
+        s1 = s1[oidx]
+        if len(pairs) == 0:
+            return s1, np.zeros(0)
+        s2 = np.array(self.b2driver.get_orbital_entropies(mps, orb_type=2, iprint=0))
+        s2 = s2[oidx,:][:,oidx]
+        mi = np.array([0.5 * (s1[i-1] + s1[j-1] - s2[i-1,j-1]) for i, j in pairs])
+        return s1, mi
+    #################################################
+
+
     #################################################
     def dmrg(self, logbook_in, bond_dims, noises, n_steps=30, dav_tols=1E-5, conv_tol=1E-7, 
              cutoff=1E-14, occs=None, bias=1.0, outmps_dir0=None, outmps_name='GS_MPS_INFO',
-             save_1pdm=False, flip_spect=False, mrci_info=None):
-        """Ground-State DMRG."""
+             save_1pdm=False, flip_spect=False, mrci_info=None, deadline=None,
+             stop_signals=None):
+        """
+        Ground-State DMRG.
+        deadline, stop_signals = If either is not None, the sweeps are run one at a 
+                                 time and stopped early when one of the signals is
+                                 received or when the next sweep would not finish 
+                                 before deadline (see te_stop_guard). The MPS is 
+                                 then saved as usual.
+        """
         logbook = logbook_in.copy()
 
         if self.verbose >= 2:
@@ -625,10 +962,7 @@ class MYTDDMRG:
 
         # MPO
         tx = time.perf_counter()
-        mpo = bs.MPOQC(self.hamil, b2.QCTypes.Conventional)
-        mpo = bs.SimplifiedMPO(mpo, bs.RuleQC(), True, True,
-                               b2.OpNamesSet((b2.OpNames.R, b2.OpNames.RD)))
-        self.mpo_orig = mpo
+        mpo = self.get_mpo_orig()
 
         #==== Flip spectrum if requested ====#
         if flip_spect:
@@ -677,7 +1011,36 @@ class MYTDDMRG:
         dmrg.decomp_type = b2.DecompositionTypes.SVD
         dmrg.iprint = max(self.verbose - 1, 0)
         dmrg.cutoff = cutoff
-        dmrg.solve(n_steps, mps.center == 0, conv_tol)
+        if deadline is None and stop_signals is None:
+            dmrg.solve(n_steps, mps.center == 0, conv_tol)
+        else:
+            #==== Sweep by sweep so that the run can be stopped in between ====#
+            guard = te_stop_guard(deadline, stop_signals, use_mpi=self.mpi is not None)
+            e_prev = None
+            for isw in range(0, n_steps):
+                tx = time.perf_counter()
+                dmrg.bond_dims = b2.VectorUBond([bond_dims[min(isw, len(bond_dims)-1)]])
+                dmrg.noises = b2.VectorDouble([noises[min(isw, len(noises)-1)]])
+                dmrg.davidson_conv_thrds = \
+                    b2.VectorDouble([dav_tols[min(isw, len(dav_tols)-1)]])
+                dmrg.solve(1, mps.center == 0, 0.0)
+                guard.step_done(time.perf_counter() - tx)
+                
+                #== Same convergence criterion as in DMRG.solve ==#
+                e = dmrg.energies[-1][0]
+                if e_prev is not None and abs(e - e_prev) < conv_tol and \
+                   isw >= len(bond_dims)-1 and isw >= len(noises)-1:
+                    break
+                e_prev = e
+                
+                reason = guard.check()
+                if reason is not None:
+                    print_warning(f'The ground state DMRG is stopped after {isw+1} ' +
+                                  f'sweeps because of {reason}. The MPS saved below is ' +
+                                  'not converged.')
+                    logbook.update({'gs:stopped':reason})
+                    break
+            guard.release()
 
         self.gs_energy = dmrg.energies[-1][0]
         self.bond_dim = bond_dims[-1]
@@ -900,13 +1263,7 @@ class MYTDDMRG:
                 
         #==== Build Hamiltonian MPO (to provide noise ====#
         #====      for Linear.solve down below)       ====#
-        if self.mpo_orig is None:
-            mpo = bs.MPOQC(self.hamil, b2.QCTypes.Conventional)
-            mpo = bs.SimplifiedMPO(mpo, bs.RuleQC(), True, True,
-                                   b2.OpNamesSet((b2.OpNames.R, b2.OpNames.RD)))
-            self.mpo_orig = mpo
-        else:
-            mpo = self.mpo_orig
+        mpo = self.get_mpo_orig()
         if self.mpi is not None:
             mpo = bs.ParallelMPO(mpo, self.prule)
         print_MPO_bond_dims(mpo, 'Hamiltonian')
@@ -1253,81 +1610,53 @@ class MYTDDMRG:
     #################################################
     def save_time_info(self, save_dir, t, it, t_sp, i_sp, normsq, ac, save_mps,
                        save_1pdm, rs, re, ro, dm):
-
-        def save_time_info0(save_dir, t, it, t_sp, i_sp, normsq, ac, save_mps,
-                            save_1pdm, rs, re, ro, dm):
-            yn_bools = ('No','Yes')
-            au2fs = 2.4188843265e-2   # a.u. of time to fs conversion factor
-            with open(save_dir + '/TIME_INFO', 'w') as t_info:
-                t_info.write(' Reasons printed = \n')
-                if rs: t_info.write('    * sampling time \n')
-                if re: t_info.write('    * last time point \n')
-                if ro: t_info.write('    * probe file \n')
-                t_info.write(' Actual sampling time = (%d, %10.6f a.u. / %10.6f fs)\n' %
-                             (it, t, t*au2fs))
-                t_info.write(' Requested sampling time = (%d, %10.6f a.u. / %10.6f fs)\n' %
-                             (i_sp, t_sp, t_sp*au2fs))
-                t_info.write(' MPS norm square = %19.14f\n' % normsq)
-                t_info.write(' Autocorrelation = (%19.14f, %19.14f)\n' % (ac.real, ac.imag))
-                t_info.write(f' Is MPS saved at this time?  {yn_bools[save_mps]}\n')
-                t_info.write(f' Is 1PDM saved at this time?  {yn_bools[save_1pdm]}\n')
-                if save_1pdm:
-                    natocc_a = eigvalsh(dm[0,:,:])
-                    natocc_b = eigvalsh(dm[1,:,:])
-                    t_info.write(' 1PDM info:\n')
-                    t_info.write('    Trace (alpha,beta) = (%16.12f,%16.12f) \n' %
-                                 ( np.trace(dm[0,:,:]).real, np.trace(dm[1,:,:]).real ))
-                    t_info.write('    ')
-                    for i in range(0, 4+4*20): t_info.write('-')
-                    t_info.write('\n')
-                    t_info.write('    ' +
-                                 '%4s'  % 'No.' + 
-                                 '%20s' % 'Alpha MO occ.' +
-                                 '%20s' % 'Beta MO occ.' +
-                                 '%20s' % 'Alpha natorb occ.' +
-                                 '%20s' % 'Beta natorb occ.' + '\n')
-                    t_info.write('    ')
-                    for i in range(0, 4+4*20): t_info.write('-')
-                    t_info.write('\n')
-                    for i in range(0, dm.shape[1]):
-                        t_info.write('    ' +
-                                     '%4d'  % i + 
-                                     '%20.12f' % np.diag(dm[0,:,:])[i].real +
-                                     '%20.12f' % np.diag(dm[1,:,:])[i].real +
-                                     '%20.12f' % natocc_a[i].real +
-                                     '%20.12f' % natocc_b[i].real + '\n')
-                
         if self.mpi is not None:
             if self.mpi.rank == 0:
-                save_time_info0(save_dir, t, it, t_sp, i_sp, normsq, ac, save_mps, save_1pdm,
+                write_time_info(save_dir, t, it, t_sp, i_sp, normsq, ac, save_mps, save_1pdm,
                                 rs, re, ro, dm)
             self.mpi.barrier()
         else:
-            save_time_info0(save_dir, t, it, t_sp, i_sp, normsq, ac, save_mps, save_1pdm,
+            write_time_info(save_dir, t, it, t_sp, i_sp, normsq, ac, save_mps, save_1pdm,
                             rs, re, ro, dm)
     #################################################
 
 
     #################################################
     def save_time_info_ow(self, dir_ow, t, it, t_sp, i_sp, normsq, ac):
-
-        def save_time_info_ow0(dir_ow, t, it, t_sp, i_sp, normsq, ac):
-            yn_bools = ('No','Yes')
-            au2fs = 2.4188843265e-2   # a.u. of time to fs conversion factor
-            with open(dir_ow + '/TIME_INFO', 'w') as t_info:
-                t_info.write(' Actual sampling time = (%d, %10.6f a.u. / %10.6f fs)\n' %
-                             (it, t, t*au2fs))
-                t_info.write(' Requested sampling time = (%d, %10.6f a.u. / %10.6f fs)\n' %
-                             (i_sp, t_sp, t_sp*au2fs))
-                t_info.write(' MPS norm square = %19.14f\n' % normsq)
-                t_info.write(' Autocorrelation = (%19.14f, %19.14f)\n' % (ac.real, ac.imag))
-                            
         if self.mpi is not None:
             if self.mpi.rank == 0:
-                save_time_info_ow0(dir_ow, t, it, t_sp, i_sp, normsq, ac)
+                write_time_info_ow(dir_ow, t, it, t_sp, i_sp, normsq, ac)
             self.mpi.barrier()
         else:
-            save_time_info_ow0(dir_ow, t, it, t_sp, i_sp, normsq, ac)
+            write_time_info_ow(dir_ow, t, it, t_sp, i_sp, normsq, ac)
+    #################################################
+
+
+    #################################################
+    def save_te_state(self, dir_ow, state):
+        '''
+        Saves the bookkeeping quantities of time_propagate (time and sampling indices,
+        the content of the printer objects, and the TimeEvolution settings) that are
+        needed to resume the propagation from the MPS saved under dir_ow.
+        '''
+        if self.mpi is None or self.mpi.rank == 0:
+            write_te_state(dir_ow, state)
+        if self.mpi is not None:
+            self.mpi.barrier()
+    #################################################
+
+
+    #################################################
+    def load_te_state(self, dir_ow):
+        import pickle
+        fpath = dir_ow + '/TE_STATE'
+        assert os.path.isfile(fpath), \
+            f'The time evolution state file {fpath} cannot be found. Resuming a time ' + \
+            'propagation requires a checkpoint saved with the \'overwrite\' option for ' + \
+            'save_mps.'
+        with open(fpath, 'rb') as f:
+            state = pickle.load(f)
+        return state
     #################################################
 
 
@@ -1360,27 +1689,12 @@ class MYTDDMRG:
 
     #################################################
     def read_probe_file(self, drt, fc):
-        #==== Get the list of files in drt ====#
-        fl = glob.glob(drt + '/probe-*')
-        prefixlen = len('probe-')
+        #==== Determine if the probe file for the fc-th step exists ====#
+        # Only the exact name is checked so that no directory scan is needed at every
+        # time step. For more options, use the control channel (te_control_channel).
         goodfile, save_mps, save_1pdm = False, False, False
-
-        #==== Return when no probe file is found ====#
-        if len(fl) == 0:
-            return False, False, False
-
-        readit = False
-        for f in fl:
-            #==== Strip the directory name ====#
-            fn = os.path.basename(f)
-
-            #==== Determine if the probe file for the fc-th step exists ====#
-            if fn[prefixlen:].isdigit():
-                fc0 = int(fn[prefixlen:])
-                if fc0 == fc:
-                    fn_full = f
-                    readit = True
-                    break
+        fn_full = drt + '/probe-' + str(fc)
+        readit = os.path.isfile(fn_full)
 
         truel =  ('true',  't', '1', 'yes', 'y')
         falsel = ('false', 'f', '0',  'no', 'n')
@@ -1435,9 +1749,116 @@ class MYTDDMRG:
                        save_npy=False, in_singlet_embed=False, se_nel_site=None, 
                        mrci_info=None, bo_pairs=None, prefit=False, prefit_bond_dims=None, 
                        prefit_nsteps=None, prefit_noises=None, prefit_conv_tol=None, 
-                       prefit_cutoff=None, verbosity=6):
+                       prefit_cutoff=None, resume=False, adaptive_dt=None, obs_pipeline='sync',
+                       ac_stride=1, bond_dim_policy=None,
+                       control=False, deadline=None, stop_signals=None, save_perf=False,
+                       ac_ref=None, subspace_expansion=None, pdm2_single=False,
+                       orb_entropy=None, mps_archive=False, mps_compression=None,
+                       verbosity=6):
         '''
-        Coming soon
+        Propagates the MPS in inmps_dir0/inmps_name (default directory is the 
+        scratch) in time from tinit to tmax with the time step dt0 using the 
+        time-dependent Hamiltonian MPO and the propagation method `method` of block2
+        (e.g. TDVP or RK4) with the bond dimension max_bond_dim. At every time step,
+        the autocorrelation function is printed into <prefix>.ac. At the sampling 
+        times in t_sample, the MPS, the 1PDM, the 2PDM, and other observables are 
+        saved into the tevo-XXXX directories of <prefix>.sample according to the 
+        options below. The propagation can be resumed from a saved MPS with resume.
+        Returns logbook updated with the propagation results.
+
+        save_2pdm, pdm2_single:
+           If save_2pdm is True, the 2PDM (see get_two_pdm) is calculated at the 
+           sampling times and saved into 2pdm.npz in the corresponding tevo-XXXX
+           directory, packed by its permutation symmetries (see util_qm.pack_2pdm),
+           in single precision if pdm2_single is True. Use util_qm.load_2pdm to load
+           it.
+        mps_archive:
+           If True, the MPSs saved in the tevo-XXXX directories (save_mps='sampled' or
+           the probe file) are written as single file archives (see 
+           util_mps.saveMPStoArchive) named mps.mpsar instead of as many files.
+        mps_compression:
+           If not None, the MPSs saved in the tevo-XXXX directories are compressed 
+           with this method, e.g. 'zstd', 'lz4', 'zlib', or {'method':'zstd', 
+           'level':5} (see util_compress.get_codec). They are decompressed 
+           transparently by loadMPSfromDir. Cannot be combined with mps_archive.
+        orb_entropy:
+           If not None, a dictionary that turns on the calculation of the single-
+           orbital entropies and the mutual information (see get_orbital_entropy) at 
+           every `every`-th sampling time (default 1). `pairs` is a list of 1-based
+           orbital pairs whose mutual information is printed (default None, all pairs).
+           With pairs = [], only the single-orbital entropies are calculated, which 
+           avoids the two-orbital density matrices. The results are printed into
+           <prefix>.oent and <prefix>.oent.npz. It requires the full complex type.
+        resume:
+           If True, the propagation continues from the checkpoint stored in 
+           <prefix>.mps_t by an earlier run that used save_mps='overwrite'. The initial
+           MPS is still loaded from inmps_dir0/inmps_name because it is needed for the
+           autocorrelation. All other input parameters must be the same as those of 
+           the earlier run.
+        adaptive_dt:
+           If not None, a dictionary of the keyword arguments of te_step_controller
+           (except dt0 and order), which turns on adaptive time steps. The first time
+           step is dt0 (or dt0[0] if dt0 is a list), afterwards it is adjusted based on
+           the local error estimated by step doubling, which makes every step about 
+           three times as expensive. The time points land exactly on the elements of
+           t_sample and on tmax.
+        obs_pipeline:
+           'async' or 'sync'. With 'async', the post-processing of the 1PDM at the 
+           sampling times (partial charges, bond orders, multipoles, and the output 
+           files) is done by a worker process forked from MPI rank 0 so that the 
+           propagation continues right after the 1PDM is calculated. Forking after 
+           MPI_Init is not supported by many MPI libraries, hence 'async' falls back
+           to 'sync' when MPI is used.
+        ac_stride:
+           The autocorrelation is calculated and printed every ac_stride time steps.
+           It is also calculated, but not printed into <prefix>.ac, at the other time
+           points where quantities are saved, so that the time points in <prefix>.ac 
+           remain equidistant for observables.fourier (with a constant dt). Every
+           evaluation rebuilds the environments of <psi(0)|psi(t)> from scratch, since
+           each of them contains psi(t) tensors, hence a stride is the only way to 
+           reduce this cost.
+        bond_dim_policy:
+           If not None, a dictionary of the keyword arguments of te_bond_dim_policy,
+           which turns on a bond dimension that changes during the propagation based
+           on the discarded weight. D_init defaults to the bond dimension of the 
+           initial MPS, D_max to max_bond_dim, and mem_max to 90% of the double 
+           memory stack.
+        control:
+           If True, a named pipe <prefix>.sample/control is created through which
+           commands can be sent to the running propagation, see te_control_channel
+           for the available commands.
+        deadline, stop_signals:
+           If either is not None, the propagation is stopped as if the last time point
+           were reached when one of the signals (e.g. 'SIGTERM') is received, or when
+           another step would not finish before deadline (see te_stop_guard). Use 
+           save_mps='overwrite' so that the propagation can be resumed afterwards.
+        save_perf:
+           If True, a JSON record is written into <prefix>.perf.jsonl for every time
+           step. It contains the wall times (in seconds) of the propagation,
+           autocorrelation, 1PDM, observables (the part that blocks the propagation),
+           and MPS saving, the bond dimensions, the discarded weight, the peak memory
+           usage (in bytes) of block2 (that of the time step if bond_dim_policy is 
+           used, otherwise since the start of the program), and the size of the 
+           scratch directory (in bytes). The latter requires a walk through the 
+           scratch, hence it is only measured at the time points where quantities are
+           saved and it is null otherwise. The wall times of the 2PDM and of the 
+           orbital entropies are also included.
+        ac_ref:
+           If not None, a tuple (dir, name, cpx, multi) of the MPS used as the bra of
+           the autocorrelation instead of the initial MPS, where dir/name is its MPS 
+           info file, and cpx and multi have the same meanings as inmps_cpx and 
+           inmps_multi. It is used when the propagation starts from an intermediate 
+           time (e.g. a parareal time slice) while the autocorrelation is still 
+           referred to the state at the original starting time.
+        subspace_expansion:
+           If not None, a dictionary that turns on the single-site TDVP with a global
+           subspace expansion. The time-evolved MPS is made 1-site so that the time
+           steps have one-site cost, and before every `every`-th time step (default 1)
+           the bond bases are enlarged up to the current bond dimension by a perturbative
+           compression of the MPS onto itself, in which H|psi> (the first Krylov vector)
+           enters the reduced density matrices with the weight `noise` (default 1.0E-5).
+           `nsteps` (default 1) is the number of sweeps of this compression. It requires
+           method = TangentSpace and the full complex type.
         '''
 
         #OLD_CPX if self.mpi is not None:
@@ -1453,33 +1874,80 @@ class MYTDDMRG:
         else:
             inmps_dir = inmps_dir0
         assert save_mps=='overwrite' or save_mps=='sampled' or save_mps=='no'
+        assert not (mps_archive and mps_compression is not None), \
+            'mps_archive and mps_compression cannot be used together.'
+        get_codec(mps_compression)     # Fails early if the method is unavailable.
         sample_dir = logbook['workdir'] + '/' + prefix + '.sample'
         mps_dir_ow = logbook['workdir'] + '/' + prefix + '.mps_t'
         logbook.update({'sample_dir':sample_dir})
         if save_mps == 'overwrite': logbook.update({'mps_dir_ow':mps_dir_ow})
-        if self.mpi is not None:
-            if self.mpi.rank == 0:
-                if save_mps == 'overwrite': mkDir(mps_dir_ow)
-                self.mpi.barrier()
-        else:
-            if save_mps == 'overwrite': mkDir(mps_dir_ow)
+        ckpt = None
+        if save_mps == 'overwrite':
+            ckpt = mps_checkpoint(mps_dir_ow, self.mpi)      # 1)
+        # NOTES:
+        # 1) mps_dir_ow is a link to the last complete checkpoint, see 
+        #    util_mps.mps_checkpoint.
             
 
         if comp == 'full':
             assert inmps_cpx, "When complex type is 'full', inmps_cpx must be true, " + \
                 'that is, the initial MPS must be complex.'
 
+        #==== Checkpoint from which the propagation is resumed ====#
+        if resume:
+            te_state = self.load_te_state(mps_dir_ow)
+            _print('The time propagation will be resumed from the checkpoint in ' +
+                   mps_dir_ow + ' saved at time point %d (%.6f a.u.).' %
+                   (te_state['it'], te_state['tt']))
+
             
         #==== Construct the time vector ====#
-        ts = self.get_te_times(dt0, tmax, tinit)
-        n_steps = len(ts)
+        if adaptive_dt is None:
+            ts = self.get_te_times(dt0, tmax, tinit)
+            n_steps = len(ts)
+            _print('Time points (a.u.) = ', ts)
+        else:
+            order = 4 if method == b2.TETypes.RK4 else 2
+            dtctl = te_step_controller(dt0[0] if type(dt0) is list else dt0,
+                                       order=order, **adaptive_dt)
+            ts = [tinit]     # Time points are appended during the propagation.
+            n_steps = dtctl.max_steps(tinit, tmax)
+            _print('Adaptive time steps are used with:')
+            _print('  local error tolerance = %.3e' % dtctl.tol)
+            _print('  min. and max. time steps (a.u.) = %.5f, %.5f' %
+                   (dtctl.dt_min, dtctl.dt_max))
+            _print('  step rejection = ', dtctl.reject)
         ndigit = len(str(n_steps))
-        _print('Time points (a.u.) = ', ts)
+        if resume:
+            nck = te_state['it'] + 1
+            if adaptive_dt is None:
+                assert len(ts) >= nck and np.allclose(ts[0:nck], te_state['ts'][0:nck]), \
+                    'The time points of the current run are inconsistent with those of ' + \
+                    'the run that produced the checkpoint in ' + mps_dir_ow + '. Check ' + \
+                    'the values of dt, tmax, and tinit.'
+            else:
+                assert 'dtctl' in te_state, \
+                    'The checkpoint in ' + mps_dir_ow + ' was not produced with adaptive ' + \
+                    'time steps.'
+                ts = list(te_state['ts'][0:nck])
+                dtctl.restore(te_state['dtctl'])
             
         #==== Initiate autocorrelations file ====#
         ac_print = print_autocorrelation(prefix, len(ts), save_txt, save_npy)
         if self.mpi is None or self.mpi.rank == 0:
-            ac_print.header()
+            if resume:
+                ac_print.restore(te_state['ac_print'])
+            else:
+                ac_print.header()
+        
+        #==== Initiate performance telemetry file ====#
+        perf_print = None
+        if save_perf and (self.mpi is None or self.mpi.rank == 0):
+            perf_print = print_te_perf(prefix)
+            if resume:
+                perf_print.restore(te_state['it'])
+            else:
+                perf_print.header()
         
         #==== Initiate Lowdin partial charges file ====#
         if t_sample is not None:
@@ -1487,7 +1955,10 @@ class MYTDDMRG:
             q_print = print_td_pcharge(atom_symbol, prefix, len(t_sample), 8, save_txt,
                                        save_npy)
             if self.mpi is None or self.mpi.rank == 0:
-                q_print.header()
+                if resume:
+                    q_print.restore(te_state['q_print'])
+                else:
+                    q_print.header()
             if self.mpi is not None: self.mpi.barrier()
 
         #==== Initiate Lowdin bond order file ====#
@@ -1495,26 +1966,43 @@ class MYTDDMRG:
             bo_print = print_td_bo(bo_pairs, atom_symbol, prefix, len(t_sample), 8, 
                                    save_txt, save_npy)
             if self.mpi is None or self.mpi.rank == 0:
-                bo_print.header()
+                if resume:
+                    bo_print.restore(te_state['bo_print'])
+                else:
+                    bo_print.header()
             if self.mpi is not None: self.mpi.barrier()
 
         #==== Initiate multipole components file ====#
         if t_sample is not None:
             mp_print = print_td_mpole(prefix, len(t_sample), save_txt, save_npy)
             if self.mpi is None or self.mpi.rank == 0:
-                mp_print.header()
+                if resume:
+                    mp_print.restore(te_state['mp_print'])
+                else:
+                    mp_print.header()
+            if self.mpi is not None: self.mpi.barrier()
+                
+        #==== Initiate orbital entropy file ====#
+        if t_sample is not None and orb_entropy is not None:
+            assert comp == 'full', 'The orbital entropies require the full complex type.'
+            oent_every = orb_entropy.get('every', 1)
+            oent_pairs = orb_entropy.get('pairs', None)
+            if oent_pairs is None:
+                oent_pairs = [(i+1, j+1) for i in range(0, self.n_sites)
+                              for j in range(i+1, self.n_sites)]
+            oent_print = print_td_entropy(self.n_sites, oent_pairs, prefix,
+                                          len(t_sample), save_txt, save_npy)
+            if self.mpi is None or self.mpi.rank == 0:
+                if resume:
+                    oent_print.restore(te_state['oent_print'])
+                else:
+                    oent_print.header()
             if self.mpi is not None: self.mpi.barrier()
                 
         #==== Prepare Hamiltonian MPO ====#
         if self.mpi is not None:
             self.mpi.barrier()
-        if self.mpo_orig is None:
-            mpo = bs.MPOQC(self.hamil, b2.QCTypes.Conventional)
-            mpo = bs.SimplifiedMPO(mpo, bs.RuleQC(), True, True,
-                                   b2.OpNamesSet((b2.OpNames.R, b2.OpNames.RD)))
-            self.mpo_orig = mpo
-        else:
-            mpo = self.mpo_orig
+        mpo = self.get_mpo_orig()
         #need? mpo = IdentityAddedMPO(mpo) # hrl: alternative
         if self.mpi is not None:
             mpo = bs.ParallelMPO(mpo, self.prule)
@@ -1601,23 +2089,64 @@ class MYTDDMRG:
             # Just duplicate the initial MPS if it is complex, regardless of
             # whether it is of multi MPS or normal MPS type. The comp type
             # does not matter either here.
-            cmps = mps.deep_copy('mps_t')
+            if not resume:
+                cmps = mps.deep_copy('mps_t')
             cmps_t0 = mps.deep_copy('mps_t0')
         else:
             # If the initial MPS is real (impliying comp=False), then use a
             # multi MPS to transform it to a complex multi MPS.
-            cmps = bs.MultiMPS.make_complex(mps, "mps_t")
+            if not resume:
+                cmps = bs.MultiMPS.make_complex(mps, "mps_t")
             cmps_t0 = bs.MultiMPS.make_complex(mps, "mps_t0")
+
+        #==== Load the reference MPS of the autocorrelation ====#
+        if ac_ref is not None:
+            _print('Loading the reference MPS of the autocorrelation from ' + ac_ref[0] +
+                   '/' + ac_ref[1])
+            ref_type = {'type':'multi', 'nroots':2} if ac_ref[3] else {'type':'normal'}
+            ref_mps, _, _ = \
+                loadMPSfromDir(ac_ref[0], ac_ref[1], ac_ref[2], ref_type, idMPO,
+                               cached_contraction=True, MPI=self.mpi,
+                               prule=self.prule if self.mpi is not None else None)
+            if ac_ref[2]:
+                cmps_t0 = ref_mps.deep_copy('mps_t0')
+            else:
+                cmps_t0 = bs.MultiMPS.make_complex(ref_mps, 'mps_t0')
+
+        #==== Load the checkpointed MPS to be resumed ====#
+        if resume:
+            _print('Loading the checkpointed MPS from ' + mps_dir_ow)
+            if comp == 'hybrid':
+                ckpt_type = {'type':'multi', 'nroots':2}
+            elif comp == 'full':
+                ckpt_type = {'type':'normal'}
+            cmps, _, _ = \
+                loadMPSfromDir(mps_dir_ow, 'mps_info.bin', True, ckpt_type, idMPO,
+                               cached_contraction=True, MPI=self.mpi,
+                               prule=self.prule if self.mpi is not None else None)
         _print('Initial canonical form (ortho. center) = ' +
                f'{cmps.canonical_form} ({cmps.center})')
 
 
         #==== Take care of the algorithm type (1- or 2- site) ====#
-        if mps.dot != 1: # change to 2dot
-            cmps.load_data()
+        if subspace_expansion is not None:
+            # The bond dimension grows through the subspace expansions instead.
+            assert method == b2.TETypes.TangentSpace, 'The subspace expansion requires ' + \
+                'method = TangentSpace.'
+            assert comp == 'full', 'The subspace expansion requires the full complex type.'
+            gse_every = subspace_expansion.get('every', 1)
+            gse_noise = subspace_expansion.get('noise', 1.0E-5)
+            gse_nsteps = subspace_expansion.get('nsteps', 1)
+            for x in ([cmps_t0] if resume else [cmps, cmps_t0]):
+                mps_to_one_dot(x, idMPO.tf.opf.cg, 
+                               self.prule if self.mpi is not None else None)
+        elif mps.dot != 1: # change to 2dot
+            if not resume:
+                cmps.load_data()
             cmps_t0.load_data()
             if comp == 'hybrid':
-                cmps.canonical_form = 'M' + cmps.canonical_form[1:]
+                if not resume:
+                    cmps.canonical_form = 'M' + cmps.canonical_form[1:]
                 cmps_t0.canonical_form = 'M' + cmps_t0.canonical_form[1:]
             cmps.dot = 2
             cmps_t0.dot = 2
@@ -1628,23 +2157,95 @@ class MYTDDMRG:
             _print('Algorithm type = 2-site')
         elif cmps.dot == 1:
             _print('Algorithm type = 1-site')
+        if subspace_expansion is not None:
+            _print(f'Global subspace expansion every {gse_every} time steps, ' +
+                   f'noise = {gse_noise:.2e}, sweeps = {gse_nsteps}')
 
 
         #==== Initial setups for autocorrelation ====#
-        idME = bs.MovingEnvironment(idMPO, cmps_t0, cmps, "acorr")
+        def make_acorr(cmps):
+            idME = bs.MovingEnvironment(idMPO, cmps_t0, cmps, "acorr")
+            if comp == 'hybrid':
+                acorr = brs.ComplexExpect(idME, max_bond_dim, max_bond_dim)
+            elif comp == 'full':
+                acorr = bs.Expect(idME, max_bond_dim, max_bond_dim)
+            return idME, acorr
+        idME, acorr = make_acorr(cmps)
+
+        #==== <bra|ket>, e.g. <psi|psi> when the bra of the autocorr. is ac_ref ====#
+        def calc_overlap(bra, ket, tag):
+            nME = bs.MovingEnvironment(idMPO, bra, ket, tag)
+            nME.center = ket.center
+            nME.init_environments()
+            if comp == 'hybrid':
+                nexp = brs.ComplexExpect(nME, max_bond_dim, max_bond_dim)
+            elif comp == 'full':
+                nexp = bs.Expect(nME, max_bond_dim, max_bond_dim)
+            return nexp.solve(False)
+        def calc_normsq(cmps):
+            return calc_overlap(cmps, cmps, "normsq")
             
         
+        #==== Bond dimension of the time-evolved MPS ====#
+        if bond_dim_policy is None:
+            te_bond_dim = max_bond_dim
+        else:
+            bdpol_args = dict(bond_dim_policy)
+            D_init = bdpol_args.pop('D_init', mps.info.bond_dim)
+            bdpol_args.setdefault('D_max', max_bond_dim)
+            bdpol_args.setdefault('mem_max', 0.9*self.dsize)
+            bdpol = te_bond_dim_policy(D_init, **bdpol_args)
+            if resume:
+                bdpol.restore(te_state['bdpol'])
+            te_bond_dim = bdpol.D
+            _print('The bond dimension of the time-evolved MPS is adjusted with:')
+            _print('  discarded weight budget = %.3e' % bdpol.trunc_tol)
+            _print('  min. and max. bond dimensions = %d, %d' % (bdpol.D_min, bdpol.D_max))
+            _print('  memory ceiling = %.2f Megabytes' % (bdpol.mem_max/1.0e6))
+
+            def step_peak_memory():
+                # The peak memory of the last time step (the peak is reset at the 
+                # start of every step), the largest one among the MPI ranks.
+                dmain, dseco, _, _ = b2.Global.frame.peak_used_memory
+                mem = int(dmain + dseco)
+                if self.mpi is not None:
+                    from mpi4py import MPI as MPIpy
+                    mem = MPIpy.COMM_WORLD.allreduce(mem, op=MPIpy.MAX)
+                return mem
+
+        
         #==== Initial setups for time evolution ====#
-        #ipsh()
-        #me = bs.MovingEnvironment(mpo, cmps, cmps, "TE")
-        me = bs.MovingEnvironment(self.te_mpo, cmps, cmps, "TE")
-        #ipsh()
-        self.delayed_contraction = True
-        if self.delayed_contraction:
-            me.delayed_contraction = b2.OpNamesSet.normal_ops()
-        me.cached_contraction = True
-        me.save_partition_info = True
-        me.init_environments(self.verbose >= 2)
+        def make_te(cmps, tag="TE"):
+            #me = bs.MovingEnvironment(mpo, cmps, cmps, "TE")
+            me = bs.MovingEnvironment(self.te_mpo, cmps, cmps, tag)
+            self.delayed_contraction = True
+            if self.delayed_contraction:
+                me.delayed_contraction = b2.OpNamesSet.normal_ops()
+            me.cached_contraction = True
+            me.save_partition_info = True
+            me.init_environments(self.verbose >= 2)
+
+            if method == b2.TETypes.TangentSpace:
+                te = bs.TimeEvolution(me, b2.VectorUBond([te_bond_dim]), method)
+                te.krylov_subspace_size = krylov_size
+                te.krylov_conv_thrd = krylov_tol
+            elif method == b2.TETypes.RK4:
+                te = bs.TimeEvolution(me, b2.VectorUBond([te_bond_dim]), method,
+                                      n_sub_sweeps_init)
+            te.cutoff = cutoff                    # for tiny systems, this is important
+            te.iprint = verbosity
+            te.normalize_mps = normalize
+            te.hermitian = True       # bcause CPX
+            return me, te
+        me, te = make_te(cmps)
+
+        def te_step(te, cmps, dt_):
+            if method == b2.TETypes.RK4:
+                te.solve(1, +1j * dt_, cmps.center == 0, tol=exp_tol)
+                te.n_sub_sweeps = n_sub_sweeps
+            elif method == b2.TETypes.TangentSpace:
+                te.solve(2, +1j * dt_ / 2, cmps.center == 0, tol=exp_tol)
+                te.n_sub_sweeps = 1
 
 
         #==== Time evolution ====#
@@ -1656,17 +2257,169 @@ class MYTDDMRG:
                    f'  of the initial MPS ({mps.info.bond_dim:d}). This is in general not ' +
                    'recommended since the time evolution will always excite \n' +
                    '  correlation effects that are absent in the initial MPS.')
-        if method == b2.TETypes.TangentSpace:
-            te = bs.TimeEvolution(me, b2.VectorUBond([max_bond_dim]), method)
-            te.krylov_subspace_size = krylov_size
-            te.krylov_conv_thrd = krylov_tol
-        elif method == b2.TETypes.RK4:
-            te = bs.TimeEvolution(me, b2.VectorUBond([max_bond_dim]), method,
-                                  n_sub_sweeps_init)
-        te.cutoff = cutoff                    # for tiny systems, this is important
-        te.iprint = verbosity
-        te.normalize_mps = normalize
-        te.hermitian = True       # bcause CPX
+        if resume:
+            te.n_sub_sweeps = te_state['te']['n_sub_sweeps']
+
+
+        #==== Quantities needed to resume from a checkpoint ====#
+        def get_te_state(it):
+            state = {'it':it, 'tt':ts[it], 'ts':list(ts[0:it+1]), 'i_sp':i_sp, 
+                     'te':{'n_sub_sweeps':te.n_sub_sweeps},
+                     'ac_print':ac_print.get_state()}
+            if t_sample is not None:
+                state['issampled'] = issampled.copy()
+            if adaptive_dt is not None:
+                state['dtctl'] = dtctl.get_state()
+            if bond_dim_policy is not None:
+                state['bdpol'] = bdpol.get_state()
+            return state
+
+        #==== Checkpoint of the MPS at the sampling times ====#
+        def save_checkpoint(cmps):
+            stage_dir = ckpt.begin()
+            snap = cmps.deep_copy('mps_ckpt')          # 1)
+            if self.mpi is not None: self.mpi.barrier()
+            snap.save_data()
+            nroots = cmps.nroots if isinstance(cmps, bs.MultiMPS) else None
+            src = get_mps_files(snap.info, snap, nroots)
+            dst = [stage_dir + '/' + os.path.split(f)[-1]
+                   for f in get_mps_files(cmps.info, cmps, nroots)]
+            if self.mpi is None or self.mpi.rank == 0:
+                cmps.info.save_data(stage_dir + '/mps_info.bin')
+            snap.info.deallocate()
+            if self.mpi is not None: self.mpi.barrier()
+            alive = None
+            if obs_pipe is not None and obs_pipe.worker is not None:
+                alive = obs_pipe.worker.is_alive
+            ckpt.flush(stage_dir, list(zip(src, dst)), src, alive)
+            return stage_dir
+            # NOTES:
+            # 1) The snapshot in the scratch is copied to stage_dir in the background
+            #    while cmps propagates. Its files take the names of the files of cmps
+            #    so that stage_dir looks as if written by saveMPStoDir(cmps, ...).
+
+        #==== Saving the MPS at the sampling times ====#
+        def save_sampled_mps(cmps, save_dir):
+            if mps_archive:
+                saveMPStoArchive(cmps, save_dir + '/mps.mpsar', self.mpi)
+            else:
+                saveMPStoDir(cmps, save_dir, self.mpi, compression=mps_compression)
+
+        #==== Post-processing of the 1PDM at the sampling times ====#
+        def post_sample(job):
+            if job['type'] == 'finish':
+                if t_sample is not None:
+                    q_print.footer()
+                    mp_print.footer()
+                if t_sample is not None and bo_pairs is not None:
+                    bo_print.footer()
+                return
+            
+            tt, dm = job['tt'], job['dm']
+            dm_full = make_full_dm(self.n_core, dm)
+            dm_tr = np.sum( np.trace(dm_full, axis1=1, axis2=2) )
+            dm_full = dm_full * nel_t0 / np.abs(dm_tr)      # dm_full is now normalized
+
+            #==== Save 1PDM ====#
+            if job['save_1pdm']:
+                np.save(job['save_dir']+'/1pdm', dm)
+
+            #==== Save 2PDM ====#
+            if job['pdm2'] is not None:
+                n_pdm2 = self.n_sites if spin_symmetry == 'su2' else 2*self.n_sites
+                np.savez(job['save_dir']+'/2pdm', pdm2=job['pdm2'], n=n_pdm2,
+                         spin_symmetry=spin_symmetry)
+                    
+            #==== Save time info ====#
+            write_time_info(job['save_dir'], tt, job['it'], job['t_sp'], job['i_sp'],
+                            job['normsqs'], job['acorr_t'], job['mps_saved'],
+                            job['save_1pdm'], job['r_sample'], job['r_end'],
+                            job['r_probe'], dm)
+
+            if job['r_sample']:
+                #==== Partial charges ====#
+                orbs = np.concatenate((self.core_orbs, self.unordered_site_orbs()),
+                                      axis=2)
+                qmul, qlow = pcharge.calc(self.mol, dm_full, orbs, self.ovl_ao)
+                q_print.print_pcharge(tt, qlow)
+
+                #==== Bond orders ====#
+                if bo_pairs is not None:
+                    bo_pairs_ = tuple( [ (bo_pairs[i][0]-1,bo_pairs[i][1]-1) for i in
+                                         range(0,len(bo_pairs)) ] )  # Transform to 0-base indices.
+                    bo_mul, bo_low = \
+                        bond_order.calc_pair(self.mol, dm_full, orbs, bo_pairs_,
+                                             self.ovl_ao)
+                    bo_print.print_bo(tt, bo_low)
+
+                #==== Multipole components ====#
+                e_dpole, n_dpole, e_qpole, n_qpole = \
+                    mpole.calc(self.mol, self.dpole_ao, self.qpole_ao, dm_full, orbs)
+                mp_print.print_mpole(tt, e_dpole, n_dpole, e_qpole, n_qpole)
+
+                #==== Orbital entropies ====#
+                if job['oent'] is not None:
+                    oent_print.print_entropy(tt, *job['oent'])
+
+            #==== Save the quantities needed to resume from the checkpoint ====#
+            if job['ckpt_dir'] is not None:
+                te_state_ = job['te_state']
+                if t_sample is not None:
+                    te_state_.update({'q_print':q_print.get_state(),
+                                      'mp_print':mp_print.get_state()})
+                if t_sample is not None and bo_pairs is not None:
+                    te_state_['bo_print'] = bo_print.get_state()
+                if t_sample is not None and orb_entropy is not None:
+                    te_state_['oent_print'] = oent_print.get_state()
+                write_te_state(job['ckpt_dir'], te_state_)
+                write_time_info_ow(job['ckpt_dir'], tt, job['it'], job['t_sp'],
+                                   job['i_sp'], job['normsqs'], job['acorr_t'])   # 1)
+            # NOTES:
+            # 1) TIME_INFO must be the last file written into the checkpoint.
+
+        #==== Control channel ====#
+        ctrl = None
+        if control and (self.mpi is None or self.mpi.rank == 0):
+            mkDir(sample_dir)
+            try:
+                ctrl = te_control_channel(sample_dir + '/control')
+                _print('Commands to the running propagation can be written into ' +
+                       sample_dir + '/control')
+            except OSError as e:
+                print_warning('The control channel cannot be created in ' + sample_dir +
+                              f' ({e}), it is therefore disabled.')
+        #==== Stop on signals and before the deadline ====#
+        guard = None
+        if deadline is not None or stop_signals is not None:
+            guard = te_stop_guard(deadline, stop_signals, use_mpi=self.mpi is not None)
+        
+        def poll_control():
+            cmds = [] if ctrl is None else ctrl.poll()
+            if self.mpi is not None and control:
+                from mpi4py import MPI as MPIpy
+                cmds = MPIpy.COMM_WORLD.bcast(cmds, root=0)
+            return cmds
+        sample_every = 0
+        
+        #==== Only rank 0 post-processes, the other ranks just propagate ====#
+        obs_pipe = None
+        if obs_pipeline == 'async' and self.mpi is not None:
+            if self.mpi.rank == 0:
+                print_warning('The asynchronous observable pipeline forks a worker ' +
+                              'process, which is unsafe after MPI_Init. The \'sync\' ' +
+                              'pipeline is used instead.')
+            obs_pipeline = 'sync'
+        if self.mpi is None or self.mpi.rank == 0:
+            obs_pipe = te_obs_pipeline(post_sample, obs_pipeline, 2)
+            obs_pipe.start()
+        
+
+        #==== The next sampling time (for adaptive time steps) ====#
+        def next_sample_time():
+            if t_sample is not None and i_sp < len(t_sample):
+                return t_sample[i_sp]
+            else:
+                return None
         
 
         #==== Begin the time evolution ====#
@@ -1676,14 +2429,26 @@ class MYTDDMRG:
             np.save('./' + prefix + '.t', ts)
             if t_sample is not None: np.save('./'+prefix+'.ts', t_sample)
         i_sp = 0
+        it_start = 0
+        if resume:
+            i_sp = te_state['i_sp']
+            if t_sample is not None:
+                issampled = te_state['issampled'].copy()
+            it_start = te_state['it'] + 1
+            if adaptive_dt is not None and ts[-1] < tmax - dtctl.t_eps:
+                ts.append(dtctl.next_time(ts[-1], tmax, next_sample_time()))
         #ipsh()
-        for it, tt in enumerate(ts):
-
+        it = it_start     # Earlier time points have been propagated before the checkpoint.
+        while it < len(ts):
+            tt = ts[it]
             if self.verbose >= 2:
                 _print('\n')
                 _print(' Time point : ', it)
                 _print('>>> TD-PROPAGATION TIME = %10.5f <<<' %tt)
             t = time.perf_counter()
+            t_perf = dict.fromkeys(('propagate', 'autocorr', 'pdm1', 'pdm2', 'oent',
+                                    'observables', 'io'), 0.0)
+            dw_step = 0.0
 
             #if it == 2:
             #if it >= 0:
@@ -1692,14 +2457,73 @@ class MYTDDMRG:
                 #quit()
 
             if it != 0: # time zero: no propagation
-                dt_ = ts[it] - ts[it-1]
-                _print('    DELTA_T stepped from the previous time point = %10.5f <<<' % dt_)
-                if method == b2.TETypes.RK4:
-                    te.solve(1, +1j * dt_, cmps.center == 0, tol=exp_tol)
-                    te.n_sub_sweeps = n_sub_sweeps
-                elif method == b2.TETypes.TangentSpace:
-                    te.solve(2, +1j * dt_ / 2, cmps.center == 0, tol=exp_tol)
-                    te.n_sub_sweeps = 1
+                tx = time.perf_counter()
+                if bond_dim_policy is not None:
+                    b2.Global.frame.reset_peak_used_memory()      # 1)
+                
+                #==== Global subspace expansion ====#
+                if subspace_expansion is not None and (it-1) % gse_every == 0:
+                    if self.mpi is not None: self.mpi.barrier()
+                    cmps_gse = cmps.deep_copy('mps_t_gse')
+                    if self.mpi is not None: self.mpi.barrier()
+                    MPS_fitting(cmps_gse, cmps, idMPO, [te_bond_dim], gse_nsteps, 
+                                [gse_noise], 0.0, 'density_mat', cutoff, lmpo=self.te_mpo,
+                                verbose_lvl=self.verbose-1)
+                    if self.mpi is not None: self.mpi.barrier()
+                    cmps = cmps_gse.deep_copy('mps_t')
+                    if self.mpi is not None: self.mpi.barrier()
+                    cmps_gse.info.deallocate()
+                    n_sub_sweeps_gse = te.n_sub_sweeps
+                    me, te = make_te(cmps)
+                    te.n_sub_sweeps = n_sub_sweeps_gse
+                    idME, acorr = make_acorr(cmps)
+                    _print('    Subspace expansion done, bond dimension = %d' %
+                           max([x.n_states_total for x in cmps.info.left_dims]))
+                
+                if adaptive_dt is not None and dtctl.reject:
+                    if self.mpi is not None: self.mpi.barrier()
+                    cmps_bak = cmps.deep_copy('mps_t_bak')
+                    if self.mpi is not None: self.mpi.barrier()
+                    n_sub_sweeps_bak = te.n_sub_sweeps
+                while True:
+                    dt_ = ts[it] - ts[it-1]
+                    n_dw0 = len(te.discarded_weights)
+                    _print('    DELTA_T stepped from the previous time point = %10.5f <<<' % dt_)
+                    if adaptive_dt is None:
+                        te_step(te, cmps, dt_)
+                        break
+
+                    #==== Error control of adaptive time steps ====#
+                    # The step is done once with dt_ on a copy and twice with dt_/2 
+                    # on cmps, the latter is kept (see te_step_controller).
+                    if self.mpi is not None: self.mpi.barrier()
+                    cmps_full = cmps.deep_copy('mps_t_full')
+                    if self.mpi is not None: self.mpi.barrier()
+                    me_full, te_full = make_te(cmps_full, "TE_FULL")
+                    te_full.n_sub_sweeps = te.n_sub_sweeps
+                    te_step(te_full, cmps_full, dt_)
+                    te_step(te, cmps, dt_ / 2)
+                    te_step(te, cmps, dt_ / 2)
+                    ovl = calc_overlap(cmps_full, cmps, "dbl")
+                    err = dtctl.error(te_full.normsqs[-1], te.normsqs[-1], ovl)
+                    cmps_full.info.deallocate()
+                    if dtctl.accept(err, dt_):
+                        dtctl.update(err, dt_)
+                        break
+                    _print('    The time step is rejected (error/tolerance = %.4e), ' % err +
+                           'it is redone with DELTA_T = %10.5f' % dtctl.dt)
+                    ts[it] = ts[it-1] + dtctl.dt
+                    tt = ts[it]
+                    if self.mpi is not None: self.mpi.barrier()
+                    cmps = cmps_bak.deep_copy('mps_t')
+                    if self.mpi is not None: self.mpi.barrier()
+                    me, te = make_te(cmps)
+                    te.n_sub_sweeps = n_sub_sweeps_bak
+                    idME, acorr = make_acorr(cmps)
+                if adaptive_dt is not None and dtctl.reject:
+                    cmps_bak.info.deallocate()
+                t_perf['propagate'] = time.perf_counter() - tx
+                dw_step = max(list(te.discarded_weights)[n_dw0:], default=0.0)
 
                 #if it == 1:
                 #    ipsh()
@@ -1710,52 +2534,131 @@ class MYTDDMRG:
                 else:
                     _print(("T = %10.5f <E> = %20.15f <Norm^2> = %20.15f") %
                            (tt, te.energies[-1], te.normsqs[-1]))
+
+                #==== Bond dimension for the next time step ====#
+                if bond_dim_policy is not None:
+                    te_bond_dim = bdpol.update(dw_step, step_peak_memory())
+                    if self.mpi is not None:
+                        from mpi4py import MPI as MPIpy
+                        bdpol.restore(MPIpy.COMM_WORLD.bcast(bdpol.get_state(), root=0))
+                        te_bond_dim = bdpol.D      # 2)
+                    te.bond_dims = b2.VectorUBond([te_bond_dim])
+                    _print('    Max. discarded weight = %.4e, bond dimension for the ' %
+                           dw_step + 'next time step = %d' % te_bond_dim)
+                # NOTES:
+                # 1) The bond dimension policy calibrates its memory prediction on 
+                #    the peak of one time step, not on the peak since the start of the
+                #    program, which includes the ground state and annihilation phases.
+                # 2) All ranks must truncate to the same bond dimension.
             else:
                 _print('This is the starting time point, nothing happened yet.')
                         
-            #==== Autocorrelation and norm ====#
-            idME.init_environments()   # NOTE: Why does it have to be here instead of between 'idMe =' and 'acorr =' lines.
-            if comp == 'hybrid':
-                acorr = brs.ComplexExpect(idME, max_bond_dim, max_bond_dim)
-            elif comp == 'full':
-                acorr = bs.Expect(idME, max_bond_dim, max_bond_dim)
+            #==== Determine reasons to save quantities ====#
+            if adaptive_dt is None:
+                if t_sample is not None and i_sp < len(t_sample) and it <= n_steps-2:
+                    dt1 = abs( ts[it]   - t_sample[i_sp] )
+                    dt2 = abs( ts[it+1] - t_sample[i_sp] )
+                    dd = (dt1 < dt2)
+                    r_sample = (dd and not issampled[i_sp])
+                else:
+                    r_sample = False
+                r_end = (it == n_steps-1)
+            else:
+                # Adaptive time steps land exactly on the sampling times.
+                t_next_sp = next_sample_time()
+                r_sample = (t_next_sp is not None and t_next_sp <= tt + dtctl.t_eps)
+                r_end = (tt >= tmax - dtctl.t_eps)
+            save_mps_end, save_1pdm_end = r_end, r_end
+            r_probe, save_mps_probe, save_1pdm_probe = self.read_probe_file(sample_dir, it+1)
+
+            #==== Commands from the control channel ====#
+            r_stop = False
+            for c, a in poll_control():
+                _print(f'Control channel command received: {c}' + 
+                       ('' if a is None else f' {a}'))
+                if c in ('sample', 'save_1pdm', 'save_mps', 'sample_every') and \
+                   (t_sample is None or i_sp >= len(t_sample)):
+                    _print('  There is no requested sampling time left, the time point ' +
+                           'of this command is recorded as its requested sampling time.')
+                if c == 'sample' or c == 'save_1pdm':
+                    r_probe, save_1pdm_probe = True, True
+                elif c == 'save_mps':
+                    r_probe, save_mps_probe = True, True
+                elif c == 'bond_dim':
+                    te_bond_dim = a
+                    te.bond_dims = b2.VectorUBond([te_bond_dim])
+                    if bond_dim_policy is not None:
+                        bdpol.D = a
+                        bdpol.D_max = max(bdpol.D_max, a)
+                elif c == 'krylov_size':
+                    krylov_size = a
+                    te.krylov_subspace_size = krylov_size
+                elif c == 'krylov_tol':
+                    krylov_tol = a
+                    te.krylov_conv_thrd = krylov_tol
+                elif c == 'sample_every':
+                    sample_every = a
+                elif c == 'stop':
+                    r_stop = True
+            if sample_every > 0 and it % sample_every == 0:
+                r_probe, save_1pdm_probe = True, True
+            if guard is not None and not r_end:
+                stop_reason = guard.check()
+                if stop_reason is not None:
+                    print_warning(f'Stopping the time propagation because of {stop_reason}.' +
+                                  '\nThe current time point is saved as the last one.')
+                    r_stop = True
+            if r_stop:
+                r_end = True
+                save_mps_end, save_1pdm_end = r_end, r_end
 
-            #acorr_t = 1.0
-            acorr_t = acorr.solve(False)
+            
+            #==== Autocorrelation and norm ====#
+            # The environments of <psi(0)|psi(t)> contract the tensors of both MPSs
+            # at every site, so they all become invalid once psi(t) is propagated, 
+            # even though psi(0) never changes. They are therefore rebuilt right 
+            # before the overlap is evaluated, and only at the time points where the 
+            # autocorrelation is needed (every ac_stride steps and whenever other 
+            # quantities are saved). The center is set explicitly because it moves 
+            # during the propagation.
+            r_acorr = (it == 0 or it % ac_stride == 0 or r_sample or r_end or r_probe)
             if it == 0:
-                normsqs = abs(acorr_t)
+                normsqs = None
             elif it > 0:
                 normsqs = te.normsqs[0]
-            acorr_t = acorr_t / np.sqrt(normsqs)
+            if r_acorr:
+                tx = time.perf_counter()
+                idME.center = cmps.center
+                idME.init_environments()
+                acorr_t = acorr.solve(False)
+                if it == 0:
+                    normsqs = abs(acorr_t) if ac_ref is None else abs(calc_normsq(cmps))
+                acorr_t = acorr_t / np.sqrt(normsqs)
                             
-            #==== 2t autocorrelation ====#
-            if comp == 'hybrid':
-                if cmps.wfns[0].data.size == 0:
-                    loaded = True
-                    cmps.load_tensor(cmps.center)
-                vec = cmps.wfns[0].data + 1j * cmps.wfns[1].data
-                acorr_2t = np.vdot(vec.conj(),vec) / normsqs
-            elif comp == 'full':
-                acorr_2t = complex(0.0, 0.0)
+                #==== 2t autocorrelation ====#
+                if comp == 'hybrid':
+                    if cmps.wfns[0].data.size == 0:
+                        loaded = True
+                        cmps.load_tensor(cmps.center)
+                    vec = cmps.wfns[0].data + 1j * cmps.wfns[1].data
+                    acorr_2t = np.vdot(vec.conj(),vec) / normsqs
+                elif comp == 'full':
+                    acorr_2t = complex(0.0, 0.0)
+
+                #==== Print autocorrelation ====#
+                if (self.mpi is None or self.mpi.rank == 0) and it % ac_stride == 0:
+                    ac_print.print_ac(tt, acorr_t, acorr_2t, normsqs)      # 1)
+                    if save_npy and adaptive_dt is not None:
+                        np.save('./' + prefix + '.t', ts[0:it+1])
 
-            #==== Print autocorrelation ====#
-            if self.mpi is None or self.mpi.rank == 0:
-                ac_print.print_ac(tt, acorr_t, acorr_2t, normsqs)
+                if self.mpi is not None: self.mpi.barrier()
+                t_perf['autocorr'] = time.perf_counter() - tx
+                # NOTES:
+                # 1) Only the rows on the ac_stride grid are printed so that the time
+                #    points in <prefix>.ac stay equidistant as assumed by the Fourier
+                #    tools. The values at other saving time points are still found in
+                #    the TIME_INFO of their tevo-XXXX directory.
 
-            if self.mpi is not None: self.mpi.barrier()
-
-            
-            #==== Determine reasons to save quantities ====#
-            if t_sample is not None and it <= n_steps-2:
-                dt1 = abs( ts[it]   - t_sample[i_sp] )
-                dt2 = abs( ts[it+1] - t_sample[i_sp] )
-                dd = (dt1 < dt2)
-                r_sample = (dd and not issampled[i_sp])
-            else:
-                r_sample = False
-            r_end = (it == n_steps-1)
-            save_mps_end, save_1pdm_end = r_end, r_end
-            r_probe, save_mps_probe, save_1pdm_probe = self.read_probe_file(sample_dir, it+1)
 
             
             #==== Compute and prob. store save quantities at sampling times ====#
@@ -1763,6 +2666,7 @@ class MYTDDMRG:
             # 2) at the last time point, and
             # 3) requested by a probe file.
             if r_sample or r_end or r_probe:                    
+                t_save = time.perf_counter()
                 save_dir = sample_dir + '/tevo-' + str(it+1).zfill(ndigit)
                 if self.mpi is not None:
                     if self.mpi.rank == 0:
@@ -1772,98 +2676,675 @@ class MYTDDMRG:
                     mkDir(save_dir)
 
                 #==== Saving MPS ====#
+                tx = time.perf_counter()
+                ckpt_dir = None
                 if save_mps_end:
                     if save_mps == 'overwrite':
-                        saveMPStoDir(cmps, mps_dir_ow, self.mpi)
+                        ckpt_dir = save_checkpoint(cmps)
                     elif save_mps == 'sampled':
-                        saveMPStoDir(cmps, save_dir, self.mpi)
+                        save_sampled_mps(cmps, save_dir)
                     elif save_mps == 'no':
                         pass
                 else:
                     if save_mps == 'overwrite':
-                        saveMPStoDir(cmps, mps_dir_ow, self.mpi)
+                        ckpt_dir = save_checkpoint(cmps)       # 2)
                     if save_mps == 'sampled' or save_mps_probe:
-                        saveMPStoDir(cmps, save_dir, self.mpi)
+                        save_sampled_mps(cmps, save_dir)
+
+                t_perf['io'] = time.perf_counter() - tx
 
                 #==== Calculate 1PDM ====#
+                tx = time.perf_counter()
                 if self.mpi is not None: self.mpi.barrier()
                 cmps_cp = cmps.deep_copy('cmps_cp')         # 1)
                 if self.mpi is not None: self.mpi.barrier()
 
                 dm = self.get_one_pdm(True, cmps_cp)
                 cmps_cp.info.deallocate()
-                dm_full = make_full_dm(self.n_core, dm)
-                dm_tr = np.sum( np.trace(dm_full, axis1=1, axis2=2) )
-                dm_full = dm_full * nel_t0 / np.abs(dm_tr)      # dm_full is now normalized
+                t_perf['pdm1'] = time.perf_counter() - tx
+
+                #==== Calculate 2PDM ====#
+                pdm2 = None
+                if save_2pdm:
+                    tx = time.perf_counter()
+                    if self.mpi is not None: self.mpi.barrier()
+                    cmps_cp = cmps.deep_copy('cmps_cp')
+                    if self.mpi is not None: self.mpi.barrier()
+                    pdm2 = pack_2pdm(self.get_two_pdm(True, cmps_cp), pdm2_single)
+                    cmps_cp.info.deallocate()
+                    t_perf['pdm2'] = time.perf_counter() - tx
+
+                #==== Calculate orbital entropies ====#
+                oent = None
+                if orb_entropy is not None and r_sample and i_sp % oent_every == 0:
+                    tx = time.perf_counter()
+                    if self.mpi is not None: self.mpi.barrier()
+                    cmps_cp = cmps.deep_copy('cmps_cp')
+                    if self.mpi is not None: self.mpi.barrier()
+                    oent = self.get_orbital_entropy(cmps_cp, oent_pairs)
+                    cmps_cp.info.deallocate()
+                    t_perf['oent'] = time.perf_counter() - tx
                 #OLD cmps_cp.deallocate()      # Unnecessary because it must have already been called inside the expect.solve function in the get_one_pdm above
                 # NOTE:
                 # 1) Copy the current MPS because self.get_one_pdm convert the input
                 #    MPS to a real MPS.
-
-                #==== Save 1PDM ====#
-                if save_1pdm or save_1pdm_probe or save_1pdm_end:
-                    np.save(save_dir+'/1pdm', dm)
-                    
-                #==== Save time info ====#
+                # 2) The files in the checkpoint and its TE_STATE must belong to the 
+                #    same time point. The checkpoint is written into a staging 
+                #    directory and only becomes mps_dir_ow when the sampling job below
+                #    has written TE_STATE and TIME_INFO into it.
+                # 3) A probe, control, or final sample when t_sample is None or all of
+                #    its time points have been used.
+
+                #==== Pass the 1PDM to the post-processing ====#
                 if r_end:
                     sampled_mps_saved = save_mps_end if save_mps=='sampled' else False
                 else:
                     sampled_mps_saved = save_mps=='sampled' or save_mps_probe
-                self.save_time_info(save_dir, ts[it], it, t_sample[i_sp], i_sp, normsqs, 
-                                    acorr_t, sampled_mps_saved,
-                                    save_1pdm or save_1pdm_probe or save_1pdm_end,
-                                    r_sample, r_end, r_probe, dm)
-                if save_mps == 'overwrite':
-                    self.save_time_info_ow(mps_dir_ow, ts[it], it, t_sample[i_sp], i_sp, 
-                                           normsqs, acorr_t)
-                                    
-
+                if t_sample is not None and i_sp < len(t_sample):
+                    t_sp = t_sample[i_sp]
+                else:
+                    t_sp = ts[it]       # 3)
+                job = {'type':'sample', 'save_dir':save_dir, 'tt':ts[it], 'it':it,
+                       't_sp':t_sp, 'i_sp':i_sp, 'normsqs':normsqs,
+                       'acorr_t':acorr_t, 'dm':dm, 'pdm2':pdm2, 'oent':oent,
+                       'mps_saved':sampled_mps_saved,
+                       'save_1pdm':save_1pdm or save_1pdm_probe or save_1pdm_end,
+                       'r_sample':r_sample, 'r_end':r_end, 'r_probe':r_probe}
                 if r_sample:
-                    #==== Partial charges ====#
-                    orbs = np.concatenate((self.core_orbs, self.unordered_site_orbs()),
-                                          axis=2)
-                    qmul, qlow = pcharge.calc(self.mol, dm_full, orbs, self.ovl_ao)
-                    if self.mpi is None or self.mpi.rank == 0:
-                        q_print.print_pcharge(tt, qlow)
-                    if self.mpi is not None: self.mpi.barrier()
-
-                    #==== ====#
-                    if bo_pairs is not None:
-                        bo_pairs_ = tuple( [ (bo_pairs[i][0]-1,bo_pairs[i][1]-1) for i in
-                                             range(0,len(bo_pairs)) ] )  # Transform to 0-base indices.
-                        bo_mul, bo_low = \
-                            bond_order.calc_pair(self.mol, dm_full, orbs, bo_pairs_,
-                                                 self.ovl_ao)
-                        if self.mpi is None or self.mpi.rank == 0:
-                            bo_print.print_bo(tt, bo_low)
-                        if self.mpi is not None: self.mpi.barrier()
-                    
-                    #==== Multipole components ====#
-                    e_dpole, n_dpole, e_qpole, n_qpole = \
-                        mpole.calc(self.mol, self.dpole_ao, self.qpole_ao, dm_full, orbs)
-                    if self.mpi is None or self.mpi.rank == 0:
-                        mp_print.print_mpole(tt, e_dpole, n_dpole, e_qpole, n_qpole)
-                    if self.mpi is not None: self.mpi.barrier()
-
                     issampled[i_sp] = True
                     i_sp += 1
+                job['ckpt_dir'] = ckpt_dir
+                job['te_state'] = get_te_state(it) if ckpt_dir is not None else None
+                tx = time.perf_counter()
+                if obs_pipe is not None:
+                    obs_pipe.submit(job)
+                if self.mpi is not None: self.mpi.barrier()
+                t_perf['observables'] = time.perf_counter() - tx
+
+            #==== Performance telemetry ====#
+            if perf_print is not None:
+                dmain, dseco, imain, iseco = b2.Global.frame.peak_used_memory
+                t_perf['total'] = time.perf_counter() - t
+                perf_print.print_perf(
+                    {'it':it, 't':float(tt), 'dt':float(tt - ts[it-1]) if it > 0 else 0.0,
+                     'wall':t_perf,
+                     'bond_dim':max([x.n_states_total for x in cmps.info.left_dims]),
+                     'bond_dim_te':te_bond_dim, 'discarded_weight':float(dw_step),
+                     'krylov_size':krylov_size if method == b2.TETypes.TangentSpace
+                                   else None,
+                     'n_sub_sweeps':te.n_sub_sweeps,
+                     'peak_mem_double':int(dmain + dseco), 'peak_mem_int':int(imain + iseco),
+                     'scratch_usage':get_dir_size(self.scratch)
+                                     if r_sample or r_end or r_probe else None})
+
+            if guard is not None:
+                guard.step_done(time.perf_counter() - t)
+                if r_sample or r_end or r_probe:
+                    guard.save_done(time.perf_counter() - t_save)
+            if r_stop:
+                _print('The time propagation is stopped before reaching the final time.')
+                break
+
+            #==== The next time point when using adaptive time steps ====#
+            if adaptive_dt is not None and not r_end:
+                ts.append(dtctl.next_time(tt, tmax, next_sample_time()))
+            it += 1
+
+        if adaptive_dt is not None:
+            _print('Number of accepted and rejected time steps = %d, %d' %
+                   (dtctl.n_accept, dtctl.n_reject))
 
                     
+        if ctrl is not None:
+            ctrl.close()
+        if guard is not None:
+            guard.release()
+        
         #==== Print max min imaginary parts (for debugging) ====#
-        if t_sample is not None:
-            if self.mpi is None or self.mpi.rank == 0:
-                q_print.footer()
-
-        if t_sample is not None and bo_pairs is not None:
-            if self.mpi is None or self.mpi.rank == 0:
-                bo_print.footer()
-
-        if t_sample is not None:
-            if self.mpi is None or self.mpi.rank == 0:
-                mp_print.footer()
+        if obs_pipe is not None:
+            obs_pipe.submit({'type':'finish'})
+            obs_pipe.close()
+        if ckpt is not None:
+            ckpt.wait()
+        if self.mpi is not None: self.mpi.barrier()
                 
         return logbook    
     ##############################################################
+
+
+    ##############################################################
+    def run_workers(self, logbook, calls, scratches, n_proc=None, logs=None,
+                    stop_signals=('SIGTERM', 'SIGUSR1')):
+        '''
+        Runs each element of calls, a list of (method, kwargs) pairs of the MYTDDMRG
+        methods that take and return the logbook (e.g. annihilate and 
+        time_propagate), in a separate worker process (see util_te.run_workers), at
+        most n_proc (None means all) at a time. Returns the list of the last logbook
+        of each element (None for a worker that failed).
+
+        The i-th worker builds its own MYTDDMRG object with the same molecule, 
+        Hamiltonian, and settings as this one and scratches[i] as its scratch 
+        directory. The Hamiltonian MPO reaches the workers through the MPO cache 
+        (self.mpo_cache, or <scratch>/mpo_cache if there is none), so it is only 
+        built once. Every worker allocates the same memory as this object, while the
+        OpenMP threads of this object are divided among the concurrent workers. The
+        standard output and error of the i-th worker go to logs[i]. It cannot be 
+        used under MPI.
+        '''
+        from IMAM_TDDMRG.utils.util_te import run_workers
+
+        assert self.mpi is None, 'MYTDDMRG.run_workers cannot be used under MPI.'
+        assert self.ham_args is not None, 'The Hamiltonian must be initialized ' + \
+            'before MYTDDMRG.run_workers is called.'
+        n_run = len(calls) if n_proc is None else min(max(1, n_proc), len(calls))
+        init_args = {**self.init_args, 'omp_threads':
+                     max(1, self.init_args['omp_threads'] // n_run)}
+
+        #==== Share the Hamiltonian MPO through the cache ====#
+        ham_name, ham_args = self.ham_args
+        if ham_name == 'init_hamiltonian':
+            ham_args = dict(ham_args)
+            if self.mpo_cache is None:
+                mpo_cache = self.scratch + '/mpo_cache'
+                fname = self.te_mpo_cache_file(ham_args['mpo_algo'], 
+                                               ham_args['mpo_cutoff'], mpo_cache)
+                if not os.path.isfile(fname):
+                    mkDir(mpo_cache)
+                    self.mpo_orig.save_data(fname + '.tmp')
+                    os.replace(fname + '.tmp', fname)
+                ham_args['mpo_cache'] = mpo_cache
+
+        #==== Pybind11 enums are passed by name ====#
+        def encode(kwargs):
+            if isinstance(kwargs.get('method'), b2.TETypes):
+                kwargs = {**kwargs, 'method':kwargs['method'].name}
+            return kwargs
+        
+        mol = self.mol.dumps()
+        jobs = []
+        for c, scr in zip(calls, scratches):
+            jobs.append((te_worker, (mol, {**init_args, 'scratch':scr}, 
+                                     (ham_name, ham_args), self.verbose, logbook,
+                                     [(m, encode(kw)) for m, kw in c]), {}))
+        return run_workers(jobs, n_proc, logs, 
+                           setup=[('IMAM_TDDMRG.utils.util_complex_type', 'init', (comp,))],
+                           tmpdir=self.scratch, stop_signals=stop_signals)
+    ##############################################################
+
+
+    ##############################################################
+    def run_ensemble(self, logbook, members, ann_args, te_args, n_proc=None):
+        '''
+        Applies the annihilation operator to the same ground state MPS and propagates
+        the resulting MPS for each member of an ensemble of initial states, while the
+        Hamiltonian MPO is built only once. Without MPI, the members run concurrently
+        in worker processes, at most n_proc (None means all) at a time (see 
+        run_workers for their memory and thread usage). Under MPI, they run one after
+        another, each one parallelized over all ranks.
+
+        members:
+           A list of dictionaries, one per member. Each one must contain 'name' and 
+           may contain any keyword argument of annihilate (e.g. 'aorb' and 'alpha'), 
+           which overrides the one in ann_args.
+        ann_args, te_args:
+           The keyword arguments of annihilate and time_propagate shared by all 
+           members, without logbook_in/logbook.
+
+        Member <name> uses <scratch>/ens.<name> as its scratch directory and 
+        <prefix>.<name> as its prefix, so its outputs, including the sample 
+        directory, are distinct from those of the other members. Without MPI, its
+        standard output goes to <prefix>.<name>.out. The logbooks of the members are
+        returned in logbook['ensemble'] (None for a member that failed).
+        '''
+        names = [m['name'] for m in members]
+        assert len(set(names)) == len(names), 'The names of ensemble members must ' + \
+            f'be unique. Currently, the names are {names}.'
+        prefix = te_args.get('prefix', 'te')
+        outmps_name = ann_args.get('outmps_name', 'ANN_KET')
+        scratch0 = self.scratch
+        _print('Ensemble members = ', names)
+        
+        #==== Build the Hamiltonian MPO shared by all members ====#
+        self.get_mpo_orig()
+
+        scratches, calls = [], []
+        for m in members:
+            mscratch = scratch0 + '/ens.' + m['name']
+            margs = {k: v for k, v in m.items() if k != 'name'}
+            aargs = {**ann_args, **margs, 'outmps_dir0':mscratch}
+            if aargs.get('inmps_dir0') is None:
+                aargs['inmps_dir0'] = scratch0    # The ground state is there.
+            targs = {**te_args, 'prefix':prefix + '.' + m['name'], 
+                     'inmps_dir0':mscratch, 'inmps_name':outmps_name}
+            scratches.append(mscratch)
+            calls.append([('annihilate', aargs), ('time_propagate', targs)])
+
+        if self.mpi is None:
+            _print(f'Running the members in at most {n_proc or len(members)} ' +
+                   'concurrent worker processes.')
+            logs = [logbook['workdir'] + '/' + prefix + '.' + n + '.out' for n in names]
+            results = self.run_workers(logbook, calls, scratches, n_proc, logs)
+        else:
+            results = []
+            for n, scr, c in zip(names, scratches, calls):
+                print_section('Ensemble member ' + n)
+                self.set_scratch(scr)
+                lb = logbook
+                for method, kwargs in c:
+                    lb = getattr(self, method)(lb, **kwargs)
+                results.append(lb)
+            self.set_scratch(scratch0)
+
+        for n, lb in zip(names, results):
+            _print(f'  Member {n} : ' + ('done' if lb is not None else 'FAILED'))
+        logbook.update({'ensemble':dict(zip(names, results))})
+        return logbook
+    ##############################################################
+
+
+    ##############################################################
+    def parareal_propagate(self, logbook, te_args, n_slices, D_coarse, dt_coarse,
+                           max_iter=None, fid_tol=1.0E-6, n_proc=None, fit_nsteps=10,
+                           fit_conv_tol=1.0E-8):
+        '''
+        Propagates the initial MPS of time_propagate over [tinit, tmax] with the 
+        parareal algorithm. The interval is divided into n_slices time slices. A cheap
+        coarse propagator G (RK4 with bond dimension D_coarse and time step dt_coarse)
+        is run sequentially through the slices in the current process, while the fine
+        propagator F (the one specified by te_args) is run on all slices concurrently 
+        in worker processes, at most n_proc (None means all slices) at a time (see 
+        run_workers for their memory and thread usage). Each iteration costs about 
+        as much as a fine propagation of one slice plus the coarse ones, so the 
+        method only pays off when the slices run in parallel, hence n_proc = 1 is 
+        refused. The initial MPS of the slices are updated by
+           U_{n+1}^{k+1} = G(U_n^{k+1}) + F(U_n^k) - G(U_n^k)
+        until the largest infidelity, 1 - |<U_n^{k+1}|U_n^k>|^2/(<U_n^k|U_n^k>
+        <U_n^{k+1}|U_n^{k+1}>), is below fid_tol, or after max_iter iterations (the 
+        default is n_slices, after which the result equals the fine propagation).
+
+        te_args:
+           The keyword arguments of time_propagate (without logbook) for the fine 
+           propagator, dt0 must not be a list.
+        fit_nsteps, fit_conv_tol:
+           The number of sweeps and the convergence tolerance of the fittings that 
+           sum the MPSs in the update above.
+
+        The runs are saved under <prefix>.parareal, where k<k>.F<n> and k<k>.G<n> are 
+        the prefixes of the fine and coarse propagations of slice n at iteration k,
+        and k<k>.U<n> is the initial MPS of slice n. The autocorrelation of all 
+        slices is referred to the initial MPS and it is merged into <prefix>.ac and 
+        <prefix>.ac2t. The other sampled quantities are found in the outputs of the
+        last fine propagation of each slice, which are listed in 
+        logbook['parareal']['fine_prefixes']. Only the full complex type is supported
+        because the updates require sums of complex MPSs, and it cannot be run under
+        MPI.
+        '''
+        assert comp == 'full', 'The parareal propagation requires the full complex ' + \
+            'type since the updates are sums of complex MPSs.'
+        assert n_proc is None or n_proc > 1, 'The parareal propagation is only ' + \
+            'useful when the fine propagations of the slices run in parallel. With ' + \
+            'n_proc = 1, it costs more than a plain time_propagate, use n_proc > 1 ' + \
+            'or None (all slices at once).'
+        assert self.mpi is None, 'The parareal propagation cannot be run under MPI.'
+        assert te_args.get('mrci_info') is None, \
+            'The parareal propagation does not support MRCI MPSs.'
+        dt0 = te_args['dt0']
+        assert type(dt0) is not list, 'The parareal propagation requires a constant ' + \
+            'time step, i.e. dt0 must not be a list.'
+        tinit = te_args.get('tinit', 0.0)
+        tmax = te_args['tmax']
+        prefix = te_args.get('prefix', 'te')
+        t_sample = te_args.get('t_sample')
+        max_bond_dim = te_args['max_bond_dim']
+        cutoff = te_args.get('cutoff', 0)
+        max_iter = n_slices if max_iter is None else max_iter
+        assert max_iter >= 1, 'max_iter must be at least 1.'
+        
+        #==== Slice boundaries on the grid of the fine time step ====#
+        n_fine = int(round((tmax - tinit) / dt0))
+        tb = [tinit + dt0*int(round(n*n_fine/n_slices)) for n in range(0, n_slices)] + \
+             [tmax]
+        assert all(tb[n+1] > tb[n] for n in range(0, n_slices)), \
+            f'There are too many time slices ({n_slices}) for the number of time ' + \
+            f'steps ({n_fine}).'
+        _print('Parareal time slice boundaries (a.u.) = ', tb)
+
+        wdir = logbook['workdir']
+        pdir = wdir + '/' + prefix + '.parareal'
+        mkDir(pdir)
+        scratch0 = self.scratch
+        inmps_dir = te_args.get('inmps_dir0')
+        psi0 = (scratch0 if inmps_dir is None else inmps_dir,
+                te_args.get('inmps_name', 'ANN_KET'), te_args.get('inmps_cpx', False),
+                te_args.get('inmps_multi', False))
+        
+        #==== Build the Hamiltonian MPO shared by all propagations ====#
+        self.get_mpo_orig()
+        idMPO = bs.SimplifiedMPO(bs.IdentityMPO(self.hamil), bs.RuleQC(), True, True)
+        midMPO = -1.0 * idMPO
+
+        #==== Propagations of slices ====#
+        def slice_args(kind, k, n, src):
+            spre = prefix + f'.parareal/k{k}.{kind}{n}'
+            args = {**te_args, 'prefix':spre, 'tinit':tb[n], 'tmax':tb[n+1], 
+                    'inmps_dir0':src[0], 'inmps_name':src[1], 'inmps_cpx':src[2], 
+                    'inmps_multi':src[3], 'save_mps':'overwrite', 'resume':False, 
+                    'control':False, 'deadline':None, 'stop_signals':None, 
+                    'ac_ref':psi0}
+            if kind == 'G':
+                args.update({'method':b2.TETypes.RK4, 'max_bond_dim':D_coarse, 
+                             'dt0':dt_coarse, 't_sample':None, 'save_1pdm':False,
+                             'save_2pdm':False, 'adaptive_dt':None,
+                             'bond_dim_policy':None, 'subspace_expansion':None,
+                             'obs_pipeline':'sync', 'save_perf':False})
+            elif t_sample is not None:
+                ts_ = [t for t in t_sample if tb[n] <= t < tb[n+1] or
+                       (n == n_slices-1 and t == tmax)]
+                args['t_sample'] = ts_ if len(ts_) > 0 else None
+            return spre, args
+
+        def run_fine(k, idx, srcs):
+            # The fine propagations of the slices in idx, in worker processes.
+            jobs = [slice_args('F', k, n, src) for n, src in zip(idx, srcs)]
+            names = [f'k{k}.F{n}' for n in idx]
+            res = self.run_workers(logbook, [[('time_propagate', a)] for _, a in jobs],
+                                   [scratch0 + f'/pr.F{n}' for n in idx], n_proc,
+                                   [pdir + '/' + nm + '.out' for nm in names])
+            for nm, r in zip(names, res):
+                assert r is not None, f'The parareal propagation {nm} failed, see ' + \
+                    pdir + '/' + nm + '.out.'
+            return [spre for spre, _ in jobs]
+
+        def run_coarse(k, n, src):
+            # A coarse propagation, in the current process.
+            spre, args = slice_args('G', k, n, src)
+            self.set_scratch(scratch0 + f'/pr.G{n}')
+            self.time_propagate(dict(logbook), **args)
+            self.set_scratch(scratch0)
+            return spre
+
+        #==== The MPS at the end of a slice and the initial MPS of the slices ====#
+        def ckpt(spre):
+            return (wdir + '/' + spre + '.mps_t', 'mps_info.bin', True, False)
+            
+        def load(src, tag):
+            mps_type = {'type':'multi', 'nroots':2} if src[3] else {'type':'normal'}
+            mps, _, _ = loadMPSfromDir(src[0], src[1], src[2], mps_type, idMPO,
+                                       cached_contraction=True)
+            return mps.deep_copy(tag)       # 1)
+
+        def save(mps, k, n):
+            d = pdir + f'/k{k}.U{n}'
+            saveMPStoDir(mps, d)
+            return (d, 'mps_info.bin', True, False)
+        # NOTES:
+        # 1) All MPS saved by time_propagate have the same tag, mps_t, so they are
+        #    copied into uniquely tagged ones before loading another.
+        
+        #==== Initial coarse propagation ====#
+        t_start = time.perf_counter()
+        _print('\n>>> Parareal iteration 0 (coarse propagation) <<<')
+        U = [psi0] + [None] * n_slices
+        G = [None] * n_slices
+        F = [None] * n_slices
+        for n in range(0, n_slices):
+            G[n] = ckpt(run_coarse(0, n, U[n]))
+            U[n+1] = save(load(G[n], f'pr_k0_U{n+1}'), 0, n+1)
+
+        #==== Parareal iterations ====#
+        fpre = [None] * n_slices
+        for k in range(0, max_iter):
+            _print(f'\n>>> Parareal iteration {k+1} <<<')
+            
+            #==== Fine propagations (only the slices whose initial MPS changed) ====#
+            idx = list(range(k, n_slices))
+            for n, spre in zip(idx, run_fine(k, idx, [U[n] for n in idx])):
+                F[n], fpre[n] = ckpt(spre), spre
+
+            #==== Coarse propagations and updates ====#
+            Unew = [psi0] + [None] * n_slices
+            for n in range(0, n_slices):
+                if n <= k:
+                    # The initial MPS of slice n is unchanged, hence G cancels.
+                    Unew[n+1] = save(load(F[n], f'pr_k{k+1}_U{n+1}'), k+1, n+1)
+                    continue
+                g = ckpt(run_coarse(k+1, n, Unew[n]))
+                mps_g = load(g, 'pr_g')
+                mps_go = load(G[n], 'pr_go')
+                mps_f = load(F[n], 'pr_f')
+                mps_d = mps_f.deep_copy('pr_d')
+                MPS_addition(mps_d, mps_f, mps_go, idMPO, midMPO, [max_bond_dim],
+                             fit_nsteps, [0.0], fit_conv_tol, cutoff, 
+                             verbose_lvl=self.verbose-1)
+                mps_u = mps_f.deep_copy(f'pr_k{k+1}_U{n+1}')
+                MPS_addition(mps_u, mps_g, mps_d, idMPO, idMPO, [max_bond_dim],
+                             fit_nsteps, [0.0], fit_conv_tol, cutoff,
+                             verbose_lvl=self.verbose-1)
+                Unew[n+1] = save(mps_u, k+1, n+1)
+                G[n] = g
+
+            #==== Convergence ====#
+            fid_err = 0.0
+            for n in range(k+2, n_slices+1):
+                mps_a = load(Unew[n], 'pr_a')
+                mps_b = load(U[n], 'pr_b')
+                ab = calc_overlap_MPS(idMPO, mps_a, mps_b)
+                aa = calc_overlap_MPS(idMPO, mps_a, mps_a)
+                bb = calc_overlap_MPS(idMPO, mps_b, mps_b)
+                fid_err = max(fid_err, 1.0 - abs(ab)**2 / abs(aa*bb))
+            U = Unew
+            _print(f'Parareal iteration {k+1} : max. infidelity = {fid_err:.6e}, ' +
+                   f'wall time = {time.perf_counter()-t_start:.2f} s')
+            if fid_err < fid_tol:
+                break
+        if fid_err < fid_tol:
+            _print(f'The parareal propagation converged after {k+1} iterations.')
+        else:
+            print_warning(f'The parareal propagation did not converge after {k+1} ' +
+                          f'iterations, the max. infidelity is {fid_err:.6e}.')
+
+        #==== Merge the autocorrelations of the slices ====#
+        if te_args.get('save_txt', True):
+            rows = []
+            for n in range(0, n_slices):
+                ac = np.atleast_2d(np.loadtxt(wdir + '/' + fpre[n] + '.ac'))
+                ac2t = np.atleast_2d(np.loadtxt(wdir + '/' + fpre[n] + '.ac2t'))
+                for i in range(0, ac.shape[0]):
+                    if len(rows) == 0 or ac[i,1] > rows[-1][0] + 1.0E-10:
+                        rows.append((ac[i,1], complex(ac[i,2], ac[i,3]),
+                                     complex(ac2t[i,2], ac2t[i,3]), ac[i,5]))
+            ac_print = print_autocorrelation(prefix, len(rows), True,
+                                             te_args.get('save_npy', False))
+            ac_print.header()
+            for r in rows:
+                ac_print.print_ac(*r)
+
+        logbook.update({'parareal':{'t_slices':tb, 'n_iter':k+1, 'infidelity':fid_err,
+                                    'fine_prefixes':fpre, 'final_mps_dir':U[-1][0]}})
+        return logbook
+    ##############################################################
+
+
+    ##############################################################
+    def bond_dim_ladder(self, logbook, te_args, bond_dims, n_proc=None):
+        '''
+        Propagates the same initial MPS with each bond dimension in bond_dims and
+        extrapolates the autocorrelation, Lowdin partial charges, and multipole 
+        components to zero truncation error (see observables.extrapolate). The 
+        propagations share the Hamiltonian MPO built beforehand. Without MPI, they 
+        run concurrently in worker processes, at most n_proc (None means all) at a 
+        time (see run_workers for their memory and thread usage). Under MPI, they run
+        one after another, each one parallelized over all ranks.
+
+        te_args:
+           The keyword arguments of time_propagate (without logbook) shared by all 
+           propagations. max_bond_dim is replaced by the elements of bond_dims, and
+           the performance records (save_perf) that provide the discarded weights are
+           always written.
+
+        The propagation with bond dimension D uses <prefix>.D<D> as its prefix and 
+        <scratch>/ladder.D<D> as its scratch directory. The extrapolated quantities
+        and their error bars are written into <prefix>.xD.ac, <prefix>.xD.low, and
+        <prefix>.xD.mp.
+        '''
+        from IMAM_TDDMRG.observables import extrapolate
+
+        assert len(bond_dims) >= 2, 'At least two bond dimensions are needed for the ' + \
+            'extrapolation.'
+        assert te_args.get('save_txt', True), 'The bond dimension ladder requires ' + \
+            'save_txt=True since the extrapolation reads the text outputs.'
+        assert te_args.get('adaptive_dt') is None and \
+            te_args.get('bond_dim_policy') is None, 'The bond dimension ladder ' + \
+            'requires the same fixed time points and bond dimension in all propagations.'
+        prefix = te_args.get('prefix', 'te')
+        wdir = logbook['workdir']
+        scratch0 = self.scratch
+        prefixes = [prefix + f'.D{D}' for D in bond_dims]
+        _print('Bond dimension ladder = ', bond_dims)
+        
+        #==== Build the Hamiltonian MPO shared by all propagations ====#
+        self.get_mpo_orig()
+
+        scratches, calls = [], []
+        for D, dpre in zip(bond_dims, prefixes):
+            args = {**te_args, 'max_bond_dim':D, 'prefix':dpre, 'save_perf':True}
+            if args.get('inmps_dir0') is None:
+                args['inmps_dir0'] = scratch0
+            scratches.append(scratch0 + f'/ladder.D{D}')
+            calls.append([('time_propagate', args)])
+
+        if self.mpi is None:
+            _print(f'Running the propagations in at most {n_proc or len(bond_dims)} ' +
+                   'concurrent worker processes.')
+            logs = [wdir + '/' + p + '.out' for p in prefixes]
+            results = self.run_workers(logbook, calls, scratches, n_proc, logs)
+        else:
+            results = []
+            for D, scr, c in zip(bond_dims, scratches, calls):
+                print_section(f'Bond dimension {D}')
+                self.set_scratch(scr)
+                results.append(self.time_propagate(dict(logbook), **c[0][1]))
+        self.set_scratch(scratch0)
+        for D, lb in zip(bond_dims, results):
+            assert lb is not None, f'The propagation with bond dimension {D} failed, ' + \
+                'see ' + wdir + '/' + prefix + f'.D{D}.out.'
+
+        #==== Extrapolation to zero truncation error ====#
+        if self.mpi is None or self.mpi.rank == 0:
+            atom_symbol = [self.mol.atom_symbol(i) for i in range(0, self.mol.natm)]
+            xd = extrapolate.extrapolate_ladder([wdir + '/' + p for p in prefixes],
+                                                wdir + '/' + prefix + '.xD', atom_symbol)
+            _print('The extrapolated quantities are written into ' + wdir + '/' + 
+                   prefix + '.xD.*')
+            logbook.update({'ladder':{'bond_dims':list(bond_dims), 'prefixes':prefixes,
+                                      'extrapolated':xd}})
+        return logbook
+    ##############################################################
+
+
+    ##############################################################
+    def branch_propagate(self, logbook, te_args, branch_dir):
+        '''
+        Starts a new propagation from an MPS saved by an earlier propagation, e.g. in
+        <prefix>.sample/tevo-XXXX with save_mps='sampled' or in <prefix>.mps_t with
+        save_mps='overwrite', so that the part of the trajectory before it is not
+        recomputed. The initial time is the time recorded in branch_dir/TIME_INFO, 
+        while the autocorrelation still refers to the initial MPS of the earlier 
+        propagation.
+
+        te_args:
+           The keyword arguments of time_propagate (without logbook). inmps_dir0, 
+           inmps_name, inmps_cpx, and inmps_multi must describe the initial MPS of the
+           earlier propagation. Other parameters such as max_bond_dim, dt0, and method
+           may differ from those of the earlier propagation, tinit is ignored.
+        '''
+        if os.path.isfile(branch_dir + '/mps.mpsar'):
+            branch_mps = branch_dir + '/mps.mpsar'
+        else:
+            assert os.path.isfile(branch_dir + '/mps_info.bin'), \
+                f'No MPS is found in {branch_dir}.'
+            branch_mps = branch_dir
+        it0, tinit = read_time_info(branch_dir)
+        _print(f'Branching from time point {it0} (t = {tinit:.6f} a.u.) saved in ' +
+               branch_dir)
+        inmps_dir = te_args.get('inmps_dir0')
+        ac_ref = (self.scratch if inmps_dir is None else inmps_dir,
+                  te_args.get('inmps_name', 'ANN_KET'), te_args.get('inmps_cpx', False),
+                  te_args.get('inmps_multi', False))
+        args = {**te_args, 'inmps_dir0':branch_mps, 'inmps_name':'mps_info.bin',
+                'inmps_cpx':True, 'inmps_multi':comp == 'hybrid', 'tinit':tinit,
+                'ac_ref':ac_ref}
+        return self.time_propagate(logbook, **args)
+    ##############################################################
+
+
+    ##############################################################
+    def preview_propagate(self, logbook, te_args, max_bond_dim=None, dt=None, tmax=None,
+                          n_sample=40, thr=1.0E-3, safety=0.1, D_cap=2000):
+        '''
+        Runs a cheap propagation with a small bond dimension and a coarse time step
+        to recommend the production settings (see observables.te_preview.recommend).
+
+        te_args:
+           The keyword arguments of time_propagate (without logbook) of the intended
+           production run.
+        max_bond_dim, dt, tmax:
+           The bond dimension, time step, and final time of the preview. The defaults
+           are min(100, te_args['max_bond_dim']), 4 times the production time step, 
+           and te_args['tmax'].
+        n_sample:
+           The number of equidistant sampling times at which the partial charges are
+           calculated.
+        thr, safety, D_cap:
+           See observables.te_preview.recommend.
+
+        The preview uses <prefix>.preview as its prefix and <scratch>/preview as its
+        scratch directory. The recommended settings are written as an input snippet 
+        into <prefix>.preview.inp.
+        '''
+        from IMAM_TDDMRG.observables import te_preview
+
+        prefix = te_args.get('prefix', 'te')
+        wdir = logbook['workdir']
+        scratch0 = self.scratch
+        dt0 = te_args['dt0']
+        if max_bond_dim is None:
+            max_bond_dim = min(100, te_args['max_bond_dim'])
+        if dt is None:
+            dt = 4 * (dt0[0] if type(dt0) is list else dt0)
+        if tmax is None:
+            tmax = te_args['tmax']
+        tinit = te_args.get('tinit', 0.0)
+        ppre = prefix + '.preview'
+        _print(f'Preview propagation: bond dimension = {max_bond_dim}, ' +
+               f'time step = {dt:.6f} a.u., final time = {tmax:.6f} a.u.')
+        
+        args = {**te_args, 'max_bond_dim':max_bond_dim, 'dt0':dt, 'tmax':tmax,
+                'prefix':ppre, 't_sample':list(np.linspace(tinit, tmax, n_sample)),
+                'save_mps':'no', 'save_1pdm':False, 'save_2pdm':False, 'save_txt':True,
+                'resume':False, 'adaptive_dt':None, 'bond_dim_policy':None,
+                'ac_stride':1, 'save_perf':True}
+        if args.get('inmps_dir0') is None:
+            args['inmps_dir0'] = scratch0
+        self.set_scratch(scratch0 + '/preview')
+        self.time_propagate(dict(logbook), **args)
+        self.set_scratch(scratch0)
+
+        #==== Recommendations ====#
+        if self.mpi is None or self.mpi.rank == 0:
+            rec = te_preview.recommend(wdir + '/' + ppre, tmax, tinit, thr, safety,
+                                       D_cap=D_cap)
+            _print('Recommended production settings:')
+            _print('  dt = %.6f a.u.' % rec['dt'])
+            _print('  te_max_D = %d' % rec['te_max_D'])
+            if 'sample_interval' in rec:
+                _print('  sampling interval = %.6f a.u.' % rec['sample_interval'])
+            for n in rec['notes']:
+                _print('  NOTE: ' + n)
+            _print('The input snippet is written into ' + wdir + '/' + ppre + '.inp')
+            logbook.update({'preview':rec})
+        return logbook
+    ##############################################################
     
 
     ##############################################################
@@ -1879,6 +3360,28 @@ class MYTDDMRG:
 ##############################################################
 
 
+##############################################################
+def te_worker(mol, init_args, ham_args, verbose, logbook, calls):
+    '''
+    The job of a worker process started by MYTDDMRG.run_workers. Builds a MYTDDMRG
+    object from the molecule mol (serialized by Mole.dumps), the keyword arguments of
+    its constructor, and those of the method that initializes its Hamiltonian, then
+    calls each (method, kwargs) in calls with the logbook returned by the previous 
+    one, and returns the last logbook.
+    '''
+    from pyscf import gto
+
+    obj = MYTDDMRG(gto.loads(mol), **init_args)
+    obj.verbose = verbose
+    getattr(obj, ham_args[0])(**ham_args[1])
+    for name, kwargs in calls:
+        if isinstance(kwargs.get('method'), str):
+            kwargs = {**kwargs, 'method':getattr(b2.TETypes, kwargs['method'])}
+        logbook = getattr(obj, name)(logbook, **kwargs)
+    return logbook
+##############################################################
+
+
 
 
 # 1) Does the input ket have to be complex or real?
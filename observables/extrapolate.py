@@ -0,0 +1,216 @@
+import os, json
+import numpy as np
+from IMAM_TDDMRG.phys_const import au2fs
+from IMAM_TDDMRG.utils.util_print import print_describe_content
+
+
+
+######################################
+#=======================#
+#==== USAGE EXAMPLE ====#
+#=======================#
+'''
+from IMAM_TDDMRG.observables import extrapolate
+
+prefixes = ['H2O.D200', 'H2O.D300', 'H2O.D400']
+extrapolate.extrapolate_ladder(prefixes, 'H2O.xD')
+'''
+######################################
+
+
+
+##########################################################
+def read_ac(prefix):
+    '''
+    Returns the time points, the autocorrelation, and the squared norm stored in
+    <prefix>.ac.
+    '''
+    d = np.atleast_2d(np.loadtxt(prefix + '.ac'))
+    return d[:,1], d[:,2] + 1j*d[:,3], d[:,5]
+##########################################################
+
+
+##########################################################
+def read_pcharge(prefix):
+    '''
+    Returns the time points and the Lowdin partial charges (atoms x time points)
+    stored in <prefix>.<i>.low, or None, None if these files do not exist.
+    '''
+    nparts = 0
+    while os.path.isfile(prefix + f'.{nparts+1}.low'):
+        nparts += 1
+    if nparts == 0:
+        return None, None
+    d = [np.atleast_2d(np.loadtxt(prefix + f'.{i+1}.low')) for i in range(0, nparts)]
+    return d[0][:,1], np.vstack([x[:,2:].T for x in d])
+##########################################################
+
+
+##########################################################
+def read_mpole(prefix):
+    '''
+    Returns the time points and the multipole components (x, y, z, xx, yy, zz, xy,
+    yz, xz times time points) stored in <prefix>.mp, or None, None if the file does
+    not exist.
+    '''
+    try:
+        d = np.atleast_2d(np.loadtxt(prefix + '.mp'))
+    except (FileNotFoundError, OSError):
+        return None, None
+    return d[:,1], d[:,2:].T
+##########################################################
+
+
+##########################################################
+def read_discarded_weight(prefix):
+    '''
+    Returns the time points and the discarded weights accumulated up to each of
+    them from the per-step records in <prefix>.perf.jsonl.
+    '''
+    tt, dw = [], []
+    with open(prefix + '.perf.jsonl', 'r') as pf:
+        for l in pf:
+            rec = json.loads(l)
+            tt.append(rec['t'])
+            dw.append(rec['discarded_weight'])
+    return np.array(tt), np.cumsum(dw)
+##########################################################
+
+
+##########################################################
+def extrapolate(w, y):
+    '''
+    Linearly extrapolates y to zero truncation error w at each time point.
+
+    w = The truncation errors (bond dimensions x time points).
+    y = The observables (bond dimensions x quantities x time points), it may be
+        complex.
+
+    Returns y0 and its error bar (quantities x time points). The error bar is the
+    difference between y0 and the value of the run with the smallest truncation error,
+    or the spread of the values where the truncation errors of all runs are equal.
+    '''
+    wm = np.mean(w, axis=0)
+    ym = np.mean(y, axis=0)
+    sww = np.sum((w - wm)**2, axis=0)
+    swy = np.sum((w - wm)[:,None,:] * (y - ym), axis=0)
+    ibest = np.argmin(w, axis=0)
+    ybest = y[ibest, :, np.arange(w.shape[1])].T
+
+    flat = sww <= 1.0E-30 + 1.0E-12 * wm**2
+    slope = np.where(flat, 0.0, swy / np.where(flat, 1.0, sww))
+    y0 = np.where(flat, ybest, ym - slope * wm)
+    err = np.where(flat, np.ptp(y.real, axis=0) + 1j*np.ptp(y.imag, axis=0),
+                   np.abs((y0 - ybest).real) + 1j*np.abs((y0 - ybest).imag))
+    if not np.iscomplexobj(y):
+        err = err.real
+    return y0, err
+##########################################################
+
+
+##########################################################
+def common_times(tts):
+    '''
+    The time points (rounded to 1.0E-6 a.u.) found in every array in tts.
+    '''
+    tc = set(np.round(tts[0], 6))
+    for tt in tts[1:]:
+        tc &= set(np.round(tt, 6))
+    return np.array(sorted(tc))
+##########################################################
+
+
+##########################################################
+def select(tt, y, tc):
+    '''
+    The columns of y at the time points tc.
+    '''
+    idx = {t: i for i, t in enumerate(np.round(tt, 6))}
+    return y[..., [idx[t] for t in tc]]
+##########################################################
+
+
+##########################################################
+def write_extrap(fname, desc, labels, tc, w, y0, err):
+    hline = ''.join(['-' for i in range(0, 9+1+13+2+(1+14)*(1+2*len(labels)))])
+    with open(fname, 'w') as f:
+        print_describe_content(desc, f)
+        f.write('# 1 a.u. of time = %.10f fs\n' % au2fs)
+        f.write('#' + hline + '\n')
+        f.write('#%9s %13s  ' % ('No.', 'Time (a.u.)') + ' %14s' % 'Max. trunc.' +
+                ''.join([' %14s %14s' % (l, 'err_' + l) for l in labels]) + '\n')
+        f.write('#' + hline + '\n')
+        for i in range(0, len(tc)):
+            f.write(' %9d %13.8f  ' % (i, tc[i]) + ' %14.6e' % np.max(w[:,i]) +
+                    ''.join([' %14.6e %14.6e' % (y0[j,i], err[j,i])
+                             for j in range(0, len(labels))]) + '\n')
+##########################################################
+
+
+##########################################################
+def extrapolate_ladder(prefixes, out_prefix, atom_symbol=None):
+    '''
+    Extrapolates the observables of time propagations of the same initial MPS with
+    different bond dimensions (one prefix per bond dimension) to zero truncation
+    error. The truncation error of each run at a given time is the discarded weight
+    accumulated up to that time, read from <prefix>.perf.jsonl. The outputs are:
+       <out_prefix>.ac : Real and imaginary parts of the autocorrelation and the
+                         squared norm.
+       <out_prefix>.low : Lowdin partial charges (if available).
+       <out_prefix>.mp : Multipole components (if available).
+    Each quantity is followed by its error bar (see extrapolate). Only the time points
+    shared by all runs are used. Returns a dictionary of the extrapolated quantities.
+    '''
+    assert len(prefixes) >= 2, 'At least two bond dimensions are needed for the ' + \
+        'extrapolation.'
+    dws = [read_discarded_weight(p) for p in prefixes]
+    tw = [np.concatenate(([x[0][0]-1.0], x[0])) for x in dws]
+    ww = [np.concatenate(([0.0], x[1])) for x in dws]
+    # The time point before the first record has zero truncation error.
+    out = {}
+
+    def trunc_at(tt):
+        # The accumulated discarded weight at the last record not later than tt.
+        return np.array([ww[i][np.searchsorted(tw[i], tt + 1.0E-9) - 1]
+                         for i in range(0, len(prefixes))])
+
+    #==== Autocorrelation ====#
+    acs = [read_ac(p) for p in prefixes]
+    tc = common_times([x[0] for x in acs])
+    w = trunc_at(tc)
+    y = np.array([np.vstack((select(x[0], x[1], tc), select(x[0], x[2], tc)))
+                  for x in acs])
+    y0, err = extrapolate(w, y)
+    y0_ = np.vstack((y0[0].real, y0[0].imag, y0[1].real))
+    err_ = np.vstack((err[0].real, err[0].imag, err[1].real))
+    write_extrap(out_prefix + '.ac', 'extrapolated autocorrelation data',
+                 ('Real part', 'Imag. part', 'Norm'), tc, w, y0_, err_)
+    out['ac'] = {'t':tc, 'ac':y0[0], 'ac_err':err[0], 'normsq':y0[1].real,
+                 'trunc':w}
+
+    #==== Lowdin partial charges ====#
+    qs = [read_pcharge(p) for p in prefixes]
+    if all(x[0] is not None for x in qs):
+        tc = common_times([x[0] for x in qs])
+        w = trunc_at(tc)
+        y0, err = extrapolate(w, np.array([select(x[0], x[1], tc) for x in qs]))
+        if atom_symbol is None:
+            labels = [f'atom{i+1}' for i in range(0, y0.shape[0])]
+        else:
+            labels = [atom_symbol[i] + str(i+1) for i in range(0, y0.shape[0])]
+        write_extrap(out_prefix + '.low', 'extrapolated Lowdin partial charge data',
+                     labels, tc, w, y0, err)
+        out['pcharge'] = {'t':tc, 'q':y0, 'q_err':err, 'trunc':w}
+
+    #==== Multipole components ====#
+    mps = [read_mpole(p) for p in prefixes]
+    if all(x[0] is not None for x in mps):
+        tc = common_times([x[0] for x in mps])
+        w = trunc_at(tc)
+        y0, err = extrapolate(w, np.array([select(x[0], x[1], tc) for x in mps]))
+        write_extrap(out_prefix + '.mp', 'extrapolated multipole components data',
+                     ('x', 'y', 'z', 'xx', 'yy', 'zz', 'xy', 'yz', 'xz'), tc, w, y0, err)
+        out['mpole'] = {'t':tc, 'mp':y0, 'mp_err':err, 'trunc':w}
+
+    return out
+##########################################################
@@ -0,0 +1,233 @@
+import json
+import numpy as np
+from IMAM_TDDMRG.phys_const import au2fs, hartree2ev
+from IMAM_TDDMRG.utils.util_print import print_describe_content
+from IMAM_TDDMRG.observables.fourier.fft_util import mask as fft_mask
+from IMAM_TDDMRG.observables.extrapolate import read_ac, read_pcharge
+
+
+
+######################################
+#=======================#
+#==== USAGE EXAMPLE ====#
+#=======================#
+'''
+from IMAM_TDDMRG.observables import te_preview
+
+rec = te_preview.recommend('H2O.preview', tmax=400.0)
+'''
+######################################
+
+
+
+##########################################################
+def ac_spectrum(t, ac, pad_factor=4):
+    '''
+    Returns the angular frequencies and the normalized spectrum of the autocorrelation
+    ac sampled at the equidistant time points t, using a(-t) = a(t)^* and a cos^2
+    mask. The time step of a cheap propagation is usually too coarse to resolve the
+    absolute energies, hence the frequencies are only defined modulo 2*pi/dt and are
+    returned in [0, 2*pi/dt).
+    '''
+    dt = t[1] - t[0]
+    n = pad_factor * len(t)
+    y = ac * fft_mask('cos', t - t[0], 2, verbose=False)
+    spec = 2 * np.real(np.fft.ifft(y, n)) * n - np.real(y[0])
+    spec = np.abs(spec) / np.max(np.abs(spec))
+    return 2 * np.pi * np.arange(0, n) / (n * dt), spec
+##########################################################
+
+
+##########################################################
+def bandwidth(w, spec, thr):
+    '''
+    The width of the frequency window occupied by the spectrum, i.e. the full window
+    2*pi/dt minus the largest (periodic) gap in which the spectrum is below thr.
+    Returns the width, the frequency at which the occupied window starts, and the
+    fraction of the full window covered by the largest gap.
+    '''
+    sig = spec >= thr
+    n = len(sig)
+    dw = w[1] - w[0]
+    i0 = int(np.argmax(sig))
+    s = np.roll(sig, -i0)
+    gap, run, gap_end = 0, 0, 0
+    for i in range(0, n):
+        if s[i]:
+            run = 0
+        else:
+            run += 1
+            if run > gap:
+                gap, gap_end = run, i
+    w_lo = w[(i0 + gap_end + 1) % n] if gap > 0 else w[0]
+    return (n - gap) * dw, w_lo, gap / n
+##########################################################
+
+
+##########################################################
+def charge_frequency(t, q, thr, pad_factor=4):
+    '''
+    The highest angular frequency at which the spectrum of any of the partial charge
+    traces q (atoms x time points, sampled at the equidistant time points t) exceeds
+    thr times its largest value. Returns the frequency and the Nyquist frequency of t.
+    '''
+    dt = t[1] - t[0]
+    n = pad_factor * len(t)
+    w = 2 * np.pi * np.fft.rfftfreq(n, dt)
+    m = fft_mask('cos', t - t[0], 2, verbose=False)
+    amp = np.abs(np.fft.rfft((q - np.mean(q, axis=1, keepdims=True)) * m, n, axis=1))
+    if np.max(amp) == 0.0:
+        return 0.0, np.pi / dt
+    sig = np.nonzero(np.max(amp, axis=0) >= thr * np.max(amp))[0]
+    return w[sig[-1]], np.pi / dt
+##########################################################
+
+
+##########################################################
+def bond_dim_growth(prefix):
+    '''
+    Analyzes the bond dimensions and discarded weights recorded in <prefix>.perf.jsonl.
+    Returns a dictionary with the time at which the bond dimension reached its upper
+    limit ('t_sat', None if it never did), the growth rate of ln(D) per a.u. of time
+    before that ('rate'), the largest bond dimension ('D_max'), its upper limit
+    ('D_lim'), the total discarded weight ('dw_total'), and whether the growth rate 
+    could not be fitted ('degenerate'). The initial time point and the first time 
+    step are excluded from the analysis of the growth because the bond dimension of 
+    the initial MPS (e.g. from the annihilation) does not reflect the dynamics, and it
+    often jumps right to the limit in the first step.
+    '''
+    tt, D, D_lim, dw = [], [], [], []
+    with open(prefix + '.perf.jsonl', 'r') as pf:
+        for l in pf:
+            rec = json.loads(l)
+            tt.append(rec['t'])
+            D.append(rec['bond_dim'])
+            D_lim.append(rec['bond_dim_te'])
+            dw.append(rec['discarded_weight'])
+    tt, D, D_lim = np.array(tt), np.array(D), np.array(D_lim)
+    tt_, D_, D_lim_ = tt[2:], D[2:], D_lim[2:]     # After the first time step.
+    isat = np.nonzero(D_ >= D_lim_)[0]
+    t_sat = tt_[isat[0]] if len(isat) > 0 else None
+    ok = (D_ > 1) if t_sat is None else (D_ > 1) & (tt_ <= t_sat)
+    degenerate = not (np.count_nonzero(ok) >= 2 and np.ptp(tt_[ok]) > 0.0)
+    if degenerate:
+        rate = 0.0
+    else:
+        rate = np.polyfit(tt_[ok], np.log(D_[ok]), 1)[0]
+    return {'t_sat':t_sat, 'rate':max(rate, 0.0), 'D_max':int(np.max(D)),
+            'D_lim':int(D_lim[-1]), 'dw_total':float(np.sum(dw)),
+            'degenerate':degenerate}
+##########################################################
+
+
+##########################################################
+def round_down(x, ndigit=2):
+    '''
+    Rounds x down to ndigit significant digits.
+    '''
+    e = np.floor(np.log10(x)) - (ndigit - 1)
+    return np.floor(x / 10**e) * 10**e
+##########################################################
+
+
+##########################################################
+def recommend(prefix, tmax, tinit=0.0, thr=1.0E-3, safety=0.1, n_per_period=8,
+              D_cap=2000):
+    '''
+    Recommends the production settings from the outputs of a cheap (small bond
+    dimension, coarse time step) propagation that used the prefix `prefix`:
+       dt : safety * 2*pi / (the width of the frequency window occupied by the
+            autocorrelation spectrum above thr).
+       te_sample : A grid with n_per_period points per period of the highest
+            frequency found in the Lowdin partial charges (if available), in
+            multiples of dt.
+       te_max_D : The bond dimension extrapolated to tmax with the growth rate of
+            ln(D) observed before the bond dimension saturated, in multiples of 50
+            and at most D_cap. If it never saturated, 1.2 times the largest bond
+            dimension. If the growth cannot be fitted (e.g. the preview starts at 
+            its bond dimension limit), D_cap with a warning.
+    The spectrum is written into <prefix>.fft_ac and the recommendations, as a
+    snippet that can be pasted into an input file, into <prefix>.inp. Returns a
+    dictionary of the recommendations and the underlying analysis.
+    '''
+    rec = {}
+    notes = []
+
+    #==== Time step from the autocorrelation spectrum ====#
+    t, ac, _ = read_ac(prefix)
+    w, spec = ac_spectrum(t, ac)
+    band, w_lo, gap = bandwidth(w, spec, thr)
+    if gap < 0.1:
+        notes.append('The autocorrelation spectrum fills most of the frequency window ' +
+                     'of the preview, its time step may be too coarse.')
+    dt = round_down(safety * 2 * np.pi / band)
+    rec.update({'dt':dt, 'ac_bandwidth':band, 'ac_gap_fraction':gap})
+    with open(prefix + '.fft_ac', 'w') as f:
+        print_describe_content('autocorrelation spectrum of the preview propagation', f)
+        f.write('# Frequencies are relative to the lower edge of the occupied window ' +
+                '(%.8f Hartree modulo %.8f Hartree).\n' % (w_lo, w[1]*len(w)))
+        f.write('#%9s %16s %16s %16s\n' % ('No.', 'Freq. (Hartree)', 'Freq. (eV)',
+                                            'Intensity'))
+        ws = np.mod(w - w_lo, w[1]*len(w))
+        for i, j in enumerate(np.argsort(ws)):
+            f.write(' %9d %16.8f %16.8f %16.8e\n' % (i, ws[j], ws[j]*hartree2ev, spec[j]))
+
+    #==== Sampling grid from the partial charges ====#
+    tq, q = read_pcharge(prefix)
+    if tq is not None and len(tq) >= 4:
+        wq, wq_nyq = charge_frequency(tq, q, thr)
+        if wq >= 0.8 * wq_nyq:
+            notes.append('The highest frequency of the partial charges is close to the ' +
+                         'Nyquist frequency of the preview sampling grid.')
+        if wq > 0.0:
+            dt_s = max(np.floor(2*np.pi / wq / n_per_period / dt), 1) * dt
+        else:
+            dt_s = max(np.floor((tq[-1] - tq[0]) / (len(tq) - 1) / dt), 1) * dt
+        rec.update({'sample_interval':dt_s, 'pcharge_max_freq':wq})
+    else:
+        notes.append('No partial charges are available, no sampling grid is ' +
+                     'recommended.')
+
+    #==== Bond dimension from its growth ====#
+    g = bond_dim_growth(prefix)
+    if g['t_sat'] is not None and g['degenerate']:
+        D = D_cap
+        notes.append('WARNING: The bond dimension of the preview is at its limit ' +
+                     '(%d) from the start, so its growth cannot be fitted and ' % 
+                     g['D_lim'] + 'D_cap is recommended. Use a larger preview bond ' +
+                     'dimension for a meaningful estimate.')
+    elif g['t_sat'] is None:
+        D = min(1.2 * g['D_max'], D_cap)
+    else:
+        lnD = np.log(g['D_lim']) + g['rate'] * max(tmax - g['t_sat'], 0.0)
+        D = np.exp(min(lnD, np.log(D_cap)))        # Avoid overflows.
+        notes.append('The bond dimension of the preview saturated at t = %.4f a.u.' %
+                     g['t_sat'])
+    D = min(int(50 * np.ceil(D / 50)), D_cap)
+    rec.update({'te_max_D':D, 'bond_dim_growth':g})
+
+    #==== Input snippet ====#
+    with open(prefix + '.inp', 'w') as f:
+        f.write(f'# Production settings recommended from the preview propagation {prefix}.\n')
+        f.write('#   Autocorrelation bandwidth = %.6f Hartree (%.4f eV)\n' %
+                (band, band*hartree2ev))
+        f.write('#   Spectral resolution at tmax = %.6f Hartree (%.4f eV)\n' %
+                (2*np.pi/(tmax-tinit), 2*np.pi/(tmax-tinit)*hartree2ev))
+        if 'pcharge_max_freq' in rec:
+            f.write('#   Highest partial charge frequency = %.6f Hartree (period ' %
+                    rec['pcharge_max_freq'] + '%.4f fs)\n' %
+                    (2*np.pi/max(rec['pcharge_max_freq'], 1.0E-12)*au2fs))
+        f.write('#   ln(D) growth rate = %.6f per a.u., total discarded weight = %.4e\n' %
+                (g['rate'], g['dw_total']))
+        for n in notes:
+            f.write('#   NOTE: ' + n + '\n')
+        f.write('dt = %s\n' % repr(float(dt)))
+        f.write('tmax = %s\n' % repr(float(tmax)))
+        f.write('te_max_D = %d\n' % D)
+        if 'sample_interval' in rec:
+            f.write('te_sample = np.arange(%s, %s, %s)\n' %
+                    (repr(float(tinit)), repr(float(tmax + 0.5*dt)),
+                     repr(float(rec['sample_interval']))))
+    rec['notes'] = notes
+    return rec
+##########################################################
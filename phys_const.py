@@ -5,3 +5,4 @@ import numpy as np
 au2fs = 2.4188843265E-2
 rad2deg = 180/np.pi
 ang2bohr = 1.8897261255
+hartree2ev = 27.211386245988
@@ -0,0 +1,20 @@
+import os, sys, types
+
+
+#==== Make the repository importable as IMAM_TDDMRG ====#
+# The modules import each other as IMAM_TDDMRG.<subpackage>.<module>, which works
+# when the parent of the repository is on the path and the repository directory is
+# named IMAM_TDDMRG. Otherwise, the repository is registered under that name here.
+try:
+    import IMAM_TDDMRG
+except ImportError:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    pkg = types.ModuleType('IMAM_TDDMRG')
+    pkg.__path__ = [root]
+    sys.modules['IMAM_TDDMRG'] = pkg
+
+
+#==== The complex MPS type is set by cm_dmrg before the modules are imported ====#
+from IMAM_TDDMRG.utils import util_complex_type
+if not util_complex_type.isset:
+    util_complex_type.init('hybrid')
@@ -0,0 +1,62 @@
+import os, sys
+import pytest
+pytest.importorskip('numpy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import cm_inputs     # Imports defvals as a top-level module like cm_dmrg.
+
+
+BASE = '''
+inp_coordinates = 'H 0 0 0; H 0 0 0.74'
+inp_basis = 'sto-3g'
+wfn_sym = 'A1'
+nCore, nCAS, nelCAS, twos = 0, 2, 1, 1
+do_groundstate = False
+do_annihilate = False
+do_timeevo = True
+te_max_D = 50
+tmax = 1.0
+dt = 0.05
+'''
+
+
+#################################################
+@pytest.fixture
+def get_inputs(tmp_path):
+    # get_inputs executes the input file in the namespace of cm_inputs, which is
+    # restored afterwards so that the inputs of one test do not leak into another.
+    saved = dict(vars(cm_inputs))
+    def run(extra=''):
+        inp = tmp_path / 'inp.py'
+        inp.write_text(BASE + extra)
+        return cm_inputs.get_inputs(str(inp))
+    yield run
+    vars(cm_inputs).clear()
+    vars(cm_inputs).update(saved)
+#################################################
+
+
+#################################################
+def test_ac_stride(get_inputs):
+    assert get_inputs()['te_ac_stride'] == 1
+    assert get_inputs('te_ac_stride = 10\n')['te_ac_stride'] == 10
+#################################################
+
+
+#################################################
+def test_te_mpo(get_inputs):
+    inputs = get_inputs()
+    assert inputs['te_mpo_algo'] is None and inputs['te_mpo_cutoff'] == 1E-20
+    assert inputs['te_mpo_compare'] is None
+    inputs = get_inputs("te_mpo_algo = 'FastBipartite'\nte_mpo_cutoff = 1E-12\n" +
+                        "te_mpo_compare = [('SVD', 1E-8)]\n")
+    assert (inputs['te_mpo_algo'], inputs['te_mpo_cutoff']) == ('FastBipartite', 1E-12)
+    assert inputs['te_mpo_compare'] == [('SVD', 1E-8)]
+#################################################
+
+
+#################################################
+def test_subspace_expansion(get_inputs):
+    assert get_inputs()['te_subspace_expansion'] is None
+    inputs = get_inputs("te_subspace_expansion = {'every':5, 'noise':1.0E-6}\n")
+    assert inputs['te_subspace_expansion'] == {'every':5, 'noise':1.0E-6}
+#################################################
@@ -0,0 +1,47 @@
+import pytest
+np = pytest.importorskip('numpy')
+from IMAM_TDDMRG.observables.extrapolate import extrapolate, common_times, select
+
+
+#################################################
+def test_extrapolate_linear():
+    # Two quantities that depend linearly on the truncation error.
+    w = np.array([[1.0E-3, 2.0E-4, 5.0E-5],
+                  [4.0E-3, 1.0E-3, 3.0E-4],
+                  [8.0E-3, 3.0E-3, 1.0E-3]])
+    a = np.array([[1.0, 2.0, 3.0], [-0.5, 0.0, 0.5]])
+    b = np.array([10.0, -3.0])
+    y = a[None,:,:] + b[None,:,None] * w[:,None,:]
+    y0, err = extrapolate(w, y)
+    assert y0.shape == (2, 3) and err.shape == (2, 3)
+    assert not np.iscomplexobj(err)
+    assert np.allclose(y0, a, rtol=0, atol=1.0E-12)
+    assert np.allclose(err, np.abs(b[:,None] * w[0][None,:]), rtol=1.0E-10)
+#################################################
+
+
+#################################################
+def test_extrapolate_flat_complex():
+    # Equal truncation errors at the second time point, no fit is possible there.
+    w = np.array([[1.0E-3, 5.0E-4],
+                  [4.0E-3, 5.0E-4]])
+    y = np.zeros((2, 1, 2), dtype=complex)
+    y[:,0,0] = 1.0 + 1j + (10.0 - 2j) * w[:,0]
+    y[:,0,1] = [2.0 + 0.1j, 2.2 - 0.1j]
+    y0, err = extrapolate(w, y)
+    assert np.isclose(y0[0,0], 1.0 + 1j)
+    assert np.isclose(err[0,0], 10.0E-3 + 2.0E-3j)
+    assert np.isclose(y0[0,1], 2.0 + 0.1j)
+    assert np.isclose(err[0,1], 0.2 + 0.2j)
+#################################################
+
+
+#################################################
+def test_common_times_select():
+    tt1 = np.array([0.0, 0.1, 0.2, 0.3])
+    tt2 = np.array([0.1, 0.3, 0.5])
+    tc = common_times([tt1, tt2])
+    assert np.allclose(tc, [0.1, 0.3])
+    y = np.arange(8).reshape(2, 4)
+    assert np.array_equal(select(tt1, y, tc), [[1, 3], [5, 7]])
+#################################################
@@ -0,0 +1,63 @@
+import json
+import pytest
+np = pytest.importorskip('numpy')
+pytest.importorskip('scipy')
+from IMAM_TDDMRG.observables import te_preview
+
+
+#################################################
+def write_preview(prefix, D, D_lim, n=64, dt=0.5):
+    '''
+    Writes the autocorrelation, partial charges, and performance records of a
+    synthetic preview propagation with the bond dimensions D.
+    '''
+    t = dt * np.arange(0, n)
+    ac = 0.6*np.exp(-0.3j*t) + 0.4*np.exp(-1.1j*t)
+    with open(prefix + '.ac', 'w') as f:
+        for i in range(0, n):
+            f.write('%d %.8f %.10f %.10f %.10f %.10f\n' %
+                    (i, t[i], ac[i].real, ac[i].imag, abs(ac[i]), 1.0))
+    with open(prefix + '.1.low', 'w') as f:
+        for i in range(0, n):
+            f.write('%d %.8f %.10f %.10f\n' % (i, t[i], 0.1*np.cos(0.4*t[i]),
+                                               -0.1*np.cos(0.4*t[i])))
+    with open(prefix + '.perf.jsonl', 'w') as f:
+        for i in range(0, n):
+            f.write(json.dumps({'t':t[i], 'bond_dim':int(D[i]), 'bond_dim_te':D_lim,
+                                'discarded_weight':1.0E-8}) + '\n')
+    return t
+#################################################
+
+
+#################################################
+def test_recommend_growth(tmp_path):
+    prefix = str(tmp_path / 'te.preview')
+    n = 64
+    t = write_preview(prefix, np.minimum(np.exp(0.1 * 0.5 * np.arange(n)) * 10, 100),
+                      100, n=n)
+    rec = te_preview.recommend(prefix, tmax=40.0, D_cap=2000)
+    assert 0.0 < rec['dt'] < t[1]
+    assert rec['sample_interval'] >= rec['dt']
+    g = rec['bond_dim_growth']
+    assert not g['degenerate'] and np.isclose(g['rate'], 0.1, rtol=0.05)
+    assert rec['te_max_D'] % 50 == 0 and 100 < rec['te_max_D'] < 2000
+    assert any('saturated' in n for n in rec['notes'])
+    snippet = open(prefix + '.inp').read()
+    assert 'te_max_D = %d' % rec['te_max_D'] in snippet
+    assert (tmp_path / 'te.preview.fft_ac').is_file()
+#################################################
+
+
+#################################################
+def test_recommend_degenerate(tmp_path, capsys):
+    # The bond dimension is at its limit from the start.
+    prefix = str(tmp_path / 'te.preview')
+    write_preview(prefix, np.full(64, 50), 50)
+    rec = te_preview.recommend(prefix, tmax=100.0, D_cap=800)
+    assert rec['bond_dim_growth']['degenerate']
+    assert rec['te_max_D'] == 800
+    assert rec['notes'][-1].startswith('WARNING')
+
+    #==== The notes are returned to the caller and not printed ====#
+    assert capsys.readouterr().out == ''
+#################################################
@@ -0,0 +1,165 @@
+import os, pickle
+import pytest
+np = pytest.importorskip('numpy')
+pytest.importorskip('scipy')
+from IMAM_TDDMRG.utils.util_print import print_autocorrelation, print_td_pcharge, \
+    print_td_mpole
+from IMAM_TDDMRG.utils.util_te import te_step_controller, write_te_state, \
+    write_time_info_ow, read_time_info
+
+
+H = np.array([[0.3, 0.5], [0.5, -0.4]])
+
+
+#################################################
+def rk2(psi, dt):
+    return psi - 1j*dt * H @ (psi - 0.5j*dt * H @ psi)
+#################################################
+
+
+#################################################
+def propagate(path, tmax, ckpt_every=None, stop_at=None, resume=False):
+    '''
+    A model of the time loop of time_propagate on a two-level system with adaptive
+    time steps. The state needed to resume is checkpointed into path/mps_t every
+    ckpt_every time points, and the loop is interrupted after time point stop_at.
+    '''
+    os.chdir(path)
+    dir_ow = str(path / 'mps_t')
+    os.makedirs(dir_ow, exist_ok=True)
+    ctl = te_step_controller(0.5, 1.0E-5, dt_min=0.01, order=2)
+    ac_print = print_autocorrelation('te', 4)
+    psi0 = np.array([1.0, 0.0], dtype=complex)
+    psi, ts, it = psi0, [0.0], 0
+    if resume:
+        with open(dir_ow + '/TE_STATE', 'rb') as f:
+            state = pickle.load(f)
+        it_ck, t_ck = read_time_info(dir_ow)
+        assert it_ck == state['it'] and np.isclose(t_ck, state['tt'], atol=1.0E-6)
+        ctl.restore(state['dtctl'])
+        ac_print.restore(state['ac_print'])
+        ts, it = state['ts'], state['it'] + 1
+        psi = np.load(dir_ow + '/psi.npy')
+        ts.append(ctl.next_time(ts[-1], tmax))
+    else:
+        ac_print.header()
+    while it < len(ts):
+        if it > 0:
+            while True:
+                dt = ts[it] - ts[it-1]
+                full = rk2(psi, dt)
+                half = rk2(rk2(psi, dt/2), dt/2)
+                err = ctl.error(np.vdot(full, full).real, np.vdot(half, half).real,
+                                np.vdot(full, half))
+                if ctl.accept(err, dt):
+                    ctl.update(err, dt)
+                    break
+                ts[it] = ctl.next_time(ts[it-1], tmax)
+            psi = half
+        ac_print.print_ac(ts[it], np.vdot(psi0, psi), np.vdot(psi.conj(), psi),
+                          np.vdot(psi, psi).real)
+        if ckpt_every is not None and it % ckpt_every == 0:
+            np.save(dir_ow + '/psi.npy', psi)
+            write_te_state(dir_ow, {'it':it, 'tt':ts[it], 'ts':list(ts),
+                                    'dtctl':ctl.get_state(),
+                                    'ac_print':ac_print.get_state()})
+            write_time_info_ow(dir_ow, ts[it], it, ts[it], it, np.vdot(psi, psi).real,
+                               np.vdot(psi0, psi))
+        if it == stop_at:
+            return
+        if ts[-1] < tmax - ctl.t_eps:
+            ts.append(ctl.next_time(ts[-1], tmax))
+        it += 1
+#################################################
+
+
+#################################################
+def test_te_state_round_trip(tmp_path):
+    state = {'it':3, 'tt':0.3, 'ts':[0.0, 0.1, 0.2, 0.3], 'i_sp':1,
+             'te':{'n_sub_sweeps':2}, 'issampled':[True, False],
+             'ac_print':{'it':3, 'ac':np.arange(4) * (1+1j)}}
+    write_te_state(str(tmp_path), state)
+    assert os.listdir(tmp_path) == ['TE_STATE']
+    with open(tmp_path / 'TE_STATE', 'rb') as f:
+        state2 = pickle.load(f)
+    assert state2.keys() == state.keys()
+    assert np.array_equal(state2['ac_print']['ac'], state['ac_print']['ac'])
+    assert state2['ts'] == state['ts'] and state2['te'] == state['te']
+
+    #==== TIME_INFO of the checkpoint ====#
+    write_time_info_ow(str(tmp_path), 0.3, 3, 0.25, 1, 0.999, 0.5-0.1j)
+    assert sorted(os.listdir(tmp_path)) == ['TE_STATE', 'TIME_INFO']
+    assert read_time_info(str(tmp_path)) == (3, 0.3)
+#################################################
+
+
+#################################################
+def test_ac_print_restore(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ac_print = print_autocorrelation('te', 2)
+    ac_print.header()
+    for it in range(0, 5):
+        ac_print.print_ac(0.1*it, complex(1, it), complex(it, 1), 1.0)
+        if it == 2:
+            state = ac_print.get_state()
+    ac_full = (tmp_path / 'te.ac').read_text().splitlines()
+
+    #==== The rows printed after the checkpoint are dropped ====#
+    ac_print = print_autocorrelation('te', 2)
+    ac_print.restore(state)
+    assert (tmp_path / 'te.ac').read_text().splitlines() == ac_full[0:-2]
+    assert np.load(tmp_path / 'te.ac.npy').shape == (3,)
+    ac_print.print_ac(0.3, complex(1, 3), complex(3, 1), 1.0)
+    assert (tmp_path / 'te.ac').read_text().splitlines() == ac_full[0:-1]
+    with pytest.raises(AssertionError):
+        ac_print.header()
+#################################################
+
+
+#################################################
+def test_td_print_restore(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    q_print = print_td_pcharge(['H', 'Li'], 'te', 4, max_atom=1)
+    mp_print = print_td_mpole('te', 4)
+    q_print.header()
+    mp_print.header()
+    for it in range(0, 4):
+        q_print.print_pcharge(0.1*it, np.array([0.1*it, -0.1*it], dtype=complex))
+        mp_print.print_mpole(0.1*it, np.full(3, it, dtype=complex), np.zeros(3),
+                             np.full((3, 3), it, dtype=complex), np.eye(3))
+        if it == 1:
+            states = q_print.get_state(), mp_print.get_state()
+    files = ['te.1.low', 'te.2.low', 'te.mp']
+    full = [(tmp_path / f).read_text().splitlines() for f in files]
+
+    q_print = print_td_pcharge(['H', 'Li'], 'te', 4, max_atom=1)
+    mp_print = print_td_mpole('te', 4)
+    q_print.restore(states[0])
+    mp_print.restore(states[1])
+    for it in range(2, 4):
+        q_print.print_pcharge(0.1*it, np.array([0.1*it, -0.1*it], dtype=complex))
+        mp_print.print_mpole(0.1*it, np.full(3, it, dtype=complex), np.zeros(3),
+                             np.full((3, 3), it, dtype=complex), np.eye(3))
+    assert [(tmp_path / f).read_text().splitlines() for f in files] == full
+    assert np.load(tmp_path / 'te.mp.npy').shape == (9, 4)
+#################################################
+
+
+#################################################
+def test_resume_from_checkpoint(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)     # Restores the working directory changed below.
+    (tmp_path / 'ref').mkdir()
+    (tmp_path / 'rs').mkdir()
+    propagate(tmp_path / 'ref', 8.0)
+
+    #==== Interrupted two time points after the last checkpoint ====#
+    propagate(tmp_path / 'rs', 8.0, ckpt_every=3, stop_at=8)
+    assert read_time_info(str(tmp_path / 'rs/mps_t'))[0] == 6
+    propagate(tmp_path / 'rs', 8.0, resume=True)
+
+    #==== The resumed run reproduces the uninterrupted one ====#
+    for f in ['te.ac', 'te.ac2t']:
+        assert (tmp_path / 'rs' / f).read_text() == (tmp_path / 'ref' / f).read_text()
+    assert np.array_equal(np.load(tmp_path / 'rs/te.ac.npy'),
+                          np.load(tmp_path / 'ref/te.ac.npy'))
+#################################################
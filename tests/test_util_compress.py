@@ -0,0 +1,91 @@
+import os
+import pytest
+from IMAM_TDDMRG.utils import util_compress
+from IMAM_TDDMRG.utils.util_compress import mps_codec, get_codec, compress_file, \
+    decompress_file, write_codec_info, read_codec_info
+
+
+DATA = b'\x00\x01\x02\x03' * 4096 + os.urandom(1024)
+
+
+#################################################
+def available_methods():
+    methods = ['zlib']
+    for method, lib in [('zstd', 'zstandard'), ('lz4', 'lz4.frame')]:
+        try:
+            __import__(lib)
+            methods.append(method)
+        except ImportError:
+            pass
+    return methods
+#################################################
+
+
+#################################################
+@pytest.mark.parametrize('method', ['zlib', 'zstd', 'lz4'])
+def test_codec_round_trip(method):
+    if method == 'zstd':
+        pytest.importorskip('zstandard')
+    elif method == 'lz4':
+        pytest.importorskip('lz4.frame')
+    codec = mps_codec(method)
+    assert codec.level == util_compress.DEF_LEVEL[method]
+    packed = codec.compress(DATA)
+    assert len(packed) < len(DATA)
+    assert codec.decompress(packed) == DATA
+#################################################
+
+
+#################################################
+def test_get_codec():
+    assert get_codec(None) is None
+    codec = get_codec('zlib')
+    assert (codec.method, codec.level) == ('zlib', util_compress.DEF_LEVEL['zlib'])
+    codec = get_codec({'method':'zlib', 'level':9})
+    assert (codec.method, codec.level) == ('zlib', 9)
+    with pytest.raises(ValueError):
+        get_codec('bzip2')
+#################################################
+
+
+#################################################
+def test_codec_info(tmp_path):
+    assert read_codec_info(str(tmp_path)) is None
+    write_codec_info(str(tmp_path), mps_codec('zlib', 6))
+    codec = read_codec_info(str(tmp_path))
+    assert (codec.method, codec.level) == ('zlib', 6)
+#################################################
+
+
+#################################################
+def test_compress_file(tmp_path):
+    src, dst, out = tmp_path / 'src', tmp_path / 'dst', tmp_path / 'out'
+    src.write_bytes(DATA)
+    codec = mps_codec('zlib')
+    assert compress_file(str(src), str(dst), codec) == len(DATA)
+    assert dst.stat().st_size < len(DATA)
+    assert decompress_file(str(dst), str(out), codec) == len(DATA)
+    assert out.read_bytes() == DATA
+
+    #==== Missing files are skipped ====#
+    assert compress_file(str(tmp_path / 'none'), str(dst), codec) == 0
+    assert decompress_file(str(tmp_path / 'none'), str(out), codec) == 0
+#################################################
+
+
+#################################################
+def test_benchmark(tmp_path, capsys):
+    mps_dir = tmp_path / 'mps'
+    mps_dir.mkdir()
+    for i in range(0, 3):
+        (mps_dir / f'F{i}.MPS').write_bytes(DATA)
+    methods = available_methods()
+    res = util_compress.benchmark(str(mps_dir), methods, n_threads=2,
+                                  outfile=str(tmp_path / 'bench.txt'))
+    assert [r['compression'] for r in res][0] == 'none (copy)'
+    assert len(res) == 1 + len(methods)
+    assert all(r['size'] == 3*len(DATA) for r in res)
+    assert all(r['ratio'] > 1.0 for r in res[1:])
+    assert (tmp_path / 'bench.txt').is_file()
+    assert sorted(os.listdir(tmp_path)) == ['bench.txt', 'mps']
+#################################################
@@ -0,0 +1,225 @@
+import os, time, types
+import pytest
+np = pytest.importorskip('numpy')
+pytest.importorskip('block2')
+from IMAM_TDDMRG.utils import util_mps
+from IMAM_TDDMRG.utils.util_mps import get_mpo_hash, bulk_copy, mps_checkpoint, \
+    print_MPO_bond_dims, mps_to_one_dot
+
+
+#################################################
+def mpo_ints(seed=0):
+    rng = np.random.default_rng(seed)
+    h1e = rng.standard_normal((4, 4))
+    g2e = rng.standard_normal((4, 4, 4, 4))
+    return h1e + h1e.T, g2e, 1.5, None
+#################################################
+
+
+#################################################
+def test_mpo_hash():
+    h1e, g2e, ecore, idx = mpo_ints()
+    syms = (4, 4, 0, 0, [0, 0, 0, 0])
+    key = get_mpo_hash(h1e, g2e, ecore, idx, syms, 'su2', 'hybrid', None, 1E-20)
+    assert len(key) == 64
+    assert key == get_mpo_hash(h1e.copy(), g2e.copy(), ecore, idx, list(syms), 'su2',
+                               'hybrid', None, 1E-20)
+
+    #==== Any change of the Hamiltonian or the settings changes the key ====#
+    h1e_ = h1e.copy()
+    h1e_[0,1] += 1.0E-14
+    others = [(h1e_, g2e, ecore, idx, syms, 'su2', 'hybrid', None, 1E-20),
+              (h1e.astype(np.float32), g2e, ecore, idx, syms, 'su2', 'hybrid', None, 1E-20),
+              (h1e.reshape(2, 8), g2e, ecore, idx, syms, 'su2', 'hybrid', None, 1E-20),
+              (h1e, g2e, 1.6, idx, syms, 'su2', 'hybrid', None, 1E-20),
+              (h1e, g2e, ecore, [3, 2, 1, 0], syms, 'su2', 'hybrid', None, 1E-20),
+              (h1e, g2e, ecore, idx, (4, 4, 2, 0, [0, 0, 0, 0]), 'su2', 'hybrid', None, 1E-20),
+              (h1e, g2e, ecore, idx, syms, 'sz', 'hybrid', None, 1E-20),
+              (h1e, g2e, ecore, idx, syms, 'su2', 'full', None, 1E-20),
+              (h1e, g2e, ecore, idx, syms, 'su2', 'hybrid', 'FastBipartite', 1E-20),
+              (h1e, g2e, ecore, idx, syms, 'su2', 'hybrid', None, 1E-12)]
+    keys = [get_mpo_hash(*x) for x in others]
+    assert key not in keys and len(set(keys)) == len(keys)
+
+    #==== Nesting is part of the key ====#
+    assert get_mpo_hash([1, 2], 3) != get_mpo_hash([1, [2, 3]])
+#################################################
+
+
+#################################################
+def test_te_mpo_cache_file(tmp_path):
+    pytest.importorskip('pyscf')
+    pytest.importorskip('tools')
+    from IMAM_TDDMRG.i_tddmrg import MYTDDMRG
+
+    h1e, g2e, ecore, idx = mpo_ints()
+    obj = types.SimpleNamespace(mpo_cache=None, te_mpo_syms=(4, 4, 0, 0, [0, 0, 0, 0]),
+                                te_mpo_ints={'h1e':h1e, 'g2e':g2e, 'ecore':ecore,
+                                             'reorder':idx})
+    assert MYTDDMRG.te_mpo_cache_file(obj, None, 1E-20) is None
+    fname = MYTDDMRG.te_mpo_cache_file(obj, None, 1E-20, str(tmp_path))
+    assert fname.startswith(str(tmp_path) + '/MPO-') and fname.endswith('.bin')
+    obj.mpo_cache = str(tmp_path)
+    assert MYTDDMRG.te_mpo_cache_file(obj, None, 1E-20) == fname
+    assert MYTDDMRG.te_mpo_cache_file(obj, 'SVD', 1E-20) != fname
+    obj.te_mpo_ints['ecore'] = 2.0
+    assert MYTDDMRG.te_mpo_cache_file(obj, None, 1E-20) != fname
+#################################################
+
+
+#################################################
+def test_print_MPO_bond_dims(capsys):
+    class mpo:
+        left_operator_names = [types.SimpleNamespace(m=1, n=m) for m in (5, 12, 5)]
+        loaded = set()
+        def load_left_operators(self, i):
+            self.loaded.add(i)
+        def unload_left_operators(self, i):
+            self.loaded.remove(i)
+    m = mpo()
+    assert print_MPO_bond_dims(m, 'TE') == [5, 12, 5]
+    assert m.loaded == set()
+    assert 'TE MPO BOND DIMS =       5    12     5' in capsys.readouterr().out
+#################################################
+
+
+#################################################
+@pytest.mark.parametrize('in_kernel', [True, False])
+def test_copy_file(tmp_path, monkeypatch, in_kernel):
+    if not in_kernel and hasattr(os, 'copy_file_range'):
+        def copy_file_range(*args):
+            raise OSError('Invalid cross-device link')
+        monkeypatch.setattr(os, 'copy_file_range', copy_file_range)
+    data = os.urandom(3 << 10)
+    src, dst = tmp_path / 'src', tmp_path / 'dst'
+    src.write_bytes(data)
+    os.utime(src, (1.0E9, 1.0E9))
+    assert util_mps._copy_file(str(src), str(dst), bufsize=1000) == len(data)
+    assert dst.read_bytes() == data
+    assert dst.stat().st_mtime == 1.0E9
+    assert util_mps._copy_file(str(tmp_path / 'none'), str(dst)) == 0
+    assert dst.read_bytes() == data
+#################################################
+
+
+#################################################
+def test_bulk_copy(tmp_path, capsys):
+    (tmp_path / 'a').mkdir()
+    (tmp_path / 'b').mkdir()
+    names = [f'F{i}.MPS' for i in range(0, 5)]
+    for i, n in enumerate(names):
+        (tmp_path / 'a' / n).write_bytes(bytes([i]) * (1000 * (i+1)))
+    pairs = [(str(tmp_path / 'a' / n), str(tmp_path / 'b' / n)) for n in names]
+    pairs.append((str(tmp_path / 'a' / 'none'), str(tmp_path / 'b' / 'none')))
+    assert bulk_copy(pairs, n_threads=3, label='MPS files') > 0.0
+    assert sorted(os.listdir(tmp_path / 'b')) == names
+    for n in names:
+        assert (tmp_path / 'b' / n).read_bytes() == (tmp_path / 'a' / n).read_bytes()
+    assert 'Copied 5 MPS files (0.01 MB)' in capsys.readouterr().out
+
+    #==== A custom copier ====#
+    done = []
+    def copier(src, dst):
+        done.append(os.path.basename(src))
+        return 10
+    bulk_copy(pairs, copier=copier)
+    assert sorted(done) == sorted(names + ['none'])
+    assert 'Copied 6 files (0.00 MB)' in capsys.readouterr().out
+#################################################
+
+
+#################################################
+def test_mps_checkpoint(tmp_path):
+    path = str(tmp_path / 'te.mps_t')
+    ckpt = mps_checkpoint(path)
+    assert os.readlink(path) == 'te.mps_t.0'
+    (tmp_path / 'snap').write_bytes(b'tensor')
+
+    #==== The link is swapped only when TIME_INFO is written ====#
+    for k in range(0, 3):
+        stage = ckpt.begin()
+        assert stage == path + ('.1' if k % 2 == 0 else '.0')
+        assert os.listdir(stage) == []
+        (tmp_path / 'snap').write_bytes(b'tensor%d' % k)
+        ckpt.flush(stage, [(str(tmp_path / 'snap'), stage + '/F.MPS.KET.0')],
+                   cleanup=[str(tmp_path / 'snap')])
+        time.sleep(0.2)
+        assert os.path.isfile(stage + '/F.MPS.KET.0')
+        assert not (tmp_path / 'snap').exists()
+        assert os.path.realpath(path) != stage
+        with open(stage + '/TIME_INFO', 'w') as f:
+            f.write('done')
+        ckpt.wait()
+        assert os.path.realpath(path) == stage
+        assert open(path + '/F.MPS.KET.0', 'rb').read() == b'tensor%d' % k
+#################################################
+
+
+#################################################
+def test_mps_checkpoint_abandoned(tmp_path, capsys):
+    path = str(tmp_path / 'te.mps_t')
+    ckpt = mps_checkpoint(path)
+    stage = ckpt.begin()
+    ckpt.flush(stage, [], alive=lambda: False)
+    ckpt.wait()
+    assert os.path.realpath(path) == path + '.0'
+    assert 'is abandoned' in capsys.readouterr().out
+
+    #==== An error in the background is raised by the next wait ====#
+    stage = ckpt.begin()
+    ckpt.flush(stage, [(__file__, str(tmp_path / 'none' / 'x'))])
+    with pytest.raises(FileNotFoundError):
+        ckpt.wait()
+    ckpt.wait()
+#################################################
+
+
+#################################################
+def test_mps_checkpoint_single_buffer(tmp_path):
+    # A checkpoint directory written before the double-buffered layout.
+    (tmp_path / 'te.mps_t').mkdir()
+    (tmp_path / 'te.mps_t' / 'TIME_INFO').write_text('old')
+    mps_checkpoint(str(tmp_path / 'te.mps_t'))
+    assert os.readlink(tmp_path / 'te.mps_t') == 'te.mps_t.0'
+    assert (tmp_path / 'te.mps_t' / 'TIME_INFO').read_text() == 'old'
+#################################################
+
+
+#################################################
+class fake_mps:
+    '''
+    Records the moves of the canonical center like block2's MPS.move_left.
+    '''
+    def __init__(self, n_sites, center, canonical_form, dot=2):
+        self.n_sites, self.center, self.dot = n_sites, center, dot
+        self.canonical_form = canonical_form
+        self.n_moves, self.saved = 0, False
+    def move_left(self, cg, prule):
+        assert self.canonical_form[self.center] == 'S'
+        self.canonical_form = self.canonical_form[:self.center-1] + 'S' + \
+                              'R' + self.canonical_form[self.center+1:]
+        self.center -= 1
+        self.n_moves += 1
+    def save_data(self):
+        self.saved = True
+#################################################
+
+
+#################################################
+def test_mps_to_one_dot():
+    #==== The center of a 2-site MPS at the right end is moved to the first site ====#
+    mps = fake_mps(5, 3, 'LLLLC')
+    mps_to_one_dot(mps, None)
+    assert (mps.dot, mps.center, mps.canonical_form) == (1, 0, 'SRRRR')
+    assert mps.n_moves == 4 and mps.saved
+
+    #==== Already at the first site ====#
+    mps = fake_mps(5, 0, 'KRRRR')
+    mps_to_one_dot(mps, None)
+    assert (mps.dot, mps.center, mps.n_moves) == (1, 0, 0) and mps.saved
+
+    #==== A 1-site MPS is left alone ====#
+    mps = fake_mps(5, 2, 'LLKRR', dot=1)
+    mps_to_one_dot(mps, None)
+    assert (mps.center, mps.saved) == (2, False)
+#################################################
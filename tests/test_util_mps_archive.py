@@ -0,0 +1,119 @@
+import os, json, struct
+import pytest
+pytest.importorskip('numpy')
+pytest.importorskip('block2')
+from IMAM_TDDMRG.utils.util_mps import ARCHIVE_MAGIC, read_archive_index, \
+    extract_archive, mps_archive
+
+
+MEMBERS = [('mps_info.bin', b'info' * 10),
+           ('F.MPS.INFO.KET.LEFT.0', b''),
+           ('F.MPS.KET.0', os.urandom(3000)),
+           ('F.MPS.KET.1', os.urandom(100))]
+
+
+#################################################
+def write_archive(fname, members):
+    '''
+    Writes an archive in the format written by saveMPStoArchive.
+    '''
+    index, offset = [], 0
+    for name, data in members:
+        index.append([name, offset, len(data)])
+        offset += len(data)
+    header = json.dumps({'version':1, 'files':index}).encode()
+    with open(fname, 'wb') as f:
+        f.write(ARCHIVE_MAGIC + struct.pack('<Q', len(header)) + header)
+        for _, data in members:
+            f.write(data)
+#################################################
+
+
+#################################################
+def test_read_archive_index(tmp_path):
+    archive = str(tmp_path / 'mps.mpsar')
+    write_archive(archive, MEMBERS)
+    index = read_archive_index(archive)
+    assert sorted(index) == sorted(m[0] for m in MEMBERS)
+    with open(archive, 'rb') as f:
+        raw = f.read()
+    for name, data in MEMBERS:
+        offset, size = index[name]
+        assert raw[offset:offset+size] == data
+#################################################
+
+
+#################################################
+def test_extract_archive(tmp_path):
+    archive = str(tmp_path / 'mps.mpsar')
+    write_archive(archive, MEMBERS)
+    out = tmp_path / 'out'
+    out.mkdir()
+    targets = [(name, str(out / name)) for name, _ in MEMBERS] + \
+              [('missing', str(out / 'missing'))]
+    extract_archive(archive, targets, n_threads=2)
+    for name, data in MEMBERS:
+        assert (out / name).read_bytes() == data
+    assert not (out / 'missing').exists()
+#################################################
+
+
+#################################################
+def test_archive_errors(tmp_path):
+    fname = str(tmp_path / 'bad.mpsar')
+    with open(fname, 'wb') as f:
+        f.write(b'NOTANARCHIVE')
+    with pytest.raises(ValueError):
+        read_archive_index(fname)
+
+    #==== A truncated member ====#
+    archive = str(tmp_path / 'mps.mpsar')
+    write_archive(archive, MEMBERS)
+    with open(archive, 'r+b') as f:
+        f.truncate(os.path.getsize(archive) - 50)
+    with pytest.raises(ValueError):
+        extract_archive(archive, [('F.MPS.KET.1', str(tmp_path / 'F.MPS.KET.1'))])
+#################################################
+
+
+#################################################
+def test_mps_archive(tmp_path):
+    archive = str(tmp_path / 'mps.mpsar')
+    write_archive(archive, MEMBERS)
+    out = tmp_path / 'out'
+    out.mkdir()
+    with mps_archive(archive) as ar:
+        assert 'F.MPS.KET.0' in ar and 'missing' not in ar
+        for name, data in MEMBERS:
+            with ar.member(name) as mv:
+                assert mv.readonly and mv == data
+        assert os.listdir(out) == []
+
+        #==== Only the requested members are written, each one once ====#
+        t0 = str(out / 'KET.0')
+        assert ar.write([('F.MPS.KET.0', t0), ('missing', str(out / 'x'))]) == [t0]
+        assert (out / 'KET.0').read_bytes() == MEMBERS[2][1]
+        assert ar.write([('F.MPS.KET.0', t0), ('F.MPS.KET.1', str(out / 'KET.1'))]) == \
+            [str(out / 'KET.1')]
+        assert sorted(os.listdir(out)) == ['KET.0', 'KET.1']
+    assert os.listdir(out) == []
+    with pytest.raises(AssertionError):
+        ar.member('F.MPS.KET.0')
+
+    #==== Written files can be kept ====#
+    ar = mps_archive(archive)
+    ar.write([('mps_info.bin', str(out / 'info'))])
+    ar.close(keep=True)
+    assert (out / 'info').read_bytes() == MEMBERS[0][1]
+#################################################
+
+
+#################################################
+def test_mps_archive_truncated(tmp_path):
+    archive = str(tmp_path / 'mps.mpsar')
+    write_archive(archive, MEMBERS)
+    with open(archive, 'r+b') as f:
+        f.truncate(os.path.getsize(archive) - 50)
+    with pytest.raises(ValueError):
+        mps_archive(archive)
+#################################################
@@ -0,0 +1,87 @@
+import json
+import pytest
+np = pytest.importorskip('numpy')
+from IMAM_TDDMRG.utils.util_print import print_te_perf, print_td_entropy
+
+
+#################################################
+def test_te_perf_records(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    pp = print_te_perf('te')
+    with pytest.raises(AssertionError):
+        pp.print_perf({'it':0})
+    pp.header()
+    for it in range(0, 4):
+        pp.print_perf({'it':it, 't':0.1*it, 'wall':{'te':1.0}})
+    recs = [json.loads(l) for l in open(tmp_path / 'te.perf.jsonl')]
+    assert [r['it'] for r in recs] == [0, 1, 2, 3]
+    assert recs[2]['wall'] == {'te':1.0}
+#################################################
+
+
+#################################################
+def test_te_perf_restore(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    pp = print_te_perf('te')
+    pp.header()
+    for it in range(0, 4):
+        pp.print_perf({'it':it})
+    with open(tmp_path / 'te.perf.jsonl', 'a') as f:
+        f.write('{"it": 4, "t"')       # Cut short by the interruption.
+
+    #==== Resuming from the second time point drops the later records ====#
+    pp = print_te_perf('te')
+    pp.restore(1)
+    pp.print_perf({'it':2})
+    recs = [json.loads(l) for l in open(tmp_path / 'te.perf.jsonl')]
+    assert [r['it'] for r in recs] == [0, 1, 2]
+
+    #==== A missing file is started anew ====#
+    pp = print_te_perf('te2')
+    pp.restore(5)
+    assert (tmp_path / 'te2.perf.jsonl').read_text() == ''
+#################################################
+
+
+#################################################
+def test_td_entropy(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    pairs = [(1, 2), (1, 3)]
+    oe = print_td_entropy(3, pairs, 'te', 2)
+    oe.header()
+    for it in range(0, 2):
+        oe.print_entropy(0.5*it, np.array([0.1, 0.2, 0.3]) * it, np.array([0.01, 0.02]))
+    lines = (tmp_path / 'te.oent').read_text().splitlines()
+    assert 'S(3)' in lines[-4] and 'I(1,3)' in lines[-4]
+    assert [float(x) for x in lines[-1].split()] == [1, 0.5, 0.1, 0.2, 0.3, 0.01, 0.02]
+    npz = np.load(tmp_path / 'te.oent.npz')
+    assert np.allclose(npz['t'], [0.0, 0.5])
+    assert npz['s1'].shape == (3, 2) and npz['mi'].shape == (2, 2)
+    assert np.array_equal(npz['pairs'], pairs)
+
+    #==== Without pairs ====#
+    oe = print_td_entropy(2, [], 'te2', 1, save_txt=False)
+    oe.print_entropy(0.0, np.zeros(2), np.zeros(0))
+    assert np.load(tmp_path / 'te2.oent.npz')['pairs'].shape == (0, 2)
+#################################################
+
+
+#################################################
+def test_td_entropy_restore(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    oe = print_td_entropy(2, [(1, 2)], 'te', 3)
+    oe.header()
+    for it in range(0, 3):
+        oe.print_entropy(0.1*it, np.full(2, it), np.full(1, -it))
+        if it == 0:
+            state = oe.get_state()
+    lines = (tmp_path / 'te.oent').read_text().splitlines()
+
+    oe = print_td_entropy(2, [(1, 2)], 'te', 3)
+    oe.restore(state)
+    assert (tmp_path / 'te.oent').read_text().splitlines() == lines[0:-2]
+    assert np.load(tmp_path / 'te.oent.npz')['t'].shape == (1,)
+    for it in range(1, 3):
+        oe.print_entropy(0.1*it, np.full(2, it), np.full(1, -it))
+    assert (tmp_path / 'te.oent').read_text().splitlines() == lines
+#################################################
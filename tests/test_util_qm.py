@@ -0,0 +1,53 @@
+import pytest
+np = pytest.importorskip('numpy')
+pytest.importorskip('block2')
+pytest.importorskip('gfdmrg')
+from IMAM_TDDMRG.utils.util_qm import pack_2pdm, unpack_2pdm, load_2pdm
+
+
+#################################################
+def random_2pdm(n, cpx, seed=0):
+    '''
+    A random array with the permutation symmetries of a 2PDM.
+    '''
+    rng = np.random.default_rng(seed)
+    dm = rng.standard_normal((n, n, n, n))
+    if cpx:
+        dm = dm + 1j * rng.standard_normal((n, n, n, n))
+    dm = dm + dm.transpose(1, 0, 3, 2)
+    return dm + np.conj(dm.transpose(3, 2, 1, 0))
+#################################################
+
+
+#################################################
+@pytest.mark.parametrize('cpx', [False, True])
+@pytest.mark.parametrize('n', [1, 2, 5])
+def test_pack_2pdm_round_trip(n, cpx):
+    dm = random_2pdm(n, cpx)
+    packed = pack_2pdm(dm)
+    assert packed.ndim == 1
+    assert packed.size == (n**4 + 3*n**2) // 4     # The number of symmetry orbits.
+    assert np.iscomplexobj(packed) == cpx
+    assert np.allclose(unpack_2pdm(packed, n), dm, rtol=0, atol=1.0E-13)
+#################################################
+
+
+#################################################
+def test_pack_2pdm_single():
+    n = 4
+    dm = random_2pdm(n, True)
+    packed = pack_2pdm(dm, single=True)
+    assert packed.dtype == np.complex64
+    assert np.allclose(unpack_2pdm(packed, n), dm, rtol=1.0E-6, atol=1.0E-6)
+    assert pack_2pdm(random_2pdm(n, False), single=True).dtype == np.float32
+#################################################
+
+
+#################################################
+def test_load_2pdm(tmp_path):
+    n = 3
+    dm = random_2pdm(n, True)
+    np.savez(tmp_path / '2pdm.npz', pdm2=pack_2pdm(dm), n=n)
+    assert np.allclose(load_2pdm(str(tmp_path / '2pdm.npz')), dm, rtol=0,
+                       atol=1.0E-13)
+#################################################
@@ -0,0 +1,352 @@
+import os, math, time, signal
+import pytest
+np = pytest.importorskip('numpy')
+pytest.importorskip('scipy')
+from IMAM_TDDMRG.utils.util_te import te_step_controller, te_bond_dim_policy, \
+    te_control_channel, te_stop_guard, te_obs_pipeline, get_dir_size, run_workers, \
+    write_time_info, write_time_info_ow, read_time_info
+
+
+#################################################
+def rk2(H, psi, dt):
+    '''
+    A second order (midpoint) step of i d/dt psi = H psi.
+    '''
+    return psi - 1j*dt * H @ (psi - 0.5j*dt * H @ psi)
+#################################################
+
+
+#################################################
+def doubling_error(ctl, H, psi, dt):
+    full = rk2(H, psi, dt)
+    half = rk2(H, rk2(H, psi, dt/2), dt/2)
+    err = ctl.error(np.vdot(full, full).real, np.vdot(half, half).real,
+                    np.vdot(full, half))
+    return err, half
+#################################################
+
+
+#################################################
+def test_step_controller_defaults():
+    ctl = te_step_controller(0.1, 1.0E-4)
+    assert np.isclose(ctl.dt_min, 0.005) and np.isclose(ctl.dt_max, 2.0)
+    assert te_step_controller(0.5, 1.0E-4, dt_min=0.25).max_steps(0.0, 1.0) == 5
+    with pytest.raises(AssertionError):
+        te_step_controller(0.1, 1.0E-4, dt_min=0.2)
+#################################################
+
+
+#################################################
+def test_step_controller_error():
+    ctl = te_step_controller(0.1, 1.0E-4)
+
+    #==== Identical full and half step results have no error ====#
+    assert ctl.error(1.0, 1.0, 1.0 + 0.3j) == 0.0
+
+    #==== The distance is divided by (2^2 - 1)*tol = 3.0E-4 ====#
+    full = np.array([1.0, 0.0])
+    half = np.array([np.cos(0.03), 1j*np.sin(0.03)])
+    err = ctl.error(np.vdot(full, full).real, np.vdot(half, half).real,
+                    np.vdot(full, half))
+    assert np.isclose(err, np.linalg.norm(half - full) / 3.0E-4)
+
+    #==== The estimate approaches the true local error of the half steps ====#
+    H = np.array([[0.3, 0.5], [0.5, -0.4]])
+    w, v = np.linalg.eigh(H)
+    psi = np.array([1.0, 0.0], dtype=complex)
+    for dt in [0.02, 0.01]:
+        err, half = doubling_error(ctl, H, psi, dt)
+        exact = v @ (np.exp(-1j*w*dt) * (v.conj().T @ psi))
+        assert np.isclose(err * ctl.tol, np.linalg.norm(half - exact), rtol=0.05)
+#################################################
+
+
+#################################################
+def test_step_controller_accept_reject():
+    ctl = te_step_controller(0.1, 1.0E-4)
+    assert ctl.accept(0.5, 0.1)
+    ctl.update(0.5, 0.1)
+    assert np.isclose(ctl.dt, 0.1 * 0.9 * 0.5**(-1/3))
+    assert ctl.n_accept == 1
+
+    #==== A step with err = 8 is rejected and shrunk ====#
+    assert not ctl.accept(8.0, 0.1)
+    assert np.isclose(ctl.dt, 0.1 * 0.9 * 8.0**(-1/3))
+    assert ctl.n_reject == 1
+
+    #==== Steps at dt_min and without rejection are always accepted ====#
+    assert ctl.accept(100.0, ctl.dt_min)
+    assert te_step_controller(0.1, 1.0E-4, reject=False).accept(100.0, 0.1)
+#################################################
+
+
+#################################################
+def test_step_controller_propagation():
+    # A two-level system propagated with a second order integrator, starting with
+    # a time step that is too large for the tolerance.
+    H = np.array([[0.3, 0.5], [0.5, -0.4]])
+    w, v = np.linalg.eigh(H)
+    psi0 = np.array([1.0, 0.0], dtype=complex)
+    tmax = 10.0
+    ctl = te_step_controller(1.0, 1.0E-5, dt_min=0.001, order=2)
+    tt, psi, dts = 0.0, psi0, []
+    while tt < tmax - ctl.t_eps:
+        while True:
+            t_next = ctl.next_time(tt, tmax)
+            err, half = doubling_error(ctl, H, psi, t_next - tt)
+            if ctl.accept(err, t_next - tt):
+                ctl.update(err, t_next - tt)
+                break
+        dts.append(t_next - tt)
+        tt, psi = t_next, half
+    assert ctl.n_reject >= 1
+    assert dts[0] < 1.0
+    assert ctl.n_accept == len(dts)
+
+    #==== The global error is of the order of the sum of the local errors ====#
+    exact = v @ (np.exp(-1j*w*tmax) * (v.conj().T @ psi0))
+    assert np.linalg.norm(psi - exact) < len(dts) * ctl.tol
+#################################################
+
+
+#################################################
+def test_step_controller_next_time():
+    ctl = te_step_controller(0.2, 1.0E-4)
+    assert np.isclose(ctl.next_time(0.0, 1.0), 0.2)
+    assert np.isclose(ctl.next_time(0.0, 1.0, t_target=0.15), 0.15)
+    assert np.isclose(ctl.next_time(0.9, 1.0), 1.0)
+
+    #==== A tiny last step is merged into the current one ====#
+    ctl.dt = 0.199
+    assert ctl.next_time(0.8, 1.0) == 1.0
+
+    #==== A sampling time that has just been reached is ignored ====#
+    assert np.isclose(ctl.next_time(0.15, 1.0, t_target=0.15), 0.349)
+#################################################
+
+
+#################################################
+def test_step_controller_state():
+    ctl = te_step_controller(0.1, 1.0E-4)
+    ctl.update(0.5, 0.1)
+    assert not ctl.accept(8.0, ctl.dt)
+    ctl2 = te_step_controller(0.1, 1.0E-4)
+    ctl2.restore(ctl.get_state())
+    assert ctl2.get_state() == ctl.get_state()
+#################################################
+
+
+#################################################
+def test_bond_dim_policy_update():
+    pol = te_bond_dim_policy(100, 1.0E-6, D_min=10, D_max=400, grow=1.25)
+    assert pol.update(1.0E-5) == 125
+    assert pol.update(5.0E-7) == 125
+    assert pol.update(1.0E-9) == 100
+    assert pol.D_used == 125
+
+    #==== D_min and D_max ====#
+    pol = te_bond_dim_policy(12, 1.0E-6, D_min=10, D_max=14)
+    assert pol.update(1.0E-9) == 10
+    assert pol.update(1.0) == 13
+    assert pol.update(1.0) == 14
+    assert te_bond_dim_policy(1000, 1.0E-6, D_max=400).D == 400
+#################################################
+
+
+#################################################
+def test_bond_dim_policy_memory():
+    pol = te_bond_dim_policy(200, 1.0E-6, D_min=150, D_max=1000, mem_max=1.0E9)
+    assert pol.max_by_memory(None) == 1000
+    assert pol.max_by_memory(2.5E8) == 400
+
+    #==== The memory ceiling takes precedence over D_min ====#
+    assert pol.update(1.0E-5, mem_peak=4.0E9) == 100
+    assert pol.D_used == 200
+#################################################
+
+
+#################################################
+def test_bond_dim_policy_state():
+    pol = te_bond_dim_policy(100, 1.0E-6, D_max=400)
+    pol.update(1.0E-5)
+    pol2 = te_bond_dim_policy(100, 1.0E-6, D_max=400)
+    pol2.restore(pol.get_state())
+    assert (pol2.D, pol2.D_used) == (pol.D, pol.D_used)
+    with pytest.raises(AssertionError):
+        te_bond_dim_policy(100, 1.0E-6, D_min=500, D_max=400)
+#################################################
+
+
+#################################################
+def test_control_channel_commands(tmp_path, capsys):
+    path = str(tmp_path / 'control')
+    ch = te_control_channel(path)
+    assert ch.poll() == []
+    fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+    os.write(fd, b'sample\nBOND_DIM 800\n\nkrylov_tol 1e-8\nbond_dim\n' +
+             b'krylov_size x\nrewind 3\nsample_ev')
+    assert ch.poll() == [('sample', None), ('bond_dim', 800), ('krylov_tol', 1.0E-8)]
+    out = capsys.readouterr().out
+    assert 'Unrecognized command \'bond_dim\'' in out
+    assert 'Invalid argument in \'krylov_size x\'' in out
+    assert 'Unrecognized command \'rewind 3\'' in out
+
+    #==== An incomplete line is completed by the next write ====#
+    os.write(fd, b'ery 5\nstop\n')
+    assert ch.poll() == [('sample_every', 5), ('stop', None)]
+    os.close(fd)
+    assert ch.poll() == []
+    ch.close()
+    assert not os.path.exists(path)
+#################################################
+
+
+#################################################
+def test_control_channel_existing(tmp_path):
+    path = tmp_path / 'control'
+    path.write_text('')
+    with pytest.raises(AssertionError):
+        te_control_channel(str(path))
+
+    #==== An existing named pipe is reused ====#
+    os.mkfifo(str(tmp_path / 'fifo'))
+    ch = te_control_channel(str(tmp_path / 'fifo'))
+    assert ch.poll() == []
+    ch.close()
+#################################################
+
+
+#################################################
+def test_get_dir_size(tmp_path):
+    (tmp_path / 'a').write_bytes(b'x' * 100)
+    (tmp_path / 'd' / 'e').mkdir(parents=True)
+    (tmp_path / 'd' / 'b').write_bytes(b'x' * 30)
+    (tmp_path / 'd' / 'e' / 'c').write_bytes(b'x' * 7)
+    (tmp_path / 'link').symlink_to(tmp_path / 'd')
+    assert get_dir_size(str(tmp_path)) == 137
+#################################################
+
+
+#################################################
+def test_run_workers(tmp_path):
+    logs = [str(tmp_path / f'w{i}.out') for i in range(0, 3)]
+    res = run_workers([(math.factorial, (5,), {}), (os.getpid, (), {}),
+                       (math.sqrt, ('x',), {})], logs=logs, tmpdir=str(tmp_path))
+    assert res[0] == 120
+    assert res[1] != os.getpid()
+    assert res[2] is None
+    assert 'TypeError' in open(logs[2]).read()
+
+    #==== The job files are removed ====#
+    assert sorted(os.listdir(tmp_path)) == ['w0.out', 'w1.out', 'w2.out']
+#################################################
+
+
+#################################################
+def test_run_workers_setup(tmp_path):
+    res = run_workers([(os.getcwd, (), {})] * 2, setup=[('os', 'chdir', (str(tmp_path),))])
+    assert res == [str(tmp_path)] * 2
+#################################################
+
+
+#################################################
+def test_run_workers_concurrency():
+    jobs = [(time.sleep, (0.5,), {})] * 3
+    t = time.perf_counter()
+    run_workers(jobs)
+    t_all = time.perf_counter() - t
+    t = time.perf_counter()
+    run_workers(jobs, n_proc=1)
+    t_one = time.perf_counter() - t
+    assert t_one >= 1.5 and t_all < t_one - 0.5
+#################################################
+
+
+#################################################
+def test_stop_guard_signal():
+    old = signal.getsignal(signal.SIGUSR1)
+    guard = te_stop_guard(stop_signals=('SIGUSR1',))
+    assert guard.check() is None
+    os.kill(os.getpid(), signal.SIGUSR1)
+    assert guard.check() == 'signal SIGUSR1'
+    guard.release()
+    assert signal.getsignal(signal.SIGUSR1) == old
+#################################################
+
+
+#################################################
+def test_stop_guard_deadline():
+    guard = te_stop_guard(deadline=time.time() + 6.0, stop_signals=None)
+    assert guard.check() is None          # No step timing yet.
+    guard.step_done(1.0)
+    assert guard.check() is None          # 1.2*(1 + 1) s is left.
+    guard.save_done(2.0)
+    guard.save_done(0.5)
+    assert guard.t_save == 2.0
+    guard.step_done(3.0)
+    assert guard.check() == 'walltime deadline'     # 1.2*(3 + 2) s is not.
+
+    #==== Only the last five steps count ====#
+    for i in range(0, 5):
+        guard.step_done(1.0)
+    assert guard.check() is None
+    assert te_stop_guard(stop_signals=None).check() is None
+#################################################
+
+
+#################################################
+@pytest.mark.parametrize('mode', ['sync', 'async'])
+def test_obs_pipeline(tmp_path, mode):
+    out = tmp_path / 'obs'
+    def func(job):
+        with open(out, 'a') as f:
+            f.write('%d %d\n' % (job['it'], os.getpid()))
+    pipe = te_obs_pipeline(func, mode=mode, maxsize=2)
+    pipe.start()
+    for it in range(0, 6):
+        pipe.submit({'it':it})
+    pipe.drain()
+    rows = [l.split() for l in out.read_text().splitlines()]
+    assert [int(r[0]) for r in rows] == list(range(0, 6))
+    assert all((int(r[1]) == os.getpid()) == (mode == 'sync') for r in rows)
+    pipe.close()
+#################################################
+
+
+#################################################
+def test_obs_pipeline_failure(tmp_path):
+    out = tmp_path / 'obs'
+    def func(job):
+        if job == 1:
+            raise ValueError('bad job')
+        with open(out, 'a') as f:
+            f.write('%d\n' % job)
+    pipe = te_obs_pipeline(func, mode='async', maxsize=1)
+    pipe.start()
+    for job in range(0, 4):
+        pipe.submit(job)
+
+    #==== The jobs after the failed one are consumed but not processed ====#
+    with pytest.raises(AssertionError):
+        pipe.close()
+    assert out.read_text() == '0\n'
+#################################################
+
+
+#################################################
+def test_read_time_info(tmp_path):
+    # Both kinds of TIME_INFO, of a sampled MPS and of the overwrite checkpoint.
+    (tmp_path / 's').mkdir()
+    write_time_info(str(tmp_path / 's'), 12.5, 250, 12.4, 31, 0.99, 0.3+0.4j, True,
+                    False, True, False, False, None)
+    assert read_time_info(str(tmp_path / 's')) == (250, 12.5)
+    write_time_info_ow(str(tmp_path), 1.25E-3, 7, 0.0, 0, 1.0, 1.0+0j)
+    assert read_time_info(str(tmp_path)) == (7, 0.00125)
+
+    #==== No time information ====#
+    (tmp_path / 'TIME_INFO').write_text(' MPS norm square = 1.0\n')
+    with pytest.raises(ValueError):
+        read_time_info(str(tmp_path))
+    with pytest.raises(FileNotFoundError):
+        read_time_info(str(tmp_path / 'none'))
+#################################################
@@ -0,0 +1,244 @@
+import os, sys, time, json, zlib, shutil, tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+
+
+######################################
+#=======================#
+#==== USAGE EXAMPLE ====#
+#=======================#
+'''
+Benchmark of the compression of an MPS saved with saveMPStoDir (e.g. a sampled MPS of
+a time propagation) using the available codecs:
+
+   python -m IMAM_TDDMRG.utils.util_compress H2O.sample/tevo-0100 zstd:3 lz4 zlib:1
+'''
+######################################
+
+
+
+#################################################
+CODEC_FILE = 'compression.json'
+# A directory of MPS files saved with compression contains CODEC_FILE, a JSON
+# dictionary {'method':..., 'level':...}, and the compressed files under their
+# usual names (including mps_info.bin).
+
+DEF_LEVEL = {'zstd':3, 'lz4':0, 'zlib':1}
+#################################################
+
+
+#################################################
+class mps_codec:
+    '''
+    The compression of the MPS files with one of the methods
+       'zstd' : Zstandard, requires the python package zstandard.
+       'lz4'  : LZ4 frames, requires the python package lz4.
+       'zlib' : zlib from the standard library, slower, always available.
+    level is the compression level of the method, the default is DEF_LEVEL[method].
+    The compression and decompression of the three methods release the GIL, so
+    several files can be processed at once with threads.
+    '''
+
+    #################################################
+    def __init__(self, method, level=None):
+        if method not in DEF_LEVEL:
+            raise ValueError(f'The compression method {method} is undefined, the ' +
+                             'available ones are ' + ', '.join(DEF_LEVEL) + '.')
+        self.method = method
+        self.level = DEF_LEVEL[method] if level is None else level
+        if method == 'zstd':
+            try:
+                import zstandard
+            except ImportError:
+                raise ValueError('The compression method zstd requires the python ' +
+                                 'package zstandard.')
+            self.lib = zstandard
+        elif method == 'lz4':
+            try:
+                import lz4.frame
+            except ImportError:
+                raise ValueError('The compression method lz4 requires the python ' +
+                                 'package lz4.')
+            self.lib = lz4.frame
+        elif method == 'zlib':
+            self.lib = zlib
+    #################################################
+
+
+    #################################################
+    def compress(self, data):
+        if self.method == 'zstd':
+            # A compressor object must not be shared between threads.
+            return self.lib.ZstdCompressor(level=self.level).compress(data)
+        elif self.method == 'lz4':
+            return self.lib.compress(data, compression_level=self.level)
+        elif self.method == 'zlib':
+            return self.lib.compress(data, self.level)
+    #################################################
+
+
+    #################################################
+    def decompress(self, data):
+        if self.method == 'zstd':
+            return self.lib.ZstdDecompressor().decompress(data)
+        elif self.method == 'lz4':
+            return self.lib.decompress(data)
+        elif self.method == 'zlib':
+            return self.lib.decompress(data)
+    #################################################
+
+
+    #################################################
+    def __str__(self):
+        return f'{self.method} (level {self.level})'
+    #################################################
+#################################################
+
+
+#################################################
+def get_codec(compression):
+    '''
+    Returns the mps_codec of compression, which is None (no compression), a method
+    name, or a dictionary {'method':..., 'level':...} ('level' is optional).
+    '''
+    if compression is None:
+        return None
+    elif isinstance(compression, str):
+        return mps_codec(compression)
+    else:
+        return mps_codec(compression['method'], compression.get('level', None))
+#################################################
+
+
+#################################################
+def write_codec_info(dirname, codec):
+    with open(dirname + '/' + CODEC_FILE, 'w') as f:
+        json.dump({'method':codec.method, 'level':codec.level}, f)
+#################################################
+
+
+#################################################
+def read_codec_info(dirname):
+    '''
+    Returns the mps_codec used for the files in dirname, or None if they are not
+    compressed.
+    '''
+    if not os.path.isfile(dirname + '/' + CODEC_FILE):
+        return None
+    with open(dirname + '/' + CODEC_FILE, 'r') as f:
+        return get_codec(json.load(f))
+#################################################
+
+
+#################################################
+def compress_file(src, dst, codec):
+    '''
+    Compresses src into dst. Returns the size of src, or 0 if src does not exist.
+    '''
+    try:
+        with open(src, 'rb') as fsrc:
+            data = fsrc.read()
+    except FileNotFoundError:
+        return 0
+    with open(dst, 'wb') as fdst:
+        fdst.write(codec.compress(data))
+    shutil.copystat(src, dst)
+    return len(data)
+#################################################
+
+
+#################################################
+def decompress_file(src, dst, codec):
+    '''
+    Decompresses src into dst. Returns the size of dst, or 0 if src does not exist.
+    '''
+    try:
+        with open(src, 'rb') as fsrc:
+            data = codec.decompress(fsrc.read())
+    except FileNotFoundError:
+        return 0
+    with open(dst, 'wb') as fdst:
+        fdst.write(data)
+    shutil.copystat(src, dst)
+    return len(data)
+#################################################
+
+
+#################################################
+def benchmark(mps_dir, compressions=('zstd', 'lz4', 'zlib'), n_threads=8,
+              outfile=None):
+    '''
+    Measures the compression ratio and the save (compression) and load (decompression)
+    throughputs of the MPS files in mps_dir, an uncompressed directory written by
+    saveMPStoDir, for each item of compressions (see get_codec). The files are
+    processed with n_threads threads like in saveMPStoDir and loadMPSfromDir. A plain
+    copy is included as a reference. Methods whose python package is not installed
+    are skipped. The table is printed (and written to outfile if given) and returned
+    as a list of dictionaries.
+    '''
+    assert read_codec_info(mps_dir) is None, f'{mps_dir} is already compressed.'
+    fnames = sorted(f for f in os.listdir(mps_dir) if os.path.isfile(mps_dir + '/' + f))
+    size = sum(os.path.getsize(mps_dir + '/' + f) for f in fnames)
+    tmp = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(mps_dir)))
+    tmp_out = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(mps_dir)))
+
+    def run(func, pairs):
+        t = time.perf_counter()
+        with ThreadPoolExecutor(n_threads) as pool:
+            list(pool.map(lambda p: func(*p), pairs))
+        return max(time.perf_counter() - t, 1.0E-9)
+
+    results = []
+    try:
+        for comp in (None,) + tuple(compressions):
+            if comp is None:
+                label = 'none (copy)'
+                save = lambda s, d: shutil.copyfile(s, d)
+                load = save
+            else:
+                try:
+                    codec = get_codec(comp)
+                except ValueError as e:
+                    print('Skipping', comp, ':', e)
+                    continue
+                label = str(codec)
+                save = lambda s, d, c=codec: compress_file(s, d, c)
+                load = lambda s, d, c=codec: decompress_file(s, d, c)
+            t_save = run(save, [(mps_dir + '/' + f, tmp + '/' + f) for f in fnames])
+            stored = sum(os.path.getsize(tmp + '/' + f) for f in fnames)
+            t_load = run(load, [(tmp + '/' + f, tmp_out + '/' + f) for f in fnames])
+            for f in fnames:
+                with open(mps_dir + '/' + f, 'rb') as f1, open(tmp_out + '/' + f, 'rb') as f2:
+                    assert f1.read() == f2.read(), f'The round trip of {f} failed.'
+            results.append({'compression':label, 'size':size, 'stored':stored,
+                            'ratio':size/max(stored, 1), 'save_MBps':size/1.0E6/t_save,
+                            'load_MBps':size/1.0E6/t_load})
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+        shutil.rmtree(tmp_out, ignore_errors=True)
+
+    lines = [f'MPS files in {mps_dir}: {len(fnames)} files, {size/1.0E6:.2f} MB, ' +
+             f'{n_threads} threads',
+             '%-20s %12s %8s %12s %12s' % ('Compression', 'Stored (MB)', 'Ratio',
+                                            'Save (MB/s)', 'Load (MB/s)')]
+    for r in results:
+        lines.append('%-20s %12.2f %8.3f %12.1f %12.1f' %
+                     (r['compression'], r['stored']/1.0E6, r['ratio'], r['save_MBps'],
+                      r['load_MBps']))
+    print('\n'.join(lines))
+    if outfile is not None:
+        with open(outfile, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+    return results
+#################################################
+
+
+#################################################
+if __name__ == "__main__":
+    # Arguments: <MPS directory> [method[:level] ...]
+    comps = []
+    for a in sys.argv[2:]:
+        m, _, l = a.partition(':')
+        comps.append({'method':m, 'level':int(l)} if l else m)
+    benchmark(sys.argv[1], comps if len(comps) > 0 else ('zstd', 'lz4', 'zlib'))
+#################################################
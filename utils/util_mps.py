@@ -25,8 +25,11 @@
 
 from ipsh import ipsh
 import numpy as np
-import subprocess, shutil, os
+import subprocess, shutil, os, time, json, struct, mmap, itertools, threading
+from concurrent.futures import ThreadPoolExecutor
 from IMAM_TDDMRG.utils.util_complex_type import get_complex_type
+from IMAM_TDDMRG.utils.util_compress import get_codec, read_codec_info, write_codec_info
+from IMAM_TDDMRG.utils.util_compress import compress_file, decompress_file, CODEC_FILE
 
 
 spin_symmetry = 'su2'
@@ -60,7 +63,7 @@ except ImportError:
     MPICommunicator = ParallelRuleIdentity = None
     hasMPI = False
         
-from IMAM_TDDMRG.utils.util_print import getVerbosePrinter    
+from IMAM_TDDMRG.utils.util_print import getVerbosePrinter, print_warning
 if hasMPI:
     MPI = MPICommunicator()
     r0 = (MPI.rank == 0)
@@ -84,6 +87,32 @@ def print_MPO_bond_dims(mpo, name=''):
         mpo_bdims[ix] = x.m * x.n
         mpo.unload_left_operators(ix)
     _print(name + ' MPO BOND DIMS = ', ''.join(["%6d" % x for x in mpo_bdims]))
+    return mpo_bdims
+#################################################
+
+
+#################################################
+def get_mpo_hash(*items):
+    '''
+    A SHA-256 hex digest of items, which may be numpy arrays, (nested) lists or tuples,
+    or other objects with a deterministic repr. It is used as the key of cached MPOs.
+    '''
+    import hashlib
+    h = hashlib.sha256()
+    def feed(x):
+        if isinstance(x, np.ndarray):
+            h.update(repr((x.shape, str(x.dtype))).encode())
+            h.update(np.ascontiguousarray(x).tobytes())
+        elif isinstance(x, (list, tuple)):
+            h.update(b'(')
+            for y in x:
+                feed(y)
+            h.update(b')')
+        else:
+            h.update(repr(x).encode() + b';')
+    for x in items:
+        feed(x)
+    return h.hexdigest()
 #################################################
 
 
@@ -153,6 +182,98 @@ def calc_energy_MPS(hmpo, mps, bond_dim_margin=0):
 #################################################
 
 
+#################################################
+def align_mps_center(ket, ref, cg, prule=None):
+    '''
+    Moves the canonical center of ket to that of ref, which must be at either end.
+    '''
+    if ref.center == 0:
+        ket.center += 1
+        ket.canonical_form = ket.canonical_form[:-1] + 'S'
+        while ket.center != 0:
+            ket.move_left(cg, prule)
+    else:
+        ket.canonical_form = 'K' + ket.canonical_form[1:]
+        while ket.center != ket.n_sites - 1:
+            ket.move_right(cg, prule)
+        ket.center -= 1
+    ket.save_data()
+#################################################
+
+
+#################################################
+def mps_to_one_dot(mps, cg, prule=None):
+    '''
+    Turns a 2-site MPS whose canonical center is at either end into a 1-site MPS with
+    the canonical center at the first site.
+    '''
+    if mps.dot == 1:
+        return
+    if mps.center != 0:
+        mps.center += 1
+        mps.canonical_form = mps.canonical_form[:-1] + 'S'
+        while mps.center != 0:
+            mps.move_left(cg, prule)
+    mps.dot = 1
+    mps.save_data()
+#################################################
+
+
+#################################################
+def MPS_addition(fitket, ket_a, ket_b, mpo_a, mpo_b, fit_bond_dims, fit_nsteps,
+                 fit_noises, fit_conv_tol, cutoff, fit_margin=None, delay_contract=True,
+                 verbose_lvl=1):
+    '''
+    Fits fitket to mpo_a|ket_a> + mpo_b|ket_b>. ket_a and ket_b are first moved to
+    the canonical center of fitket. A difference of two MPS is obtained by using 
+    -1 times the identity MPO as mpo_b.
+    '''
+
+    for ket in (ket_a, ket_b):
+        if ket.center != fitket.center:
+            align_mps_center(ket, fitket, mpo_a.tf.opf.cg)
+    
+    #==== Construct the Moving Environment objects of the two terms ====#
+    rme = bs.MovingEnvironment(mpo_a, fitket, ket_a, "ADDA")
+    rme.init_environments(False)
+    tme = bs.MovingEnvironment(mpo_b, fitket, ket_b, "ADDB")
+    tme.init_environments(False)
+    if delay_contract:
+        rme.delayed_contraction = b2.OpNamesSet.normal_ops()
+        tme.delayed_contraction = b2.OpNamesSet.normal_ops()
+
+    #==== Begin MPS fitting ====#
+    if fit_margin == None:
+        fit_margin = max(int(max(ket_a.info.bond_dim, ket_b.info.bond_dim) / 10.0), 100)
+    fit = bs.Linear(None, rme, tme, b2.VectorUBond(fit_bond_dims),
+                    b2.VectorUBond([max(ket_a.info.bond_dim, ket_b.info.bond_dim) +
+                                    fit_margin]),
+                    b2.VectorDouble(fit_noises))
+    fit.eq_type = b2.EquationTypes.FitAddition
+    fit.noise_type = b2.NoiseTypes.ReducedPerturbative
+    fit.decomp_type = b2.DecompositionTypes.SVD
+    fit.iprint = max(verbose_lvl, 0)
+    fit.cutoff = cutoff
+    fit.solve(fit_nsteps, fitket.center == 0, fit_conv_tol)
+#################################################
+
+
+#################################################
+def calc_overlap_MPS(impo, bra, ket):
+    '''
+    Returns <bra|ket>. ket is first moved to the canonical center of bra.
+    '''
+    if ket.center != bra.center:
+        align_mps_center(ket, bra, impo.tf.opf.cg)
+    me = bs.MovingEnvironment(impo, bra, ket, "me_ovl")
+    me.init_environments(False)
+    expect = bs.Expect(me, bra.info.bond_dim, ket.info.bond_dim)
+    ovl = expect.solve(False, ket.center == 0)
+
+    return ovl
+#################################################
+
+
 #################################################
 def copyIt(fnam:str, mpsSaveDir:str, MPI:MPICommunicator=None):
     if MPI is not None and MPI.rank != 0:
@@ -181,8 +302,215 @@ def copyIt(fnam:str, mpsSaveDir:str, MPI:MPICommunicator=None):
 
 
 #################################################
-def saveMPStoDir(mps:bs.MPS|bs.MultiMPS, mpsSaveDir:str, MPI:MPICommunicator=None):
+def _copy_file(src, dst, bufsize=16<<20):
+    '''
+    Copies src to dst with copy_file_range (in-kernel, where available) or with large
+    buffered reads and writes, keeping the metadata like `cp -p`. Returns the number
+    of bytes copied, or 0 if src does not exist.
+    '''
+    try:
+        fsrc = open(src, 'rb')
+    except FileNotFoundError:
+        return 0
+    with fsrc, open(dst, 'wb') as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        done = 0
+        if hasattr(os, 'copy_file_range'):
+            try:
+                while done < size:
+                    n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), size - done)
+                    if n == 0:
+                        break
+                    done += n
+            except OSError:
+                # E.g. across file systems on older kernels.
+                fsrc.seek(done)
+                fdst.seek(done)
+        if done < size:
+            shutil.copyfileobj(fsrc, fdst, bufsize)
+    shutil.copystat(src, dst)
+    return size
+#################################################
+
+
+#################################################
+def bulk_copy(pairs, MPI:MPICommunicator=None, n_threads=None, label='files',
+              copier=_copy_file):
+    '''
+    Copies each (src, dst) in pairs with a thread pool on MPI rank 0 (assuming that all
+    nodes share one global scratch directory), then synchronizes all ranks with a 
+    single barrier. Missing source files are skipped. The achieved throughput is 
+    printed and returned in MB/s. copier(src, dst) does the copy of one file and 
+    returns the number of (uncompressed) bytes, see saveMPStoDir for compression.
+    '''
+    rate = 0.0
+    if MPI is None or MPI.rank == 0:
+        t = time.perf_counter()
+        if n_threads is None:
+            n_threads = min(8, max(len(pairs), 1))
+        with ThreadPoolExecutor(n_threads) as pool:
+            sizes = list(pool.map(lambda p: copier(*p), pairs))
+        dt = max(time.perf_counter() - t, 1.0E-9)
+        rate = sum(sizes) / 1.0E6 / dt
+        _print('    Copied %d %s (%.2f MB) in %.3f s, %.1f MB/s' %
+               (sum(1 for x in sizes if x > 0), label, sum(sizes)/1.0E6, dt, rate))
+    if MPI is not None:
+        MPI.barrier()
+    return rate
+#################################################
+
+
+#################################################
+class mps_checkpoint:
+    '''
+    Double-buffered checkpoints of the propagated MPS (save_mps='overwrite'). path 
+    (<prefix>.mps_t) is a symbolic link to one of the two buffers path.0 and path.1. 
+    A checkpoint is written into the buffer that path does not point to, and path is
+    swapped to it atomically (os.replace of a link) only when the MPS files, 
+    TE_STATE, and TIME_INFO (written last, by the post-processing of the same time 
+    point) are all in place. Hence path always refers to a complete checkpoint of a 
+    single time point, even if the program is killed in the middle of a copy. The 
+    MPS files are copied by a background thread on MPI rank 0 while the propagation
+    continues, with at most one checkpoint in flight.
+    '''
+
+    #################################################
+    def __init__(self, path:str, MPI:MPICommunicator=None, n_threads=None):
+        self.path = os.path.abspath(path)
+        self.MPI = MPI
+        self.n_threads = n_threads
+        self.thread = None
+        self.error = None
+        if MPI is None or MPI.rank == 0:
+            if os.path.isdir(self.path) and not os.path.islink(self.path):
+                #== A checkpoint directory of the single-buffer layout ==#
+                os.rename(self.path, self.path + '.0')
+                self._swap(self.path + '.0')
+            elif not os.path.exists(self.path):
+                os.makedirs(self.path + '.0', exist_ok=True)
+                self._swap(self.path + '.0')
+        if MPI is not None:
+            MPI.barrier()
+    #################################################
+
+
+    #################################################
+    def _swap(self, target):
+        lnk = self.path + '.lnk'
+        if os.path.lexists(lnk):
+            os.remove(lnk)
+        os.symlink(os.path.basename(target), lnk)
+        os.replace(lnk, self.path)
+    #################################################
+
+
+    #################################################
+    def begin(self):
+        '''
+        Waits for the checkpoint in flight, then empties the buffer that is not in use
+        and returns its path, into which the next checkpoint is to be written.
+        '''
+        self.wait()
+        if self.MPI is not None:
+            self.MPI.barrier()      # 1)
+        current = os.path.realpath(self.path)
+        stage = self.path + ('.1' if current == self.path + '.0' else '.0')
+        if self.MPI is None or self.MPI.rank == 0:
+            shutil.rmtree(stage, ignore_errors=True)
+            os.makedirs(stage)
+        if self.MPI is not None:
+            self.MPI.barrier()
+        return stage
+        # NOTES:
+        # 1) Only rank 0 commits checkpoints, the other ranks must not resolve the
+        #    link before the commit in flight is done, or they would pick the 
+        #    committed buffer as the stage.
+    #################################################
+
+
+    #################################################
+    def flush(self, stage:str, pairs, cleanup=(), alive=None):
+        '''
+        Copies each (src, dst) in pairs into stage in the background, waits until 
+        stage/TIME_INFO exists, then makes stage the current checkpoint and removes 
+        the files in cleanup (the scratch snapshot the sources belong to). alive() 
+        tells whether the process that writes TIME_INFO is still running, if it is 
+        not, the checkpoint is abandoned and the previous one is kept.
+        '''
+        if self.MPI is not None and self.MPI.rank != 0:
+            return
+
+        def run():
+            try:
+                t = time.perf_counter()
+                n_threads = self.n_threads or min(8, max(len(pairs), 1))
+                with ThreadPoolExecutor(n_threads) as pool:
+                    size = sum(pool.map(lambda p: _copy_file(*p), pairs))
+                dt = max(time.perf_counter() - t, 1.0E-9)
+                for f in cleanup:
+                    if os.path.isfile(f):
+                        os.remove(f)
+                while not os.path.isfile(stage + '/TIME_INFO'):
+                    if alive is not None and not alive():
+                        print_warning('The checkpoint in ' + stage + ' is abandoned ' +
+                                      'because its time information was never written.')
+                        return
+                    time.sleep(0.05)
+                self._swap(stage)
+                _print('    Checkpoint %s committed (%.2f MB copied in %.3f s, ' %
+                       (self.path, size/1.0E6, dt) + '%.1f MB/s)' % (size/1.0E6/dt))
+            except Exception as e:
+                self.error = e
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+    #################################################
 
+
+    #################################################
+    def wait(self):
+        '''
+        Waits until the checkpoint in flight, if any, is committed.
+        '''
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.error is not None:
+            e, self.error = self.error, None
+            raise e
+    #################################################
+#################################################
+
+
+#################################################
+def get_mps_files(mps_info, mps, nroots=None):
+    '''
+    The scratch file names of the MPS info, the site tensors, and (for a MultiMPS 
+    with nroots roots) the wave functions of mps.
+    '''
+    fnames = []
+    for iSite in range(mps_info.n_sites + 1):
+        fnames += [mps_info.get_filename(False, iSite), mps_info.get_filename(True, iSite)]
+    for iSite in range(-1, mps_info.n_sites): # -1 is data
+        fnames.append(mps.get_filename(iSite))
+    if nroots is not None:
+        for iroot in range(0, nroots):
+            fnames.append(mps.get_wfn_filename(iroot, ""))
+    return fnames
+#################################################
+
+
+#################################################
+def saveMPStoDir(mps:bs.MPS|bs.MultiMPS, mpsSaveDir:str, MPI:MPICommunicator=None,
+                 compression=None):
+    '''
+    compression:
+       If not None, the files are compressed with the method given by compression 
+       (see util_compress.get_codec), e.g. 'zstd' or {'method':'zstd', 'level':5}.
+       The codec is recorded in mpsSaveDir so that loadMPSfromDir decompresses the 
+       files transparently.
+    '''
+    codec = get_codec(compression)
     mps.save_data() # Important! Saves canonical form
     #OLD mkDir(mpsSaveDir)
     if not os.path.exists(mpsSaveDir):
@@ -190,39 +518,406 @@ def saveMPStoDir(mps:bs.MPS|bs.MultiMPS, mpsSaveDir:str, MPI:MPICommunicator=Non
             os.makedirs(mpsSaveDir)
         except FileExistsError: # don't ask...
             pass
-    mps.info.save_data(f"{mpsSaveDir}/mps_info.bin")
+    if codec is None:
+        mps.info.save_data(f"{mpsSaveDir}/mps_info.bin")
+    else:
+        mps.info.save_data(f"{mpsSaveDir}/mps_info.bin.tmp")
 
-    #==== Duplicate MPS info files in scratch (obtained ====#
-    #====     from the MPSInfo object) to mpsSaveDir    ====#
-    for iSite in range(mps.n_sites+1):
-        fnam = mps.info.get_filename(False,iSite)
-        copyIt(fnam, mpsSaveDir, MPI)
-        if MPI is not None:
-            MPI.barrier()
-        fnam = mps.info.get_filename(True, iSite)
-        copyIt(fnam, mpsSaveDir, MPI)
-        if MPI is not None:
-            MPI.barrier()
-            
-    #==== Duplicate MPS files in scratch (obtained ====#
-    #====  from the MPSInfo object) to mpsSaveDir  ====#
-    for iSite in range(-1,mps.n_sites): # -1 is data
-        fnam = mps.get_filename(iSite)
-        copyIt(fnam, mpsSaveDir, MPI)
+    #==== Duplicate the MPS info and MPS files in scratch ====#
+    #==== (from the MPSInfo object) to mpsSaveDir in bulk ====#
+    nroots = mps.nroots if isinstance(mps, bs.MultiMPS) else None
+    fnames = get_mps_files(mps.info, mps, nroots)
+    pairs = [(f, mpsSaveDir + '/' + os.path.split(f)[-1]) for f in fnames]
+    if codec is None:
+        bulk_copy(pairs, MPI, label='MPS files')
+        if MPI is None or MPI.rank == 0:
+            if os.path.isfile(mpsSaveDir + '/' + CODEC_FILE):
+                os.remove(mpsSaveDir + '/' + CODEC_FILE)    # 1)
+    else:
+        pairs.append((f"{mpsSaveDir}/mps_info.bin.tmp", f"{mpsSaveDir}/mps_info.bin"))
+        bulk_copy(pairs, MPI, label='MPS files (' + str(codec) + ')',
+                  copier=lambda s, d: compress_file(s, d, codec))
+        if MPI is None or MPI.rank == 0:
+            size = sum(os.path.getsize(p[0]) for p in pairs if os.path.isfile(p[0]))
+            stored = sum(os.path.getsize(p[1]) for p in pairs if os.path.isfile(p[1]))
+            os.remove(f"{mpsSaveDir}/mps_info.bin.tmp")     # 2)
+            write_codec_info(mpsSaveDir, codec)
+            _print('    Compression ratio = %.3f' % (size / max(stored, 1)))
         if MPI is not None:
             MPI.barrier()
-    if isinstance(mps, bs.MultiMPS):
-        for iroot in range(0,mps.nroots):
-            fnam = mps.get_wfn_filename(iroot, "")
-            # I think the second argument of get_wfn_filename should be
-            # made optional.
-            copyIt(fnam, mpsSaveDir, MPI)
-            if MPI is not None:
-                MPI.barrier()
+    # NOTES:
+    # 1) When an uncompressed MPS overwrites a compressed one in the same directory.
+    # 2) Only after the sizes are measured so that mps_info.bin enters the ratio.
     return
 #################################################
 
 
+#################################################
+ARCHIVE_MAGIC = b'IMPSAR01'
+# An MPS archive is a single file made of:
+#    ARCHIVE_MAGIC (8 bytes)
+#    the length H of the header (8 bytes, little-endian unsigned)
+#    the header (H bytes), a JSON dictionary whose 'files' item is a list of
+#       [name, offset, size] of the members, the offsets being counted from the
+#       end of the header
+#    the contents of the members
+# The members are mps_info.bin and the files that saveMPStoDir would write, i.e.
+# the MPS info files and the site tensors (one member per site), plus the wave 
+# functions of a MultiMPS.
+#################################################
+
+
+#################################################
+def saveMPStoArchive(mps:bs.MPS|bs.MultiMPS, archive:str, MPI:MPICommunicator=None):
+    '''
+    Saves mps into the single file archive (see ARCHIVE_MAGIC for the format) instead
+    of a directory of files as in saveMPStoDir. The archive is written under a 
+    temporary name on MPI rank 0 and then renamed. It can be loaded with 
+    loadMPSfromDir by passing its path as mpsSaveDir and 'mps_info.bin' as mpstag,
+    or opened without staging it into the scratch with lazy_mps.
+    '''
+    mps.save_data() # Important! Saves canonical form
+    if MPI is None or MPI.rank == 0:
+        t = time.perf_counter()
+        adir = os.path.dirname(os.path.abspath(archive))
+        if not os.path.exists(adir):
+            try:
+                os.makedirs(adir)
+            except FileExistsError:
+                pass
+        mps.info.save_data(archive + '.info.tmp')
+        nroots = mps.nroots if isinstance(mps, bs.MultiMPS) else None
+        members = [('mps_info.bin', archive + '.info.tmp')] + \
+                  [(os.path.split(f)[-1], f) for f in get_mps_files(mps.info, mps, nroots)
+                   if os.path.isfile(f)]
+
+        #==== Header index ====#
+        index, offset = [], 0
+        for name, f in members:
+            size = os.path.getsize(f)
+            index.append([name, offset, size])
+            offset += size
+        header = json.dumps({'version':1, 'files':index}).encode()
+
+        #==== Header and members ====#
+        with open(archive + '.tmp', 'wb') as far:
+            far.write(ARCHIVE_MAGIC + struct.pack('<Q', len(header)) + header)
+            for name, f in members:
+                with open(f, 'rb') as fm:
+                    shutil.copyfileobj(fm, far, 16<<20)
+        os.replace(archive + '.tmp', archive)
+        os.remove(archive + '.info.tmp')
+        dt = max(time.perf_counter() - t, 1.0E-9)
+        _print('    Archived %d MPS files (%.2f MB) in %.3f s, %.1f MB/s' %
+               (len(members), offset/1.0E6, dt, offset/1.0E6/dt))
+    if MPI is not None:
+        MPI.barrier()
+#################################################
+
+
+#################################################
+def read_archive_index(archive:str):
+    '''
+    Returns a dictionary {name: (absolute offset, size)} of the members of archive.
+    '''
+    with open(archive, 'rb') as far:
+        magic = far.read(len(ARCHIVE_MAGIC))
+        if magic != ARCHIVE_MAGIC:
+            raise ValueError(f'{archive} is not an MPS archive.')
+        hlen, = struct.unpack('<Q', far.read(8))
+        header = json.loads(far.read(hlen).decode())
+    base = len(ARCHIVE_MAGIC) + 8 + hlen
+    return {name: (base + offset, size) for name, offset, size in header['files']}
+#################################################
+
+
+#################################################
+def extract_archive(archive:str, targets, MPI:MPICommunicator=None, n_threads=None):
+    '''
+    Extracts the members of archive into files, targets is a list of (name, dst). 
+    The members are read in parallel with a thread pool on MPI rank 0, followed by a
+    single barrier. Names that are not in the archive are skipped. Returns the 
+    throughput in MB/s.
+    '''
+    rate = 0.0
+    if MPI is None or MPI.rank == 0:
+        t = time.perf_counter()
+        index = read_archive_index(archive)
+        fd = os.open(archive, os.O_RDONLY)
+        def extract(target):
+            name, dst = target
+            if name not in index:
+                return 0
+            offset, size = index[name]
+            with open(dst, 'wb') as fdst:
+                done = 0
+                while done < size:
+                    buf = os.pread(fd, min(size - done, 16<<20), offset + done)
+                    if len(buf) == 0:
+                        raise ValueError(f'The member {name} of {archive} is truncated.')
+                    fdst.write(buf)
+                    done += len(buf)
+            return size
+        try:
+            if n_threads is None:
+                n_threads = min(8, max(len(targets), 1))
+            with ThreadPoolExecutor(n_threads) as pool:
+                sizes = list(pool.map(extract, targets))
+        finally:
+            os.close(fd)
+        dt = max(time.perf_counter() - t, 1.0E-9)
+        rate = sum(sizes) / 1.0E6 / dt
+        _print('    Extracted %d MPS files (%.2f MB) in %.3f s, %.1f MB/s' %
+               (sum(1 for x in sizes if x > 0), sum(sizes)/1.0E6, dt, rate))
+    if MPI is not None:
+        MPI.barrier()
+    return rate
+#################################################
+
+
+#################################################
+class mps_archive:
+    '''
+    A read-only, memory-mapped view of an archive written by saveMPStoArchive.
+    Opening it only reads the header, the contents of a member are read from the
+    disk when they are accessed. member(name) returns the contents as a memoryview
+    into the map (no copy), and write(targets) writes members into files, skipping
+    the files that it has written before. close(), or leaving a with block, removes
+    the written files (unless keep=True) and closes the archive.
+    '''
+    #################################################
+    def __init__(self, archive:str):
+        self.archive = archive
+        self.index = read_archive_index(archive)
+        self.written = []
+        self.fd = os.open(archive, os.O_RDONLY)
+        size = os.fstat(self.fd).st_size
+        self.mm = mmap.mmap(self.fd, 0, access=mmap.ACCESS_READ)
+        for name, (offset, n) in self.index.items():
+            if offset + n > size:
+                self.close()
+                raise ValueError(f'The member {name} of {archive} is truncated.')
+    #################################################
+
+
+    #################################################
+    def __contains__(self, name):
+        return name in self.index
+    #################################################
+
+
+    #################################################
+    def member(self, name:str):
+        '''
+        The contents of the member name as a read-only memoryview.
+        '''
+        assert self.mm is not None, f'The archive {self.archive} is closed.'
+        offset, size = self.index[name]
+        return memoryview(self.mm)[offset:offset+size]
+    #################################################
+
+
+    #################################################
+    def write(self, targets):
+        '''
+        Writes the members into files, targets is a list of (name, dst). Names that
+        are not in the archive and files written before are skipped. Returns the
+        list of the files that have been written.
+        '''
+        done = []
+        for name, dst in targets:
+            if name not in self.index or dst in self.written:
+                continue
+            with self.member(name) as mv, open(dst, 'wb') as fdst:
+                fdst.write(mv)
+            self.written.append(dst)
+            done.append(dst)
+        return done
+    #################################################
+
+
+    #################################################
+    def close(self, keep=False):
+        '''
+        Removes the files written by write (unless keep is True) and closes the
+        archive.
+        '''
+        if not keep:
+            for f in self.written:
+                if os.path.isfile(f):
+                    os.remove(f)
+        self.written = []
+        if self.mm is not None:
+            self.mm.close()
+            os.close(self.fd)
+            self.mm = None
+    #################################################
+
+
+    #################################################
+    def __enter__(self):
+        return self
+    #################################################
+
+
+    #################################################
+    def __exit__(self, *args):
+        self.close()
+    #################################################
+#################################################
+
+
+#################################################
+class lazy_mps:
+    '''
+    An MPS opened from an archive written by saveMPStoArchive (see mps_archive)
+    without staging it into the scratch as loadMPSfromDir does. Opening it writes
+    only the MPS info and the MPS data into the scratch, under a tag that is unique
+    to the view, so that many sampled MPSs can be open at the same time. There is
+    no deep_copy nor load_mutable, the canonical form of the stored MPS is kept.
+
+    The site tensors are brought in on demand:
+       tensor(i)    writes the files of site i (the tensor and the bond dimensions
+                    on both sides), loads the tensor, and returns it, e.g. for an
+                    analysis of a few sites.
+       stage(sites) writes the files of the given sites (all sites if None) and
+                    returns the MPS, whose tensors block2 then loads from those
+                    files when a sweep touches them. A sweep must stay within the
+                    staged sites, e.g. an overlap needs all of them.
+    Sites that have been written before are not written again. release(), or
+    leaving a with block, removes the written files and closes the archive.
+
+    mps_type has the same meaning as in loadMPSfromDir ('normal' or 'multi').
+    '''
+    _ntag = itertools.count()
+
+    #################################################
+    def __init__(self, archive:str, mps_type:dict={'type':'normal'},
+                 mpstag:str='mps_info.bin', MPI:MPICommunicator=None):
+        assert mps_type['type'] in ['normal', 'multi'], \
+            'lazy_mps only supports the \'normal\' and \'multi\' MPS types.'
+        if mps_type['type'] == 'multi':
+            assert 'nroots' in mps_type, 'When mps_type[\'type\'] is \'multi\', ' + \
+                'the key \'nroots\' is required.'
+        self.MPI = MPI
+        self.ar = mps_archive(archive)
+        assert mpstag in self.ar, f'{mpstag} is not found in {archive}.'
+        self.tag = 'LZ%d' % next(lazy_mps._ntag)
+        self.nroots = mps_type['nroots'] if mps_type['type'] == 'multi' else None
+        self.sites = set()
+
+        #==== MPS info ====#
+        info_path = b2.Global.frame.save_dir + '/' + self.tag + '.' + mpstag
+        self._write([(mpstag, info_path)])
+        if mps_type['type'] == 'multi':
+            self.info = brs.MultiMPSInfo(0)
+        else:
+            self.info = brs.MPSInfo(0)
+        self.info.load_data(info_path)
+
+        #==== Archive members under the original tag -> scratch files ====#
+        src = self._files_per_site()
+        self.info.tag = self.tag
+        dst = self._files_per_site()
+        self.members = {k: [(os.path.split(a)[-1], b) for a, b in zip(src[k], dst[k])]
+                        for k in dst}
+
+        #==== MPS data ====#
+        self._write(self.members[-1])
+        if mps_type['type'] == 'multi':
+            self.mps = bs.MultiMPS(self.info)
+        else:
+            self.mps = bs.MPS(self.info)
+        self.mps.load_data()
+    #################################################
+
+
+    #################################################
+    def _files_per_site(self):
+        '''
+        The scratch file names of the current tag grouped by site, the MPS data and
+        the wave functions of a MultiMPS are under the key -1.
+        '''
+        if self.nroots is None:
+            mps = bs.MPS(self.info)
+        else:
+            mps = bs.MultiMPS(self.info)
+        files = {-1: [mps.get_filename(-1)]}
+        if self.nroots is not None:
+            files[-1] += [mps.get_wfn_filename(i, "") for i in range(0, self.nroots)]
+        for i in range(0, self.info.n_sites):
+            files[i] = [mps.get_filename(i)] + \
+                       [self.info.get_filename(left, j) for j in (i, i+1)
+                        for left in (True, False)]
+        return files
+    #################################################
+
+
+    #################################################
+    def _write(self, targets):
+        if self.MPI is None or self.MPI.rank == 0:
+            self.ar.write(targets)
+        if self.MPI is not None:
+            self.MPI.barrier()
+    #################################################
+
+
+    #################################################
+    def stage(self, sites=None):
+        '''
+        Writes the files of sites (a list of 0-based site indices, all sites if None)
+        into the scratch and returns the MPS.
+        '''
+        if sites is None:
+            sites = range(0, self.info.n_sites)
+        sites = [i for i in sites if i not in self.sites]
+        targets = []
+        for i in sites:
+            assert 0 <= i < self.info.n_sites, f'Site {i} is out of range.'
+            targets += self.members[i]
+        self._write(targets)
+        self.sites.update(sites)
+        return self.mps
+    #################################################
+
+
+    #################################################
+    def tensor(self, i:int):
+        '''
+        Returns the tensor of site i, which is read from the archive the first time.
+        '''
+        if self.mps.tensors[i] is None:
+            self.stage([i])
+            self.mps.load_tensor(i)
+        return self.mps.tensors[i]
+    #################################################
+
+
+    #################################################
+    def release(self):
+        '''
+        Removes the files written into the scratch and closes the archive.
+        '''
+        self.ar.close()
+        self.sites = set()
+        if self.MPI is not None:
+            self.MPI.barrier()
+    #################################################
+
+
+    #################################################
+    def __enter__(self):
+        return self
+    #################################################
+
+
+    #################################################
+    def __exit__(self, *args):
+        self.release()
+    #################################################
+#################################################
+
+
 #################################################
 #################################################
 def copyItRev(fnam:str, mpsSaveDir:str, MPI:MPICommunicator=None):
@@ -307,7 +1002,19 @@ def loadMPSfromDir(mpsSaveDir:str, mpstag:str, complex_mps:bool, mps_type:dict,
 
 
     #==== Construct the MPS information found in <mpsSaveDir>/<mpstag> ====#
-    inmps_path = mpsSaveDir + "/" + mpstag
+    is_archive = os.path.isfile(mpsSaveDir)      # 3)
+    codec = None if is_archive else read_codec_info(mpsSaveDir)      # 4)
+    if is_archive:
+        inmps_path = b2.Global.frame.save_dir + '/' + os.path.split(mpsSaveDir)[-1] + \
+                     '.' + mpstag
+        extract_archive(mpsSaveDir, [(mpstag, inmps_path)], MPI)
+    elif codec is not None:
+        inmps_path = b2.Global.frame.save_dir + '/' + \
+                     os.path.split(os.path.abspath(mpsSaveDir))[-1] + '.' + mpstag
+        bulk_copy([(mpsSaveDir + '/' + mpstag, inmps_path)], MPI, label='MPS info',
+                  copier=lambda s, d: decompress_file(s, d, codec))
+    else:
+        inmps_path = mpsSaveDir + "/" + mpstag
     if mps_type['type'] == 'normal':
         mps_info = brs.MPSInfo(0)
     elif mps_type['type'] == 'multi':
@@ -320,41 +1027,30 @@ def loadMPSfromDir(mpsSaveDir:str, mpstag:str, complex_mps:bool, mps_type:dict,
     mps_info.load_data(inmps_path)
 
 
-    #==== Duplicate MPS info files in mpsSaveDir to the ====#
-    #====   scratch obtained from the MPSInfo object    ====#
-    for iSite in range(mps_info.n_sites + 1):
-        fnam = mps_info.get_filename(False, iSite)
-        copyItRev(fnam, mpsSaveDir, MPI)
-        if MPI is not None:
-            MPI.barrier()
-        fnam = mps_info.get_filename(True, iSite)
-        copyItRev(fnam, mpsSaveDir, MPI)
-        if MPI is not None:
-            MPI.barrier()
-
-
-    #==== Duplicate MPS files in mpsSaveDir to the ====#
-    #==== scratch obtained from the MPSInfo object ====#
+    #==== Duplicate the MPS info and MPS files in mpsSaveDir ====#
+    #====  to the scratch (from the MPSInfo object) in bulk  ====#
     if mps_type['type'] == 'multi':
         mps = bs.MultiMPS(mps_info)          # 1)
     else:
         mps = bs.MPS(mps_info)          # 1)
-    for iSite in range(-1, mps_info.n_sites):  # -1 is data
-        fnam = mps.get_filename(iSite)
-        copyItRev(fnam, mpsSaveDir, MPI)
-        if MPI is not None:
-            MPI.barrier()
+    nroots = mps_type['nroots'] if mps_type['type'] == 'multi' else None
+    fnames = get_mps_files(mps_info, mps, nroots)
+    if is_archive:
+        extract_archive(mpsSaveDir, [(os.path.split(f)[-1], f) for f in fnames], MPI)
+    elif codec is not None:
+        bulk_copy([(mpsSaveDir + '/' + os.path.split(f)[-1], f) for f in fnames], MPI,
+                  label='MPS files (' + str(codec) + ')',
+                  copier=lambda s, d: decompress_file(s, d, codec))
+    else:
+        bulk_copy([(mpsSaveDir + '/' + os.path.split(f)[-1], f) for f in fnames], MPI,
+                  label='MPS files')
     # NOTES:
     # 1) At this point, mps is just a dummy MPS object used to get
     #    the path to the scratch folder.
-    if mps_type['type'] == 'multi':
-        for iroot in range(0, mps_type['nroots']):
-            fnam = mps.get_wfn_filename(iroot, "")
-            # I think the second argument of get_wfn_filename should be
-            # made optional.
-            copyItRev(fnam, mpsSaveDir, MPI)
-            if MPI is not None:
-                MPI.barrier()
+    # 3) mpsSaveDir may also be an MPS archive written by saveMPStoArchive, in
+    #    which case mpstag is the name of the MPS info member (mps_info.bin).
+    # 4) mpsSaveDir may also contain files compressed by saveMPStoDir, they are 
+    #    decompressed into the scratch on the fly.
 
     
     #==== Construct the actual MPS object ====#
@@ -1,3 +1,4 @@
+import json
 import numpy as np
 try:
     from block2.su2 import MPICommunicator
@@ -232,8 +233,10 @@ class print_autocorrelation:
         self.prefix = prefix
         self.ac_f = './' + self.prefix + '.ac'
         self.ac2t_f = './' + self.prefix + '.ac2t'
+        self.tt = np.zeros(n_t)
         self.ac = np.zeros(n_t, dtype=np.complex128)
         self.ac2t = np.zeros(n_t, dtype=np.complex128)
+        self.normsqs = np.zeros(n_t)
         self.save_txt = save_txt
         self.save_npy = save_npy
 
@@ -291,23 +294,77 @@ class print_autocorrelation:
             assert isinstance(ac2t, (complex, np.complex64, np.complex128))
             
         self.it += 1
+        if self.it >= len(self.tt): self.grow(2*len(self.tt))
+        self.tt[self.it] = tt
         self.ac[self.it] = ac
         self.ac2t[self.it] = ac2t
+        self.normsqs[self.it] = normsqs
         
         if self.save_txt:
-            with open(self.ac_f, 'a') as acf:
-                acf.write(' %9d %13.8f   %11.8f %11.8f %11.8f %11.8f\n' %
-                          (self.it, tt, self.ac[self.it].real, self.ac[self.it].imag, 
-                           np.abs(self.ac[self.it]), normsqs) )
-            with open(self.ac2t_f, 'a') as ac2tf:
-                ac2tf.write(' %9d %13.8f   %11.8f %11.8f %11.8f\n' %
-                            (self.it, 2*tt, self.ac2t[self.it].real, self.ac2t[self.it].imag,
-                             np.abs(self.ac2t[self.it])) )
+            self.write_row(self.it)
             self.print_stat = True
 
         if self.save_npy:
             np.save(self.ac_f, self.ac[0:self.it+1])
             np.save(self.ac2t_f, self.ac2t[0:self.it+1])
+    #################################################
+
+
+    #################################################
+    def write_row(self, i):
+        with open(self.ac_f, 'a') as acf:
+            acf.write(' %9d %13.8f   %11.8f %11.8f %11.8f %11.8f\n' %
+                      (i, self.tt[i], self.ac[i].real, self.ac[i].imag, 
+                       np.abs(self.ac[i]), self.normsqs[i]) )
+        with open(self.ac2t_f, 'a') as ac2tf:
+            ac2tf.write(' %9d %13.8f   %11.8f %11.8f %11.8f\n' %
+                        (i, 2*self.tt[i], self.ac2t[i].real, self.ac2t[i].imag,
+                         np.abs(self.ac2t[i])) )
+    #################################################
+
+
+    #################################################
+    def grow(self, n_t):
+        '''
+        Enlarges the storage to n_t time points, needed when the number of time points
+        is not known in advance (e.g. with adaptive time steps).
+        '''
+        for k in ('tt', 'ac', 'ac2t', 'normsqs'):
+            a = getattr(self, k)
+            if n_t > len(a):
+                setattr(self, k, np.concatenate((a, np.zeros(n_t-len(a), dtype=a.dtype))))
+    #################################################
+
+
+    #################################################
+    def get_state(self):
+        return {'it':self.it, 'tt':self.tt.copy(), 'ac':self.ac.copy(),
+                'ac2t':self.ac2t.copy(), 'normsqs':self.normsqs.copy()}
+    #################################################
+
+
+    #################################################
+    def restore(self, state):
+        '''
+        Restores the values printed up to a checkpoint (obtained from get_state) and
+        rewrites the output files from them. Any rows that had been printed after the
+        checkpoint are thus discarded.
+        '''
+        n = state['it'] + 1
+        self.grow(n)
+        for k in ('tt', 'ac', 'ac2t', 'normsqs'):
+            getattr(self, k)[0:n] = state[k][0:n]
+        self.it = state['it']
+        
+        if self.save_txt:
+            self.header()
+            for i in range(0, self.it+1):
+                self.write_row(i)
+            if self.it >= 0: self.print_stat = True
+
+        if self.save_npy:
+            np.save(self.ac_f, self.ac[0:self.it+1])
+            np.save(self.ac2t_f, self.ac2t[0:self.it+1])
 
 ##########################################################################
 
@@ -327,6 +384,7 @@ class print_td_pcharge:
         self.save_npy = save_npy
         self.low_file = []
         self.it = -1
+        self.tt = np.zeros(n_t)
         self.pchg = np.zeros((self.natm, n_t), dtype=np.complex128)
 
         if not self.save_txt and not self.save_npy:
@@ -400,26 +458,12 @@ class print_td_pcharge:
                 f'len(pchg) = {len(pchg)} while self.natm = {self.natm}.'
         
         self.it += 1
+        self.tt[self.it] = tt
         self.pchg[:,self.it] = pchg
 
         #==== Printing into text files ====#
         if self.save_txt:
-            ia = 0
-
-            #==== Loop over files ====#
-            for i in range(0, self.nparts):
-                ncol = self.max_atom
-                if i == self.nparts-1 and self.rem != 0:
-                    ncol = self.rem
-                with open(self.low_file[i], 'a') as lowf:
-                    lowf.write(' %9d %13.8f  ' % (self.it, tt))
-
-                    #== Loop over atoms for the current file ==#
-                    for j in range(0, ncol):
-                        lowf.write(' %14.6e' % (self.pchg[ia,self.it].real))
-                        ia += 1
-                    lowf.write('\n')
-                    
+            self.write_row(self.it)
             self.print_stat = True
 
                     
@@ -430,6 +474,55 @@ class print_td_pcharge:
     #############################################
 
 
+    #############################################
+    def write_row(self, it):
+        ia = 0
+
+        #==== Loop over files ====#
+        for i in range(0, self.nparts):
+            ncol = self.max_atom
+            if i == self.nparts-1 and self.rem != 0:
+                ncol = self.rem
+            with open(self.low_file[i], 'a') as lowf:
+                lowf.write(' %9d %13.8f  ' % (it, self.tt[it]))
+
+                #== Loop over atoms for the current file ==#
+                for j in range(0, ncol):
+                    lowf.write(' %14.6e' % (self.pchg[ia,it].real))
+                    ia += 1
+                lowf.write('\n')
+    #############################################
+
+
+    #############################################
+    def get_state(self):
+        return {'it':self.it, 'tt':self.tt.copy(), 'pchg':self.pchg.copy()}
+    #############################################
+
+
+    #############################################
+    def restore(self, state):
+        '''
+        Restores the partial charges printed up to a checkpoint (obtained from 
+        get_state) and rewrites the output files from them.
+        '''
+        n = state['it'] + 1
+        self.tt[0:n] = state['tt'][0:n]
+        self.pchg[:, 0:n] = state['pchg'][:, 0:n]
+        self.it = state['it']
+
+        if self.save_txt:
+            self.header()
+            for i in range(0, self.it+1):
+                self.write_row(i)
+            if self.it >= 0: self.print_stat = True
+
+        if self.save_npy:
+            npy_file = './' + self.prefix + '.low'
+            np.save(npy_file, self.pchg[:, 0:self.it+1])
+    #############################################
+
+
     #############################################
     def footer(self):
         if self.save_txt:
@@ -485,6 +578,7 @@ class print_td_bo:
         self.save_npy = save_npy
         self.bo_file = []
         self.it = -1
+        self.tt = np.zeros(n_t)
         self.bo = np.zeros((self.npairs, n_t), dtype=np.complex128)
 
         if not self.save_txt and not self.save_npy:
@@ -565,26 +659,12 @@ class print_td_bo:
                 f'len(bo) = {len(bo)} while self.npairs = {self.npairs}.'
         
         self.it += 1
+        self.tt[self.it] = tt
         self.bo[:,self.it] = bo
 
         #==== Printing into text files ====#
         if self.save_txt:
-            ib = 0
-
-            #==== Loop over files ====#
-            for i in range(0, self.nparts):
-                ncol = self.max_pairs
-                if i == self.nparts-1 and self.rem != 0:
-                    ncol = self.rem
-                with open(self.bo_file[i], 'a') as bof:
-                    bof.write(' %9d %13.8f  ' % (self.it, tt))
-
-                    #== Loop over atom pairs for the current file ==#
-                    for j in range(0, ncol):
-                        bof.write(' %16.6e' % (self.bo[ib,self.it].real))
-                        ib += 1
-                    bof.write('\n')
-                    
+            self.write_row(self.it)
             self.print_stat = True
 
                     
@@ -595,6 +675,55 @@ class print_td_bo:
     ###############################################
 
 
+    ###############################################
+    def write_row(self, it):
+        ib = 0
+
+        #==== Loop over files ====#
+        for i in range(0, self.nparts):
+            ncol = self.max_pairs
+            if i == self.nparts-1 and self.rem != 0:
+                ncol = self.rem
+            with open(self.bo_file[i], 'a') as bof:
+                bof.write(' %9d %13.8f  ' % (it, self.tt[it]))
+
+                #== Loop over atom pairs for the current file ==#
+                for j in range(0, ncol):
+                    bof.write(' %16.6e' % (self.bo[ib,it].real))
+                    ib += 1
+                bof.write('\n')
+    ###############################################
+
+
+    ###############################################
+    def get_state(self):
+        return {'it':self.it, 'tt':self.tt.copy(), 'bo':self.bo.copy()}
+    ###############################################
+
+
+    ###############################################
+    def restore(self, state):
+        '''
+        Restores the bond orders printed up to a checkpoint (obtained from get_state)
+        and rewrites the output files from them.
+        '''
+        n = state['it'] + 1
+        self.tt[0:n] = state['tt'][0:n]
+        self.bo[:, 0:n] = state['bo'][:, 0:n]
+        self.it = state['it']
+
+        if self.save_txt:
+            self.header()
+            for i in range(0, self.it+1):
+                self.write_row(i)
+            if self.it >= 0: self.print_stat = True
+
+        if self.save_npy:
+            npy_file = './' + self.prefix + '.bo'
+            np.save(npy_file, self.bo[:, 0:self.it+1])
+    ###############################################
+
+
     ###############################################
     def footer(self):
         if self.save_txt:
@@ -642,6 +771,7 @@ class print_td_mpole:
         self.save_npy = save_npy
         self.mp_file = './' + self.prefix + '.mp'
         self.it = -1
+        self.tt = np.zeros(n_t)
         self.dp = np.zeros((3, n_t), dtype=np.complex128)    # Dipole moments
         self.qp = np.zeros((6, n_t), dtype=np.complex128)    # Quadrupole moments
 
@@ -703,25 +833,14 @@ class print_td_mpole:
                 f'n_qp.shape = {n_qp.shape} while it has to be (3,3).'
         
         self.it += 1
+        self.tt[self.it] = tt
         self.dp[:,self.it] = e_dp + n_dp
         qp_ = e_qp + n_qp
         self.qp[:,self.it] = np.hstack( (np.diag(qp_,0), np.diag(qp_,1), np.diag(qp_,2)) )
 
         #==== Printing into text files ====#
         if self.save_txt:
-            with open(self.mp_file, 'a') as mpf:
-                mpf.write((' %9d %13.8f  ' +
-                           ' %14.6e %14.6e %14.6e' +
-                           ' %14.6e %14.6e %14.6e' +
-                           ' %14.6e %14.6e %14.6e\n') %
-                          (self.it, tt,
-                           self.dp[0,self.it].real, self.dp[1,self.it].real,
-                           self.dp[2,self.it].real,
-                           self.qp[0,self.it].real, self.qp[1,self.it].real,
-                           self.qp[2,self.it].real,
-                           self.qp[3,self.it].real, self.qp[4,self.it].real,
-                           self.qp[5,self.it].real))
-                
+            self.write_row(self.it)
             self.print_stat = True
 
         #==== Printing into *.npy file ====#
@@ -732,6 +851,51 @@ class print_td_mpole:
     #############################################
 
 
+    #############################################
+    def write_row(self, it):
+        with open(self.mp_file, 'a') as mpf:
+            mpf.write((' %9d %13.8f  ' +
+                       ' %14.6e %14.6e %14.6e' +
+                       ' %14.6e %14.6e %14.6e' +
+                       ' %14.6e %14.6e %14.6e\n') %
+                      (it, self.tt[it],
+                       self.dp[0,it].real, self.dp[1,it].real, self.dp[2,it].real,
+                       self.qp[0,it].real, self.qp[1,it].real, self.qp[2,it].real,
+                       self.qp[3,it].real, self.qp[4,it].real, self.qp[5,it].real))
+    #############################################
+
+
+    #############################################
+    def get_state(self):
+        return {'it':self.it, 'tt':self.tt.copy(), 'dp':self.dp.copy(),
+                'qp':self.qp.copy()}
+    #############################################
+
+
+    #############################################
+    def restore(self, state):
+        '''
+        Restores the multipole components printed up to a checkpoint (obtained from 
+        get_state) and rewrites the output files from them.
+        '''
+        n = state['it'] + 1
+        self.tt[0:n] = state['tt'][0:n]
+        self.dp[:, 0:n] = state['dp'][:, 0:n]
+        self.qp[:, 0:n] = state['qp'][:, 0:n]
+        self.it = state['it']
+
+        if self.save_txt:
+            self.header()
+            for i in range(0, self.it+1):
+                self.write_row(i)
+            if self.it >= 0: self.print_stat = True
+
+        if self.save_npy:
+            np.save(self.mp_file, np.vstack( (self.dp[:, 0:self.it+1],
+                                              self.qp[:, 0:self.it+1]) ))
+    #############################################
+
+
     #############################################
     def footer(self):
         if self.save_txt:
@@ -764,6 +928,171 @@ class print_td_mpole:
 ##########################################################################
 
 
+##########################################################################
+class print_td_entropy:
+    '''
+    Prints the single-orbital entropies of all orbitals and the mutual information of
+    the selected orbital pairs (1-based indices) at the sampling times into 
+    <prefix>.oent (text, if save_txt) and <prefix>.oent.npz (if save_npy).
+    '''
+
+    #############################################
+    def __init__(self, n_orb, pairs, prefix, n_t, save_txt=True, save_npy=True):
+        self.n_orb = n_orb
+        self.pairs = pairs
+        self.prefix = prefix
+        self.save_txt = save_txt
+        self.save_npy = save_npy
+        self.oent_file = './' + self.prefix + '.oent'
+        self.it = -1
+        self.tt = np.zeros(n_t)
+        self.s1 = np.zeros((n_orb, n_t))
+        self.mi = np.zeros((len(pairs), n_t))
+        self.header_stat = False
+    #############################################
+
+
+    #############################################
+    def header(self):
+        if self.save_txt:
+            assert self.header_stat == False, \
+                'Cannot double print the header of the TD orbital entropy file.'
+            labels = [f'S({i+1})' for i in range(0, self.n_orb)] + \
+                     [f'I({i},{j})' for i, j in self.pairs]
+            hline = ''.join(['-' for i in range(0, 9+1+13+2+(1+14)*len(labels))])
+            with open(self.oent_file, 'w') as of:
+                print_describe_content('orbital entropy and mutual information data', of)
+                of.write('# 1 a.u. of time = %.10f fs\n' % au2fs)
+                of.write('#' + hline + '\n')
+                of.write('#%9s %13s  ' % ('No.', 'Time (a.u.)') +
+                         ''.join([' %14s' % l for l in labels]) + '\n')
+                of.write('#' + hline + '\n')
+            self.header_stat = True
+    #############################################
+
+
+    #############################################
+    def print_entropy(self, tt, s1, mi):
+        if self.save_txt:
+            assert self.header_stat == True, \
+                'The header of the TD orbital entropy file must be printed first (by ' + \
+                'calling print_td_entropy.header()) before printing the entropies.'
+        self.it += 1
+        self.tt[self.it] = tt
+        self.s1[:,self.it] = s1
+        self.mi[:,self.it] = mi
+        if self.save_txt:
+            self.write_row(self.it)
+        if self.save_npy:
+            self.save_npz()
+    #############################################
+
+
+    #############################################
+    def write_row(self, it):
+        with open(self.oent_file, 'a') as of:
+            of.write(' %9d %13.8f  ' % (it, self.tt[it]) +
+                     ''.join([' %14.6e' % x for x in self.s1[:,it]]) +
+                     ''.join([' %14.6e' % x for x in self.mi[:,it]]) + '\n')
+    #############################################
+
+
+    #############################################
+    def save_npz(self):
+        n = self.it + 1
+        np.savez(self.oent_file, t=self.tt[0:n], s1=self.s1[:,0:n], mi=self.mi[:,0:n],
+                 pairs=np.array(self.pairs, dtype=int).reshape(-1, 2))
+    #############################################
+
+
+    #############################################
+    def get_state(self):
+        return {'it':self.it, 'tt':self.tt.copy(), 's1':self.s1.copy(),
+                'mi':self.mi.copy()}
+    #############################################
+
+
+    #############################################
+    def restore(self, state):
+        '''
+        Restores the entropies printed up to a checkpoint (obtained from get_state) and
+        rewrites the output files from them.
+        '''
+        n = state['it'] + 1
+        self.tt[0:n] = state['tt'][0:n]
+        self.s1[:, 0:n] = state['s1'][:, 0:n]
+        self.mi[:, 0:n] = state['mi'][:, 0:n]
+        self.it = state['it']
+        if self.save_txt:
+            self.header()
+            for i in range(0, self.it+1):
+                self.write_row(i)
+        if self.save_npy:
+            self.save_npz()
+    #############################################
+##########################################################################
+
+
+##########################################################################
+class print_te_perf:
+    '''
+    Writes one JSON record per time step into <prefix>.perf.jsonl, containing the
+    wall time breakdown of the step and the resource usage.
+    '''
+
+    #################################################
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.perf_f = './' + self.prefix + '.perf.jsonl'
+        self.header_stat = False
+    #################################################
+
+
+    #################################################
+    def header(self):
+        assert self.header_stat == False, \
+            'Cannot double initiate the performance telemetry file.'
+        with open(self.perf_f, 'w') as pf:
+            pass
+        self.header_stat = True
+    #################################################
+
+
+    #################################################
+    def print_perf(self, rec):
+        assert self.header_stat == True, \
+            'The performance telemetry file must be initiated first (by calling ' + \
+            'print_te_perf.header() or print_te_perf.restore()) before printing the ' + \
+            'records.'
+        with open(self.perf_f, 'a') as pf:
+            pf.write(json.dumps(rec) + '\n')
+    #################################################
+
+
+    #################################################
+    def restore(self, it):
+        '''
+        Keeps only the records up to the it-th time point of an earlier run that is
+        being resumed.
+        '''
+        recs = []
+        try:
+            with open(self.perf_f, 'r') as pf:
+                for l in pf:
+                    try:
+                        rec = json.loads(l)
+                    except ValueError:
+                        break      # A line cut short by the interruption.
+                    if rec['it'] <= it: recs.append(l)
+        except FileNotFoundError:
+            pass
+        with open(self.perf_f, 'w') as pf:
+            pf.writelines(recs)
+        self.header_stat = True
+    #################################################
+##########################################################################
+
+
 ##########################################################################
 def print_mrci_warning():
     print_warning('MRCI is active and orbitals ordering chosen are either genetic ' +
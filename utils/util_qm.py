@@ -33,6 +33,75 @@ def make_full_dm(ncore, dm):
 #################################################
 
 
+#################################################
+def _pdm2_images(n, i):
+    # The flat indices of dm[i,:,:,:] and of the elements related to them by the
+    # permutation symmetries (see pack_2pdm), the smallest of which is the
+    # representative of each set, and whether the representative is conjugated.
+    j, k, l = np.indices((n, n, n), dtype=np.int64).reshape(3, -1)
+    f0 = ((i*n + j)*n + k)*n + l
+    fs = ((j*n + i)*n + l)*n + k
+    fh = ((l*n + k)*n + j)*n + i
+    fhs = ((k*n + l)*n + i)*n + j
+    rep = np.minimum(np.minimum(f0, fs), np.minimum(fh, fhs))
+    return f0, rep, (rep != f0) & (rep != fs)
+#################################################
+
+
+#################################################
+def pack_2pdm(dm, single=False):
+    '''
+    Packs a 2PDM dm[i,j,k,l] = <a^+_i a^+_j a_k a_l> using its permutation symmetries
+       dm[i,j,k,l] = dm[j,i,l,k] = dm[l,k,j,i]^* = dm[k,l,i,j]^*
+    into a 1D array that holds one element of each set of symmetry-related elements,
+    i.e. about n^4/4 elements. If single is True, the elements are stored in single
+    precision. Use unpack_2pdm to recover dm.
+    '''
+    n = dm.shape[0]
+    flat = dm.reshape(-1)
+    packed = []
+    for i in range(0, n):
+        f0, rep, _ = _pdm2_images(n, i)
+        packed.append(flat[f0[f0 == rep]])
+    packed = np.concatenate(packed)
+    if single:
+        packed = packed.astype(np.complex64 if np.iscomplexobj(packed) else np.float32)
+    return packed
+#################################################
+
+
+#################################################
+def unpack_2pdm(packed, n):
+    '''
+    The inverse of pack_2pdm, n is the number of orbitals (or spin orbitals).
+    '''
+    kept = []
+    for i in range(0, n):
+        f0, rep, _ = _pdm2_images(n, i)
+        kept.append(f0[f0 == rep])
+    kept = np.concatenate(kept)
+    dm = np.zeros(n**4, dtype=np.result_type(packed.dtype, np.float64))
+    for i in range(0, n):
+        f0, rep, cj = _pdm2_images(n, i)
+        v = packed[np.searchsorted(kept, rep)]
+        dm[f0] = np.where(cj, np.conj(v), v)
+    return dm.reshape((n, n, n, n))
+#################################################
+
+
+#################################################
+def load_2pdm(fname):
+    '''
+    Loads a 2PDM saved by MYTDDMRG.time_propagate (2pdm.npz in a tevo-XXXX 
+    directory). For spin_symmetry = 'su2', the spin-summed spatial 2PDM 
+    dm[i,j,k,l] = sum_{s,t} <a^+_{i,s} a^+_{j,t} a_{k,t} a_{l,s}> is returned. For
+    'sz', the spin orbital 2PDM with the spin orbital index 2*i+s is returned.
+    '''
+    with np.load(fname) as d:
+        return unpack_2pdm(d['pdm2'], int(d['n']))
+#################################################
+
+
 #################################################
 def get_CAS_ints(mol, nCore, nCAS, nelCAS, ocoeff, verbose):
     '''
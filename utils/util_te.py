@@ -0,0 +1,679 @@
+import os, sys, stat, time, signal, pickle, traceback
+import multiprocessing
+import numpy as np
+from scipy.linalg import eigvalsh
+from IMAM_TDDMRG.utils.util_print import getVerbosePrinter, MPI
+
+_print = getVerbosePrinter((MPI.rank == 0), flush=True)
+
+
+##########################################################################
+class te_step_controller:
+    '''
+    An error-controlled time step controller for time_propagate based on step
+    doubling. Every step of length dt is also done as two steps of length dt/2, and
+    the local error of the latter is estimated from the distance between the two
+    results,
+       err_abs = | |psi_half> - |psi_full> | / (2^order - 1)
+    relative to the norm of |psi_half>. The next time step is then chosen as
+       dt_new = dt * safety * (1/err)^(1/(order+1))
+    where err = err_abs/tol, and the ratio dt_new/dt is bounded between shrink_min 
+    and grow_max. A step whose err exceeds 1 is rejected (if reject = True) unless 
+    the time step is already dt_min.
+    '''
+
+    #################################################
+    def __init__(self, dt0, tol, dt_min=None, dt_max=None, order=2, safety=0.9,
+                 grow_max=2.0, shrink_min=0.2, reject=True):
+        '''
+        dt0:
+           The initial time step.
+        tol:
+           The tolerance for the norm of the local error of the (normalized) state 
+           per time step.
+        dt_min, dt_max:
+           The lower and upper bounds of the time step. The defaults are dt0/20 and
+           20*dt0, respectively.
+        order:
+           The order of the propagator, 2 for TDVP and 4 for RK4.
+        '''
+        self.dt = dt0
+        self.tol = tol
+        self.dt_min = dt0/20 if dt_min is None else dt_min
+        self.dt_max = 20*dt0 if dt_max is None else dt_max
+        assert self.dt_min <= dt0 <= self.dt_max, \
+            'te_step_controller: dt0 must lie between dt_min and dt_max.'
+        self.order = order
+        self.safety = safety
+        self.grow_max = grow_max
+        self.shrink_min = shrink_min
+        self.reject = reject
+        self.t_eps = 1.0E-9 * max(self.dt_min, 1.0E-3)
+
+        self.n_accept = 0
+        self.n_reject = 0
+    #################################################
+
+
+    #################################################
+    def max_steps(self, tinit, tmax):
+        '''
+        The maximum possible number of time points between tinit and tmax.
+        '''
+        return int(np.ceil((tmax - tinit)/self.dt_min)) + 1
+    #################################################
+
+
+    #################################################
+    def error(self, normsq_full, normsq_half, ovl):
+        '''
+        Returns the error estimate of the last step relative to the tolerance, from 
+        the squared norms of the states propagated with one full step and with two 
+        half steps, and their overlap <psi_full|psi_half>.
+        '''
+        d2 = max(normsq_full + normsq_half - 2*np.real(ovl), 0.0)
+        err_abs = np.sqrt(d2 / normsq_half) / (2**self.order - 1)
+        return err_abs / self.tol
+    #################################################
+
+
+    #################################################
+    def accept(self, err, dt):
+        '''
+        Decides whether the last step of length dt is accepted, and if not, shrinks
+        self.dt for the retry.
+        '''
+        if err <= 1.0 or not self.reject or dt <= self.dt_min*(1+1.0E-12):
+            return True
+        else:
+            self.dt = max(self.dt_min, dt * max(self.shrink_min,
+                                                self.safety * err**(-1/(self.order+1))))
+            self.n_reject += 1
+            return False
+    #################################################
+
+
+    #################################################
+    def update(self, err, dt):
+        '''
+        Registers an accepted step of length dt and determines the next time step.
+        '''
+        if err == 0.0:
+            fac = self.grow_max
+        else:
+            fac = min(self.grow_max, max(self.shrink_min,
+                                         self.safety * err**(-1/(self.order+1))))
+        self.dt = min(self.dt_max, max(self.dt_min, dt*fac))
+        self.n_accept += 1
+    #################################################
+
+
+    #################################################
+    def next_time(self, tt, tmax, t_target=None):
+        '''
+        The next time point after tt, which does not overshoot tmax and the next
+        requested sampling time t_target (if given).
+        '''
+        t_next = min(tt + self.dt, tmax)
+
+        #==== Avoid a tiny last step ====#
+        if tmax - t_next < 0.5*self.dt_min and tmax - tt <= self.dt_max:
+            t_next = tmax
+
+        if t_target is not None and t_target > tt + self.t_eps:
+            t_next = min(t_next, t_target)
+        return t_next
+    #################################################
+
+
+    #################################################
+    def get_state(self):
+        return {'dt':self.dt, 'n_accept':self.n_accept, 'n_reject':self.n_reject}
+    #################################################
+
+
+    #################################################
+    def restore(self, state):
+        for k in state:
+            setattr(self, k, state[k])
+    #################################################
+##########################################################################
+
+
+##########################################################################
+class te_bond_dim_policy:
+    '''
+    Chooses the bond dimension of the time-evolved MPS for the next time step from the
+    largest discarded weight of the last step. If it exceeds the error budget
+    trunc_tol, the bond dimension is multiplied by grow, and if it is below
+    shrink_ratio*trunc_tol, the bond dimension is divided by grow. The result is
+    bounded by D_min and D_max, and by the largest bond dimension that is predicted to
+    fit in mem_max bytes, the latter taking precedence over D_min. The prediction
+    assumes that the peak memory grows as D^2 and is calibrated on the peak memory
+    usage reported by block2 for the largest bond dimension used so far.
+    '''
+
+    #################################################
+    def __init__(self, D_init, trunc_tol, D_min=None, D_max=None, grow=1.25,
+                 shrink_ratio=0.01, mem_max=None):
+        self.D = D_init
+        self.trunc_tol = trunc_tol
+        self.D_min = 1 if D_min is None else D_min
+        self.D_max = D_max
+        assert self.D_min <= self.D_max, \
+            'te_bond_dim_policy: D_min cannot be larger than D_max.'
+        assert grow > 1.0, 'te_bond_dim_policy: grow must be larger than 1.'
+        self.grow = grow
+        self.shrink_ratio = shrink_ratio
+        self.mem_max = mem_max
+        self.D = min(self.D_max, max(self.D_min, self.D))
+        self.D_used = self.D     # The largest bond dimension used so far.
+    #################################################
+
+
+    #################################################
+    def max_by_memory(self, mem_peak):
+        '''
+        The largest bond dimension predicted to fit in mem_max bytes given the peak
+        memory usage mem_peak (bytes) seen so far.
+        '''
+        if self.mem_max is None or mem_peak is None or mem_peak <= 0:
+            return self.D_max
+        else:
+            return int(self.D_used * np.sqrt(self.mem_max / mem_peak))
+    #################################################
+
+
+    #################################################
+    def update(self, dw, mem_peak=None):
+        '''
+        Returns the bond dimension for the next time step given the largest
+        discarded weight dw of the last step.
+        '''
+        if dw > self.trunc_tol:
+            D = int(np.ceil(self.D * self.grow))
+        elif dw < self.shrink_ratio * self.trunc_tol:
+            D = int(np.floor(self.D / self.grow))
+        else:
+            D = self.D
+        D = min(max(D, self.D_min), self.D_max)
+        self.D = max(min(D, self.max_by_memory(mem_peak)), 1)   # The memory ceiling is hard.
+        self.D_used = max(self.D_used, self.D)
+        return self.D
+    #################################################
+
+
+    #################################################
+    def get_state(self):
+        return {'D':self.D, 'D_used':self.D_used}
+    #################################################
+
+
+    #################################################
+    def restore(self, state):
+        for k in state:
+            setattr(self, k, state[k])
+    #################################################
+##########################################################################
+
+
+##########################################################################
+class te_control_channel:
+    '''
+    A named pipe (FIFO) through which a running time propagation can be controlled.
+    Commands are written into it one per line, e.g.
+       echo "bond_dim 800" > <prefix>.sample/control
+    and are read at the next step boundary. The recognized commands are
+       sample              Save the 1PDM and the time information at this step.
+       save_mps            Save the MPS at this step.
+       save_1pdm           Same as sample.
+       bond_dim <D>        Set the bond dimension of the time-evolved MPS.
+       krylov_size <n>     Set the Krylov subspace size (TDVP).
+       krylov_tol <x>      Set the Krylov convergence threshold (TDVP).
+       sample_every <n>    Also do 'sample' every n steps (0 turns it off).
+       stop                Save everything as at the last time point and stop.
+    Checking for commands costs a single non-blocking read per step.
+    '''
+
+    commands = {'sample':None, 'save_mps':None, 'save_1pdm':None, 'bond_dim':int,
+                'krylov_size':int, 'krylov_tol':float, 'sample_every':int, 'stop':None}
+
+    #################################################
+    def __init__(self, path):
+        self.path = path
+        if os.path.exists(path):
+            assert stat.S_ISFIFO(os.stat(path).st_mode), \
+                f'te_control_channel: {path} exists but is not a named pipe.'
+        else:
+            os.mkfifo(path)
+        self.fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+        self.buf = ''
+    #################################################
+
+
+    #################################################
+    def poll(self):
+        '''
+        Returns the list of (command, argument) pairs received since the last call.
+        Malformed lines are reported and skipped.
+        '''
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            data = b''
+        if len(data) == 0:
+            return []
+        self.buf += data.decode(errors='replace')
+        lines = self.buf.split('\n')
+        self.buf = lines.pop()     # An incomplete line is kept for the next call.
+
+        cmds = []
+        for l in lines:
+            w = l.split()
+            if len(w) == 0:
+                continue
+            c = w[0].lower()
+            if c not in self.commands or \
+               len(w) != (1 if self.commands[c] is None else 2):
+                _print(f'te_control_channel: Unrecognized command \'{l.strip()}\' is ' +
+                       'ignored.')
+                continue
+            try:
+                a = None if self.commands[c] is None else self.commands[c](w[1])
+            except ValueError:
+                _print(f'te_control_channel: Invalid argument in \'{l.strip()}\', the ' +
+                       'command is ignored.')
+                continue
+            cmds.append((c, a))
+        return cmds
+    #################################################
+
+
+    #################################################
+    def close(self):
+        os.close(self.fd)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+    #################################################
+##########################################################################
+
+
+##########################################################################
+class te_stop_guard:
+    '''
+    Turns termination signals and an approaching walltime deadline into a request to
+    stop at the next step (or sweep) boundary, where a consistent checkpoint can still
+    be written. The signals in stop_signals (names such as 'SIGTERM') only set a flag
+    instead of killing the process. deadline is the absolute time (as returned by
+    time.time()) by which the checkpoint must be complete. The stop is requested as
+    soon as margin*(t_step + t_save) no longer fits before the deadline, where t_step
+    is the longest of the last few steps and t_save the longest checkpoint writing
+    time observed so far (or t_step before any checkpoint has been written). When
+    use_mpi is True, check() requires all ranks to call it and they reach the same
+    decision.
+    '''
+
+    #################################################
+    def __init__(self, deadline=None, stop_signals=('SIGTERM', 'SIGUSR1'), margin=1.2,
+                 use_mpi=False):
+        self.deadline = deadline
+        self.margin = margin
+        self.use_mpi = use_mpi
+        self.signaled = None
+        self.t_steps = []
+        self.t_save = None
+        self.old_handlers = {}
+        if stop_signals is not None:
+            for sname in stop_signals:
+                sig = getattr(signal, sname)
+                self.old_handlers[sig] = signal.signal(sig, self._handler)
+    #################################################
+
+
+    #################################################
+    def _handler(self, signum, frame):
+        self.signaled = signal.Signals(signum).name
+    #################################################
+
+
+    #################################################
+    def step_done(self, t_wall):
+        self.t_steps = (self.t_steps + [t_wall])[-5:]
+    #################################################
+
+
+    #################################################
+    def save_done(self, t_wall):
+        self.t_save = t_wall if self.t_save is None else max(self.t_save, t_wall)
+    #################################################
+
+
+    #################################################
+    def deadline_near(self):
+        if self.deadline is None or len(self.t_steps) == 0:
+            return False
+        t_step = max(self.t_steps)
+        t_save = t_step if self.t_save is None else self.t_save
+        return time.time() + self.margin*(t_step + t_save) > self.deadline
+    #################################################
+
+
+    #################################################
+    def check(self):
+        '''
+        Returns the reason to stop (a string) or None.
+        '''
+        if self.signaled is not None:
+            reason = 'signal ' + self.signaled
+        elif self.deadline_near():
+            reason = 'walltime deadline'
+        else:
+            reason = None
+        if self.use_mpi:
+            from mpi4py import MPI as MPIpy
+            reasons = MPIpy.COMM_WORLD.allgather(reason)
+            reason = next((r for r in reasons if r is not None), None)
+        return reason
+    #################################################
+
+
+    #################################################
+    def release(self):
+        '''
+        Restores the signal handlers that were active before.
+        '''
+        for sig in self.old_handlers:
+            signal.signal(sig, self.old_handlers[sig])
+        self.old_handlers = {}
+    #################################################
+##########################################################################
+
+
+##########################################################################
+class te_obs_pipeline:
+    '''
+    Runs the post-processing of the quantities measured at the sampling times of
+    time_propagate. With mode = 'sync', each job is processed immediately by calling
+    func(job). With mode = 'async', the jobs are processed in order by a forked worker
+    process fed through a bounded queue of size maxsize, so that the propagation does
+    not wait for them. Since the worker is forked after func and the objects it uses
+    (e.g. the printers) have been created, those objects belong to the worker from
+    then on and must no longer be used by the calling process.
+    '''
+
+    #################################################
+    def __init__(self, func, mode='async', maxsize=2):
+        assert mode in ('sync', 'async'), \
+            "te_obs_pipeline: mode must be either 'sync' or 'async'."
+        self.func = func
+        self.mode = mode
+        self.maxsize = maxsize
+        self.worker = None
+    #################################################
+
+
+    #################################################
+    def start(self):
+        if self.mode == 'async':
+            ctx = multiprocessing.get_context('fork')
+            self.queue = ctx.JoinableQueue(self.maxsize)
+            self.worker = ctx.Process(target=self._run, daemon=True)
+            self.worker.start()
+    #################################################
+
+
+    #################################################
+    def _run(self):
+        failed = False
+        while True:
+            job = self.queue.get()
+            try:
+                if job is None:
+                    break
+                if not failed:
+                    self.func(job)
+            except Exception:
+                #== Keep consuming the jobs so that the main process does not hang ==#
+                traceback.print_exc()
+                failed = True
+            finally:
+                self.queue.task_done()
+        self.queue.close()
+        self.queue.join_thread()
+        if failed:
+            raise SystemExit(1)
+    #################################################
+
+
+    #################################################
+    def submit(self, job):
+        '''
+        Processes job or puts it in the queue. In the latter case, this blocks only
+        when the queue is full.
+        '''
+        if self.mode == 'sync':
+            self.func(job)
+        else:
+            self.queue.put(job)
+    #################################################
+
+
+    #################################################
+    def drain(self):
+        '''
+        Waits until all submitted jobs have been processed.
+        '''
+        if self.mode == 'async':
+            self.queue.join()
+    #################################################
+
+
+    #################################################
+    def close(self):
+        if self.mode == 'async' and self.worker is not None:
+            self.queue.put(None)
+            self.worker.join()
+            assert self.worker.exitcode == 0, \
+                'te_obs_pipeline: The observable worker process failed, see the ' + \
+                'traceback printed above.'
+            self.worker = None
+    #################################################
+##########################################################################
+
+
+##########################################################################
+def write_time_info(save_dir, t, it, t_sp, i_sp, normsq, ac, save_mps, save_1pdm, rs, re,
+                    ro, dm):
+    yn_bools = ('No','Yes')
+    au2fs = 2.4188843265e-2   # a.u. of time to fs conversion factor
+    with open(save_dir + '/TIME_INFO', 'w') as t_info:
+        t_info.write(' Reasons printed = \n')
+        if rs: t_info.write('    * sampling time \n')
+        if re: t_info.write('    * last time point \n')
+        if ro: t_info.write('    * probe file \n')
+        t_info.write(' Actual sampling time = (%d, %10.6f a.u. / %10.6f fs)\n' %
+                     (it, t, t*au2fs))
+        t_info.write(' Requested sampling time = (%d, %10.6f a.u. / %10.6f fs)\n' %
+                     (i_sp, t_sp, t_sp*au2fs))
+        t_info.write(' MPS norm square = %19.14f\n' % normsq)
+        t_info.write(' Autocorrelation = (%19.14f, %19.14f)\n' % (ac.real, ac.imag))
+        t_info.write(f' Is MPS saved at this time?  {yn_bools[save_mps]}\n')
+        t_info.write(f' Is 1PDM saved at this time?  {yn_bools[save_1pdm]}\n')
+        if save_1pdm:
+            natocc_a = eigvalsh(dm[0,:,:])
+            natocc_b = eigvalsh(dm[1,:,:])
+            t_info.write(' 1PDM info:\n')
+            t_info.write('    Trace (alpha,beta) = (%16.12f,%16.12f) \n' %
+                         ( np.trace(dm[0,:,:]).real, np.trace(dm[1,:,:]).real ))
+            t_info.write('    ')
+            for i in range(0, 4+4*20): t_info.write('-')
+            t_info.write('\n')
+            t_info.write('    ' +
+                         '%4s'  % 'No.' + 
+                         '%20s' % 'Alpha MO occ.' +
+                         '%20s' % 'Beta MO occ.' +
+                         '%20s' % 'Alpha natorb occ.' +
+                         '%20s' % 'Beta natorb occ.' + '\n')
+            t_info.write('    ')
+            for i in range(0, 4+4*20): t_info.write('-')
+            t_info.write('\n')
+            for i in range(0, dm.shape[1]):
+                t_info.write('    ' +
+                             '%4d'  % i + 
+                             '%20.12f' % np.diag(dm[0,:,:])[i].real +
+                             '%20.12f' % np.diag(dm[1,:,:])[i].real +
+                             '%20.12f' % natocc_a[i].real +
+                             '%20.12f' % natocc_b[i].real + '\n')
+##########################################################################
+
+
+##########################################################################
+def write_time_info_ow(dir_ow, t, it, t_sp, i_sp, normsq, ac):
+    # Written under a temporary name and renamed, since the existence of TIME_INFO
+    # marks a complete checkpoint (see util_mps.mps_checkpoint).
+    au2fs = 2.4188843265e-2   # a.u. of time to fs conversion factor
+    with open(dir_ow + '/TIME_INFO.tmp', 'w') as t_info:
+        t_info.write(' Actual sampling time = (%d, %10.6f a.u. / %10.6f fs)\n' %
+                     (it, t, t*au2fs))
+        t_info.write(' Requested sampling time = (%d, %10.6f a.u. / %10.6f fs)\n' %
+                     (i_sp, t_sp, t_sp*au2fs))
+        t_info.write(' MPS norm square = %19.14f\n' % normsq)
+        t_info.write(' Autocorrelation = (%19.14f, %19.14f)\n' % (ac.real, ac.imag))
+    os.replace(dir_ow + '/TIME_INFO.tmp', dir_ow + '/TIME_INFO')
+##########################################################################
+
+
+##########################################################################
+def read_time_info(save_dir):
+    '''
+    Returns the time point index and the time (in a.u.) in save_dir/TIME_INFO
+    written by write_time_info or write_time_info_ow.
+    '''
+    with open(save_dir + '/TIME_INFO', 'r') as t_info:
+        for l in t_info:
+            if l.strip().startswith('Actual sampling time'):
+                it, t = l.split('(')[1].split('a.u.')[0].split(',')
+                return int(it), float(t)
+    raise ValueError(f'No time information is found in {save_dir}/TIME_INFO.')
+##########################################################################
+
+
+##########################################################################
+def write_te_state(dir_ow, state):
+    with open(dir_ow + '/TE_STATE.tmp', 'wb') as f:
+        pickle.dump(state, f)
+    os.replace(dir_ow + '/TE_STATE.tmp', dir_ow + '/TE_STATE')
+##########################################################################
+
+
+##########################################################################
+def get_dir_size(path):
+    '''
+    The total size in bytes of the files under path.
+    '''
+    size = 0
+    with os.scandir(path) as it:
+        for e in it:
+            if e.is_file(follow_symlinks=False):
+                size += e.stat(follow_symlinks=False).st_size
+            elif e.is_dir(follow_symlinks=False):
+                size += get_dir_size(e.path)
+    return size
+##########################################################################
+
+
+##########################################################################
+# The main program of a worker started by run_workers, it imports nothing from
+# this package before the setup calls have run.
+_WORKER_MAIN = '''
+import os, sys, pickle, importlib
+job = sys.argv[1]
+with open(job, 'rb') as f:
+    setup, payload = pickle.load(f)
+for mod, fn, args in setup:
+    getattr(importlib.import_module(mod), fn)(*args)
+func, args, kwargs = pickle.loads(payload)
+res = func(*args, **kwargs)
+with open(job + '.res.tmp', 'wb') as f:
+    pickle.dump(res, f)
+os.replace(job + '.res.tmp', job + '.res')
+'''
+##########################################################################
+
+
+##########################################################################
+def run_workers(jobs, n_proc=None, logs=None, setup=(), tmpdir=None,
+                stop_signals=('SIGTERM', 'SIGUSR1')):
+    '''
+    Runs each job (func, args, kwargs) of jobs as func(*args, **kwargs) in a new 
+    Python interpreter and returns the list of the return values. The element for a
+    job that failed (whose traceback is printed into its log) is None. 
+
+    The workers are started from scratch rather than forked, so they do not inherit
+    the block2 stack, the threads, or the OpenMP runtime state of the current 
+    process, and they can be used after block2 has run (the GNU OpenMP runtime hangs
+    in processes forked after a parallel region). In turn, func must be a module-level
+    function, and func, args, kwargs, and the return values must be picklable. 
+    setup is a list of (module, function, args) tuples that are called in every 
+    worker before the job is unpickled, e.g. to initialize a module that the module 
+    of func needs at import.
+
+    At most n_proc workers (None means len(jobs)) run at the same time. If logs is 
+    not None, the standard output and error of the i-th worker go to the file 
+    logs[i]. The job files are kept in a temporary directory inside tmpdir. A signal
+    in stop_signals received while waiting is forwarded to the running workers, the
+    jobs that have not started yet being skipped. Do not call it under MPI.
+    '''
+    import subprocess, tempfile, shutil
+
+    n_proc = len(jobs) if n_proc is None else max(1, n_proc)
+    pending = list(range(len(jobs)))
+    results = [None] * len(jobs)
+    running = {}
+    tmp = tempfile.mkdtemp(prefix='workers.', dir=tmpdir)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([p for p in sys.path if p != '']))
+
+    #==== Forward stop signals to the running workers ====#
+    def forward(signum, frame):
+        pending.clear()
+        for p, _ in running.values():
+            if p.poll() is None:
+                p.send_signal(signum)
+    old_handlers = {}
+    if stop_signals is not None:
+        for sname in stop_signals:
+            sig = getattr(signal, sname)
+            old_handlers[sig] = signal.signal(sig, forward)
+
+    try:
+        while len(pending) > 0 or len(running) > 0:
+            while len(pending) > 0 and len(running) < n_proc:
+                i = pending.pop(0)
+                job = tmp + f'/job{i}.pkl'
+                func, args, kwargs = jobs[i]
+                with open(job, 'wb') as f:
+                    pickle.dump((list(setup), pickle.dumps((func, args, kwargs))), f)
+                sys.stdout.flush()
+                sys.stderr.flush()
+                log = None if logs is None else open(logs[i], 'w')
+                p = subprocess.Popen([sys.executable, '-c', _WORKER_MAIN, job], env=env,
+                                     stdout=log, stderr=subprocess.STDOUT if log else None)
+                if log is not None:
+                    log.close()
+                running[i] = (p, job)
+            done = [i for i in running if running[i][0].poll() is not None]
+            if len(done) == 0:
+                time.sleep(0.05)
+            for i in done:
+                p, job = running.pop(i)
+                try:
+                    with open(job + '.res', 'rb') as f:
+                        results[i] = pickle.load(f)
+                except FileNotFoundError:
+                    results[i] = None     # The worker failed without returning.
+    finally:
+        for sig, h in old_handlers.items():
+            signal.signal(sig, h)
+        shutil.rmtree(tmp, ignore_errors=True)
+    return results
+##########################################################################